@@ -0,0 +1,565 @@
+# -*- coding: utf-8 -*-
+"""
+Криптоанализ преобразований из модуля datablocks
+"""
+from math import exp, log
+from random import Random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import Event
+from datablocks import Datablock, FrequencyTable, currentElemSize
+
+# NumPy для криптоанализа обязателен: все оценки выполняются векторно
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SCAN_BINS = 1 << 24 # Наибольшее количество счётчиков в одном проходе по шифртексту (см. coincidenceScan())
+SCAN_TILE = 1 << 22 # Наибольшее количество кодов, вычисляемых за один шаг прохода
+KASISKI_GRAM = 3 # Длина повторяющихся n-грамм в тесте Касиски
+KASISKI_MAX = 1 << 16 # Наибольшее количество расстояний между повторами, учитываемых в тесте Касиски
+FITNESS_MAX_TABLE = 1 << 24 # Наибольший размер таблицы логарифмов частот n-грамм (m ** n)
+STOP_CHECK_PERIOD = 256 # Через сколько итераций запуск поиска проверяет, не остановлен ли весь поиск
+
+# Функция _elemArray() возвращает элементы блока данных в виде массива NumPy (int64) и мощность алфавита m
+def _elemArray(block):
+    if np is None:
+        raise Exception("Для криптоанализа требуется NumPy")
+    size = block.getElemSize()
+    if size > 16:
+        raise Exception("Криптоанализ поддерживает элементы размером не более 16 битов")
+    return np.asarray(block.asElems(), dtype = np.int64), 1 << size
+
+# Функция _lengthGroups() разбивает длины ключа 1 ... maxLen на группы, для каждой из которых
+# гистограммы всех классов вычетов помещаются в SCAN_BINS счётчиков
+def _lengthGroups(maxLen, m):
+    groups = [[]]
+    bins = 0
+    for L in range(1, maxLen + 1):
+        if bins + L * m > SCAN_BINS and len(groups[-1]) > 0:
+            groups.append([])
+            bins = 0
+        groups[-1].append(L)
+        bins += L * m
+    return groups
+
+# Функция _lengthCounts() считает для части шифртекста (job = (элементы, позиция первого элемента, длины, m))
+# гистограммы элементов по классам вычетов позиций для всех длин группы сразу.
+# Счётчики длины lengths[j] занимают отрезок, начинающийся с m * (lengths[0] + ... + lengths[j - 1]):
+# сначала m счётчиков класса 0, затем класса 1 и т. д.
+def _lengthCounts(job):
+    elems, start, lengths, m = job
+    ls = np.array(lengths, dtype = np.int64)[:, None]
+    offsets = m * (np.cumsum(ls) - ls[:, 0])[:, None]
+    bins = m * int(ls.sum())
+    counts = np.zeros(bins, dtype = np.int64)
+
+    tile = max(1, SCAN_TILE // len(lengths))
+    for pos in range(0, len(elems), tile):
+        part = elems[pos:pos + tile]
+        idx = np.arange(start + pos, start + pos + len(part), dtype = np.int64)
+        codes = offsets + (idx % ls) * m + part
+        counts += np.bincount(codes.ravel(), minlength = bins)
+    return counts
+
+# Функция _classHistograms() возвращает словарь {L: матрица L x m}, где строка r - гистограмма элементов
+# шифртекста, стоящих на позициях i = r (mod L). Все длины группы считаются за один проход по шифртексту,
+# при workers > 1 шифртекст делится на части, которые считаются в ProcessPoolExecutor
+def _classHistograms(elems, m, lengths, workers = 1):
+    hists = {}
+    parts = max(1, workers)
+    step = (len(elems) + parts - 1) // parts or 1
+    for group in _lengthGroups(max(lengths), m):
+        group = [L for L in group if L in lengths]
+        if len(group) == 0:
+            continue
+        jobs = [(elems[pos:pos + step], pos, group, m) for pos in range(0, len(elems), step)]
+        if workers > 1 and len(jobs) > 1:
+            with ProcessPoolExecutor(max_workers = workers) as executor:
+                counts = sum(executor.map(_lengthCounts, jobs))
+        else:
+            counts = sum(map(_lengthCounts, jobs))
+
+        pos = 0
+        for L in group:
+            hists[L] = np.asarray(counts[pos:pos + L * m]).reshape(L, m)
+            pos += L * m
+    return hists
+
+# Функция _coincidence() возвращает средний по классам вычетов индекс совпадений для матрицы гистограмм hist
+def _coincidence(hist):
+    n = hist.sum(axis = 1).astype(np.float64)
+    pairs = (hist * (hist - 1)).sum(axis = 1).astype(np.float64)
+    valid = n > 1
+    if not valid.any():
+        return 0.0
+    return float((pairs[valid] / (n[valid] * (n[valid] - 1))).mean())
+
+# Функция coincidenceScan() возвращает массив индексов совпадений: элемент L - 1 - средний индекс совпадений
+# классов вычетов позиций по модулю L (для истинной длины ключа и кратных ей он близок к индексу открытого текста)
+def coincidenceScan(block, maxLen = 32, workers = 1):
+    elems, m = _elemArray(block)
+    hists = _classHistograms(elems, m, list(range(1, maxLen + 1)), workers)
+    return np.array([_coincidence(hists[L]) for L in range(1, maxLen + 1)])
+
+# Функция kasiskiScan() (тест Касиски) находит повторы n-грамм длиной KASISKI_GRAM в шифртексте и возвращает массив:
+# элемент L - 1 - доля расстояний между соседними повторами, кратных L. Если повторов нет, возвращается None
+def kasiskiScan(block, maxLen = 32):
+    elems, m = _elemArray(block)
+    return _kasiski(elems, m, maxLen)
+
+def _kasiski(elems, m, maxLen):
+    count = len(elems) - KASISKI_GRAM + 1
+    if count < 2:
+        return None
+    codes = elems[:count].copy()
+    for k in range(1, KASISKI_GRAM):
+        codes = codes * m + elems[k:k + count]
+
+    # Устойчивая сортировка сохраняет порядок позиций внутри одинаковых n-грамм
+    order = np.argsort(codes, kind = "stable")
+    same = codes[order[1:]] == codes[order[:-1]]
+    dist = (order[1:] - order[:-1])[same][:KASISKI_MAX]
+    if len(dist) == 0:
+        return None
+    ls = np.arange(1, maxLen + 1, dtype = np.int64)[:, None]
+    return (dist[None, :] % ls == 0).mean(axis = 1)
+
+# Функция _chooseLength() выбирает длину ключа по индексам совпадений ics и результатам теста Касиски kas.
+# Индекс совпадений высок для истинной длины и кратных ей, тест Касиски - для истинной длины и её делителей,
+# поэтому оценка длины - произведение нормированного индекса совпадений и доли подтверждающих расстояний.
+# Выбирается наименьшая длина, оценка которой не ниже 0.9 от наибольшей
+def _chooseLength(ics, kas):
+    lo = ics.min()
+    hi = ics.max()
+    if hi <= 0 or hi - lo <= 0.2 * hi:
+        return 1
+    score = (ics - lo) / (hi - lo)
+    if kas is not None:
+        score = score * (0.5 + 0.5 * kas)
+    return int(np.flatnonzero(score >= 0.9 * score.max())[0]) + 1
+
+# Функция estimateKeyLength() оценивает длину ключа полиалфавитной сдвиговой подстановки (substPolyShiftedAbc()),
+# которой зашифрован блок данных block. Рассматриваются длины от 1 до maxLen
+def estimateKeyLength(block, maxLen = 32, workers = 1):
+    elems, m = _elemArray(block)
+    hists = _classHistograms(elems, m, list(range(1, maxLen + 1)), workers)
+    ics = np.array([_coincidence(hists[L]) for L in range(1, maxLen + 1)])
+    return _chooseLength(ics, _kasiski(elems, m, maxLen))
+
+# Функция _referenceVector() переводит эталонное распределение в вектор вероятностей длиной m.
+# reference - таблица частот (FrequencyTable), образец открытого текста (Datablock) или словарь {элемент: частота}.
+# Нулевые вероятности заменяются малыми, чтобы хи-квадрат оставался конечным
+def _referenceVector(reference, m):
+    if isinstance(reference, Datablock):
+        reference = reference.getFrequencyTable()
+    if isinstance(reference, FrequencyTable):
+        if reference.getN() != 1:
+            raise Exception("Эталонное распределение должно быть распределением отдельных элементов (n = 1)")
+        reference = reference.getCounts()
+
+    p = np.zeros(m, dtype = np.float64)
+    for v, c in reference.items():
+        if 0 <= v < m:
+            p[v] = c
+    if p.sum() <= 0:
+        raise Exception("Эталонное распределение пусто")
+    p /= p.sum()
+    p[p == 0] = p[p > 0].min() / 100
+    return p / p.sum()
+
+# Функция _shiftKey() восстанавливает ключ по матрице гистограмм классов hist (L x m) и эталонному вектору p.
+# Для класса r и каждого сдвига k хи-квадрат равен sum_v hist[r, v + k] ** 2 / (n_r * p[v]) - n_r,
+# т. е. с точностью до постоянных - круговая корреляция hist ** 2 с 1 / p, которая для всех k сразу
+# вычисляется через БПФ. Элемент ключа - сдвиг с наименьшим хи-квадратом
+def _shiftKey(hist, p):
+    m = len(p)
+    a = np.fft.rfft(hist.astype(np.float64) ** 2, axis = 1)
+    b = np.conj(np.fft.rfft(1 / p))
+    corr = np.fft.irfft(a * b, n = m, axis = 1)
+    return [int(k) for k in corr.argmin(axis = 1)]
+
+# Функция recoverShiftKey() восстанавливает ключ длиной keyLength полиалфавитной сдвиговой подстановки
+# по эталонному распределению открытого текста reference (см. _referenceVector()).
+# Результат можно сразу передать в substPolyShiftedAbc(key, False)
+def recoverShiftKey(block, keyLength, reference, workers = 1):
+    elems, m = _elemArray(block)
+    hist = _classHistograms(elems, m, [keyLength], workers)[keyLength]
+    return _shiftKey(hist, _referenceVector(reference, m))
+
+# Функция breakPolyShifted() вскрывает полиалфавитную сдвиговую подстановку: оценивает длину ключа
+# (индекс совпадений и тест Касиски для всех длин от 1 до maxLen), затем восстанавливает каждый элемент ключа
+# по критерию хи-квадрат. Возвращает ключ для substPolyShiftedAbc(key, False).
+# Гистограммы классов вычисляются один раз и используются на обоих шагах
+def breakPolyShifted(block, reference, maxLen = 32, workers = 1):
+    elems, m = _elemArray(block)
+    hists = _classHistograms(elems, m, list(range(1, maxLen + 1)), workers)
+    ics = np.array([_coincidence(hists[L]) for L in range(1, maxLen + 1)])
+    keyLength = _chooseLength(ics, _kasiski(elems, m, maxLen))
+    return _shortestPeriod(_shiftKey(hists[keyLength], _referenceVector(reference, m)))
+
+# Функция _shortestPeriod() сокращает ключ до наименьшего периода. Длина может оцениваться кратной истинной,
+# если у открытого текста есть собственный период (например, полубайты при размере элемента 4 бита)
+def _shortestPeriod(key):
+    for p in range(1, len(key)):
+        if len(key) % p == 0 and all(key[i] == key[i % p] for i in range(p, len(key))):
+            return key[:p]
+    return key
+
+
+# Класс NgramFitness - функция пригодности для перебора ключей: средний логарифм частоты n-грамм
+# открытого текста по эталонному распределению. Таблица логарифмов хранится плотным массивом NumPy
+# формы (m, ..., m) (n измерений); частоты n-грамм, не встречавшихся в эталоне, принимаются равными floor / total.
+# Вместо NgramFitness в функции перебора можно передать любой объект с методами getN(), getElemSize() и getTable()
+class NgramFitness:
+    # reference - таблица частот n-грамм (FrequencyTable; n берётся из неё) или образец открытого текста
+    # (блок данных или двоичная последовательность), size - размер элемента (по умолчанию - действующий в текущем контексте)
+    def __init__(self, reference, n = 2, size = None, floor = 0.01):
+        if np is None:
+            raise Exception("Для криптоанализа требуется NumPy")
+        if isinstance(reference, FrequencyTable):
+            n = reference.getN()
+            size = reference.getElemSize()
+        elif isinstance(reference, Datablock):
+            size = reference.getElemSize()
+            reference = reference.getFrequencyTable(n)
+        else:
+            if size is None:
+                size = currentElemSize()
+            reference = FrequencyTable(size, n).update(reference)
+        
+        m = 1 << size
+        if m ** n > FITNESS_MAX_TABLE:
+            raise Exception("Таблица n-грамм слишком велика: " + str(m) + " ** " + str(n))
+        total = reference.getTotal()
+        if total == 0:
+            raise Exception("Эталонное распределение пусто")
+        
+        table = np.full(m ** n, log(floor / total))
+        for gram, c in reference.getCounts().items():
+            code = 0
+            for v in (gram if n > 1 else (gram, )):
+                code = code * m + v
+            table[code] = log(c / total)
+        self.__n = n
+        self.__elemSize = size
+        self.__table = table.reshape((m, ) * n)
+    
+    def getN(self):
+        return self.__n
+    
+    def getElemSize(self):
+        return self.__elemSize
+    
+    def getTable(self):
+        return self.__table
+    
+    # Метод score() возвращает средний логарифм частоты n-грамм блока данных block
+    def score(self, block):
+        elems, m = _elemArray(block)
+        return _gramScore(self.__table, elems)
+
+# Функция _gramScore() возвращает средний по n-граммам буфера elems логарифм частоты из таблицы table
+def _gramScore(table, elems):
+    n = table.ndim
+    count = len(elems) - n + 1
+    if count <= 0:
+        return 0.0
+    return float(table[tuple(elems[k:k + count] for k in range(0, n))].mean())
+
+# Функция _distinctGrams() возвращает различные n-граммы буфера elems (матрица: строка - n-грамма) и их количества
+def _distinctGrams(elems, m, n):
+    count = len(elems) - n + 1
+    if count <= 0:
+        return np.zeros((0, n), dtype = np.int64), np.zeros(0, dtype = np.int64)
+    codes = elems[:count].copy()
+    for k in range(1, n):
+        codes = codes * m + elems[k:k + count]
+    codes, counts = np.unique(codes, return_counts = True)
+    grams = np.empty((len(codes), n), dtype = np.int64)
+    for k in range(n - 1, -1, -1):
+        grams[:, k] = codes % m
+        codes //= m
+    return grams, counts
+
+# Функция _fitnessArgs() проверяет функцию пригодности и возвращает элементы шифртекста, m и таблицу логарифмов
+def _fitnessArgs(block, fitness):
+    elems, m = _elemArray(block)
+    if fitness.getElemSize() != block.getElemSize():
+        raise Exception("Размер элемента функции пригодности не совпадает с размером элемента блока")
+    return elems, m, np.asarray(fitness.getTable(), dtype = np.float64)
+
+# Функция searchShift() перебирает все ключи моноалфавитной сдвиговой подстановки (substMonoShiftedAbc()).
+# Шифртекст сводится к различным n-граммам с количествами, после чего пригодность всех m ключей
+# вычисляется векторно. Возвращает (ключ, пригодность); ключ подходит для substMonoShiftedAbc(key, False)
+def searchShift(block, fitness):
+    elems, m, table = _fitnessArgs(block, fitness)
+    grams, counts = _distinctGrams(elems, m, table.ndim)
+    if counts.sum() == 0:
+        return 0, 0.0
+    
+    step = max(1, FITNESS_MAX_TABLE // max(1, len(counts)))
+    scores = np.empty(m)
+    for k0 in range(0, m, step):
+        ks = np.arange(k0, min(m, k0 + step), dtype = np.int64)[:, None]
+        plain = tuple((grams[:, k][None, :] - ks) % m for k in range(0, table.ndim))
+        scores[k0:k0 + len(ks)] = table[plain] @ counts
+    key = int(scores.argmax())
+    return key, float(scores[key] / counts.sum())
+
+
+# Задачи перебора ключа (_SubstitutionSearch, _TranspositionSearch) описывают состояние поиска и допустимые ходы:
+#     start(rnd, restart) - начальный ключ запуска номер restart;
+#     score(key) - пригодность ключа (сумма логарифмов частот n-грамм открытого текста);
+#     propose(rnd, key, score) - случайный ход и изменение пригодности при нём (вычисляется без полной расшифровки);
+#     apply(key, move) - выполняет ход и возвращает новый ключ;
+#     result(key) - ключ в виде, пригодном для обратного преобразования.
+# total - количество n-грамм, по которому пригодность нормируется
+
+# Класс _SubstitutionSearch - задача перебора ключа моноалфавитной подстановки с перемешанным алфавитом.
+# Ключ - таблица расшифрования t (t[y] - элемент открытого текста для элемента шифртекста y), ход - обмен t[a] и t[b].
+# Для биграмм пригодность равна sum C[a, b] * Q[a, b], где C - матрица биграмм шифртекста, Q[a, b] = P[t[a], t[b]].
+# Обмен переставляет в Q строки и столбцы a и b, поэтому изменение пригодности считается по двум строкам и двум столбцам,
+# а Q обновляется на месте. Для других n пригодность пересчитывается по различным n-граммам шифртекста
+class _SubstitutionSearch:
+    def __init__(self, elems, m, table):
+        self.m = m
+        self.table = table
+        self.grams, self.counts = _distinctGrams(elems, m, table.ndim)
+        self.total = max(1, int(self.counts.sum()))
+        self.symbols = np.unique(elems).tolist()
+        
+        # Начальный ключ: элементы шифртекста и эталона, упорядоченные по частоте, сопоставляются друг другу
+        freq = np.bincount(elems, minlength = m)
+        ref = np.exp(table).reshape(m, -1).sum(axis = 1)
+        self.initial = np.empty(m, dtype = np.int64)
+        self.initial[np.argsort(-freq, kind = "stable")] = np.argsort(-ref, kind = "stable")
+        
+        if table.ndim == 2:
+            self.pairs = np.zeros((m, m))
+            np.add.at(self.pairs, (self.grams[:, 0], self.grams[:, 1]), self.counts)
+    
+    def start(self, rnd, restart):
+        t = self.initial.copy()
+        if restart > 0:
+            for i in range(0, self.m // 4):
+                a = rnd.choice(self.symbols)
+                b = rnd.randrange(0, self.m)
+                t[a], t[b] = t[b], t[a]
+        if self.table.ndim == 2:
+            self.Q = self.table[t][:, t]
+        return t
+    
+    def score(self, t):
+        return float(self.table[tuple(t[self.grams[:, k]] for k in range(0, self.table.ndim))] @ self.counts)
+    
+    def propose(self, rnd, t, score):
+        a = rnd.choice(self.symbols)
+        b = rnd.randrange(0, self.m)
+        if a == b:
+            return None, 0.0
+        if self.table.ndim != 2:
+            t[a], t[b] = t[b], t[a]
+            new = self.score(t)
+            t[a], t[b] = t[b], t[a]
+            return (a, b), new - score
+        
+        C, Q = self.pairs, self.Q
+        # Строки и столбцы a и b целиком (как если бы менялись только строки или только столбцы) ...
+        d = (C[a] - C[b]) @ (Q[b] - Q[a]) + (C[:, a] - C[:, b]) @ (Q[:, b] - Q[:, a])
+        # ... и поправка для четырёх ячеек на их пересечении
+        swap = {a: b, b: a}
+        for i in (a, b):
+            for j in (a, b):
+                d += C[i, j] * (Q[swap[i], swap[j]] - Q[swap[i], j] - Q[i, swap[j]] + Q[i, j])
+        return (a, b), float(d)
+    
+    def apply(self, t, move):
+        a, b = move
+        t[a], t[b] = t[b], t[a]
+        if self.table.ndim == 2:
+            self.Q[[a, b]] = self.Q[[b, a]]
+            self.Q[:, [a, b]] = self.Q[:, [b, a]]
+        return t
+    
+    # Ключ для substMonoMixedAbc(abc, False) - прямая таблица замены, обратная таблице расшифрования
+    def result(self, t):
+        abc = [0] * self.m
+        for y, x in enumerate(t.tolist()):
+            abc[x] = y
+        return abc
+
+# Класс _TranspositionSearch - задача перебора ключа простой перестановки (transposSimple()) длиной keyLength.
+# Шифртекст рассматривается как матрица M (строка - keyLength элементов), столбец c открытого текста - столбец key[c] шифртекста.
+# Для биграмм заранее вычисляются матрицы пар столбцов: S[a, b] - сумма P[M[j, a], M[j, b]] по строкам,
+# W[a, b] - сумма P[M[j, a], M[j + 1, b]] (стык соседних строк). Пригодность ключа - сумма по соседним позициям ключа
+# (одна выборка из S и W), а обмен двух столбцов меняет не более четырёх слагаемых.
+# Ходы - обмен двух столбцов и перенос отрезка столбцов на другое место.
+# Для других n открытый текст пересчитывается целиком
+class _TranspositionSearch:
+    def __init__(self, elems, m, table, keyLength):
+        if len(elems) % keyLength != 0:
+            raise Exception("Размер блока не кратен размеру ключа")
+        if table.ndim < 2:
+            raise Exception("Перестановку нельзя оценить по частотам отдельных элементов (n = 1)")
+        self.L = keyLength
+        self.table = table
+        self.M = elems.reshape(-1, keyLength)
+        self.total = max(1, len(elems) - table.ndim + 1)
+        
+        if table.ndim == 2:
+            M = self.M
+            self.S = np.array([table[M[:, a][:, None], M].sum(axis = 0) for a in range(0, keyLength)])
+            self.W = np.array([table[M[:-1, a][:, None], M[1:]].sum(axis = 0) for a in range(0, keyLength)])
+    
+    # Первые keyLength запусков начинаются с жадной цепочки столбцов (от столбца restart к лучшему по S соседу),
+    # остальные - со случайной перестановки
+    def start(self, rnd, restart):
+        if restart >= self.L or self.table.ndim != 2:
+            key = np.arange(0, self.L, dtype = np.int64)
+            if restart > 0:
+                rnd.shuffle(key)
+            return key
+        key = [restart % self.L]
+        free = set(range(0, self.L)) - set(key)
+        while free:
+            nxt = max(free, key = lambda b: self.S[key[-1], b])
+            key.append(nxt)
+            free.remove(nxt)
+        return np.array(key, dtype = np.int64)
+    
+    def __edge(self, key, c):
+        if c == self.L - 1:
+            return self.W[key[c], key[0]]
+        return self.S[key[c], key[c + 1]]
+    
+    def score(self, key):
+        if self.table.ndim != 2:
+            plain = self.M[:, key].ravel()
+            n = self.table.ndim
+            count = len(plain) - n + 1
+            return float(self.table[tuple(plain[k:k + count] for k in range(0, n))].sum())
+        return float(self.S[key[:-1], key[1:]].sum() + self.W[key[-1], key[0]])
+    
+    def propose(self, rnd, key, score):
+        if self.L < 2:
+            return None, 0.0
+        i, j = sorted(rnd.sample(range(0, self.L), 2))
+        if rnd.random() < 0.5:
+            new = key.copy()
+            new[i], new[j] = key[j], key[i]
+            if self.table.ndim != 2:
+                return new, self.score(new) - score
+            edges = {(i - 1) % self.L, i, (j - 1) % self.L, j}
+            return new, float(sum(self.__edge(new, c) - self.__edge(key, c) for c in edges))
+        
+        # Перенос отрезка key[i:j] в другую позицию
+        seg = key[i:j]
+        rest = np.concatenate((key[:i], key[j:]))
+        k = rnd.randrange(0, len(rest) + 1)
+        new = np.concatenate((rest[:k], seg, rest[k:]))
+        return new, self.score(new) - score
+    
+    def apply(self, key, move):
+        return move
+    
+    def result(self, key):
+        return key.tolist()
+
+# Функция _climb() выполняет один запуск поиска: iterations случайных ходов, улучшающие ходы принимаются всегда,
+# ухудшающие - с вероятностью exp(delta / T) (имитация отжига; T линейно убывает от temperature до 0,
+# при temperature = 0 - обычный подъём к вершине). delta и T измеряются в среднем логарифме частоты на n-грамму.
+# Поиск прекращается досрочно, если пригодность достигла threshold или другой запуск установил флаг остановки
+# (см. _search()). Возвращает (пригодность, ключ)
+def _climb(job):
+    problem, restart, seed, iterations, temperature, threshold = job
+    rnd = Random(seed)
+    key = problem.start(rnd, restart)
+    score = problem.score(key)
+    best, bestScore = key.copy(), score
+    
+    for it in range(0, iterations):
+        if threshold is not None and bestScore / problem.total >= threshold:
+            break
+        if _stopFlag is not None and it % STOP_CHECK_PERIOD == 0 and _stopFlag.is_set():
+            break
+        move, d = problem.propose(rnd, key, score)
+        if move is None:
+            continue
+        d /= problem.total
+        t = temperature * (1 - it / iterations)
+        if d >= 0 or (t > 0 and rnd.random() < exp(d / t)):
+            key = problem.apply(key, move)
+            score += d * problem.total
+            if score > bestScore:
+                best, bestScore = key.copy(), score
+    return bestScore / problem.total, problem.result(best)
+
+# Флаг остановки поиска в дочернем процессе (multiprocessing.Event, устанавливается _setStopFlag()); None - флага нет
+_stopFlag = None
+
+# Функция _setStopFlag() - инициализатор процессов пула: запоминает общий флаг остановки поиска
+def _setStopFlag(flag):
+    global _stopFlag
+    _stopFlag = flag
+
+# Функция _search() выполняет restarts запусков поиска (при workers > 1 - в ProcessPoolExecutor) и возвращает лучший
+# результат (ключ, пригодность). Как только какой-либо запуск достиг threshold, ещё не начатые запуски отменяются,
+# а выполняющиеся останавливаются по общему флагу (проверяется каждые STOP_CHECK_PERIOD итераций); их результаты
+# не ожидаются
+def _search(problem, restarts, iterations, temperature, threshold, workers, seed):
+    seeds = Random(seed)
+    jobs = [(problem, r, seeds.getrandbits(64), iterations, temperature, threshold) for r in range(0, restarts)]
+    best = None
+    
+    if workers > 1 and restarts > 1:
+        stop = Event()
+        executor = ProcessPoolExecutor(max_workers = workers, initializer = _setStopFlag, initargs = (stop,))
+        try:
+            futures = [executor.submit(_climb, job) for job in jobs]
+            for future in as_completed(futures):
+                res = future.result()
+                if best is None or res[0] > best[0]:
+                    best = res
+                if threshold is not None and best[0] >= threshold:
+                    stop.set()
+                    break
+        finally:
+            executor.shutdown(wait = False, cancel_futures = True)
+    else:
+        for job in jobs:
+            res = _climb(job)
+            if best is None or res[0] > best[0]:
+                best = res
+            if threshold is not None and best[0] >= threshold:
+                break
+    return best[1], best[0]
+
+# Функция searchSubstitution() подбирает алфавит моноалфавитной подстановки (substMonoMixedAbc()) по функции пригодности fitness.
+# restarts - количество запусков (первый начинается с сопоставления частот, остальные - с его случайных искажений),
+# iterations - количество пробных обменов в запуске, temperature - начальная температура отжига (0 - подъём к вершине),
+# threshold - пригодность, при достижении которой поиск прекращается, workers - количество процессов, seed - зерно ГПСЧ.
+# Возвращает (алфавит, пригодность); алфавит подходит для substMonoMixedAbc(abc, False)
+def searchSubstitution(block, fitness, restarts = 4, iterations = 100000, temperature = 0.0, threshold = None, workers = 1, seed = None):
+    elems, m, table = _fitnessArgs(block, fitness)
+    problem = _SubstitutionSearch(elems, m, table)
+    return _search(problem, restarts, iterations, temperature, threshold, workers, seed)
+
+# Функция searchTransposition() подбирает ключ простой перестановки (transposSimple()) длиной keyLength
+# (целое число или список длин - тогда выбирается лучшая из них). Параметры поиска - как у searchSubstitution().
+# Возвращает (ключ, пригодность); ключ подходит для transposSimple(key, False)
+def searchTransposition(block, fitness, keyLength, restarts = 8, iterations = 5000, temperature = 0.0, threshold = None, workers = 1, seed = None):
+    elems, m, table = _fitnessArgs(block, fitness)
+    lengths = [keyLength] if isinstance(keyLength, int) else [L for L in keyLength if len(elems) % L == 0]
+    if len(lengths) == 0:
+        raise Exception("Размер блока не кратен ни одной из длин ключа")
+    
+    best = None
+    for L in lengths:
+        problem = _TranspositionSearch(elems, m, table, L)
+        res = _search(problem, restarts, iterations, temperature, threshold, workers, seed)
+        if best is None or res[1] > best[1]:
+            best = res
+        if threshold is not None and best[1] >= threshold:
+            break
+    return best
@@ -4,9 +4,26 @@ Created on Tue Jul  7 09:14:38 2020
 
 @author: ktngl
 """
-from math import log, log2
-from random import randint, randrange
-from math import log2, ceil
+from math import log2, gcd, lcm, comb
+from random import randint, SystemRandom
+from array import array
+from itertools import cycle, combinations
+from collections import Counter
+from functools import lru_cache
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from concurrent.futures import Executor, ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+import mmap
+import operator
+import os
+import sys
+
+# NumPy - необязательная зависимость: при её наличии поэлементные преобразования выполняются векторно
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 # Константы, применяемые для обозначения режима отображения элемента блока данных
 RM_DATABLOCK = 0    # Как подблока данных
@@ -17,6 +34,519 @@ RM_BYTES = 3       # Как двоичной последовательност
 elemSize = 8        # Размер элемента в битах, по умолчанию 8
 retMode = RM_DATABLOCK # Режим отображения элемента, по умолчанию - в виде подблока данных
 
+# Глобальные elemSize и retMode - лишь значения по умолчанию. Их можно переопределить:
+#     - для отдельного блока данных (методы setElemSize() и setRetMode());
+#     - для текущего потока или задачи asyncio (контекстный менеджер localConfig()).
+# Действующее значение выбирается в таком порядке: блок -> контекст -> глобальная переменная.
+# Методы блока данных глобальные переменные не изменяют, поэтому независимые блоки можно обрабатывать
+# из разных потоков (ThreadPoolExecutor) и задач asyncio
+_elemSizeVar = ContextVar("elemSize", default = None)
+_retModeVar = ContextVar("retMode", default = None)
+
+# Функция currentElemSize() возвращает размер элемента, действующий в текущем контексте
+def currentElemSize():
+    size = _elemSizeVar.get()
+    if size is None:
+        return elemSize
+    return size
+
+# Функция currentRetMode() возвращает режим отображения элементов, действующий в текущем контексте
+def currentRetMode():
+    mode = _retModeVar.get()
+    if mode is None:
+        return retMode
+    return mode
+
+# Контекстный менеджер localConfig() устанавливает размер элемента size и (или) режим отображения mode
+# только для текущего контекста (потока, задачи asyncio) на время выполнения блока with:
+#     with localConfig(size = 16):
+#         ...
+@contextmanager
+def localConfig(size = None, mode = None):
+    sizeToken = _elemSizeVar.set(size) if size is not None else None
+    modeToken = _retModeVar.set(mode) if mode is not None else None
+    try:
+        yield
+    finally:
+        if sizeToken is not None:
+            _elemSizeVar.reset(sizeToken)
+        if modeToken is not None:
+            _retModeVar.reset(modeToken)
+
+KEY_CACHE_SIZE = 64 # Количество скомпилированных ключей подстановки каждого вида, хранимых в кэше
+PLAN_CACHE_SIZE = 16 # Количество планов перестановки, хранимых в кэше
+PLAN_CACHE_MAX_ELEMS = 1 << 16 # Наибольшая длина плана перестановки, который помещается в кэш (более длинные планы не кэшируются)
+SUBST_WINDOW = 1 << 20 # Количество элементов, обрабатываемых подстановками за один шаг
+PARALLEL_MIN_ELEMS = 1 << 22 # Наименьшее число элементов блока, при котором окупается запуск пула процессов на один вызов
+PARALLEL_EXECUTOR_MIN_ELEMS = 1 << 18 # То же для готового пула процессов, переданного вызывающим кодом
+PARALLEL_WINDOW = 1 << 22 # Количество элементов, передаваемых процессам через разделяемую память за один шаг
+PRIME_SIEVE_LIMIT = 2048 # Граница малых простых чисел, которыми отсеиваются кандидаты при поиске простых чисел
+PRIME_SEARCH_WINDOW = 4096 # Количество нечётных кандидатов, просеиваемых за один шаг поиска простого числа
+BUILDER_RUN = 64 # Количество фрагментов в одной группе таблицы фрагментов DatablockBuilder
+FREQ_BINCOUNT_BITS = 20 # Наибольший размер n-граммы в битах, при котором частоты считаются плотной гистограммой (bincount)
+MULTIPOW_GROUP = 4 # Количество оснований, для которых ModContext.multiPow() строит общую таблицу произведений
+PACK_VECTOR_MIN_ELEMS = 64 # Наименьшее число элементов, при котором они раскладываются и собираются средствами NumPy
+PACK_VECTOR_MAX_SIZE = 57 # Наибольший размер элемента, для которого работает векторная упаковка (элемент со сдвигом - в 8 байтах)
+FLIP_MASKS_CACHE_SIZE = 32 # Количество наборов масок изменённых битов, хранимых в кэше HammingIndex
+
+# Коды типов модуля array, в которых могут храниться элементы блока данных (в порядке возрастания размера)
+_ARRAY_TYPECODES = ("B", "H", "I", "L", "Q")
+
+# Функция _elemTypecode() возвращает код типа array, в который помещается элемент размером size битов.
+# Если элемент не помещается ни в один машинный тип, возвращается None (элементы хранятся в списке)
+def _elemTypecode(size):
+    for code in _ARRAY_TYPECODES:
+        if array(code).itemsize * 8 >= size:
+            return code
+    return None
+
+# Функция _unpackElems() раскладывает целое число value на count элементов размером size битов.
+# Возвращает изменяемый буфер (array или list), элемент с индексом 0 - младший.
+# Работает за линейное время: число один раз переводится в байты, дальше разбирается по небольшим группам
+# (если установлен NumPy - всеми группами сразу, см. _unpackRows())
+def _unpackElems(value, size, count):
+    code = _elemTypecode(size)
+    nbits = size * count
+    value &= (1 << nbits) - 1
+    
+    if code is not None and array(code).itemsize * 8 == size:
+        buf = array(code)
+        buf.frombytes(value.to_bytes(nbits // 8, "little"))
+        if sys.byteorder == "big":
+            buf.byteswap()
+        return buf
+    
+    if np is not None and size <= PACK_VECTOR_MAX_SIZE and count >= PACK_VECTOR_MIN_ELEMS:
+        raw = np.frombuffer(value.to_bytes((nbits + 7) // 8, "little"), dtype = np.uint8)
+        buf = array(code)
+        buf.frombytes(_unpackRows(raw.reshape(1, -1), size, count).tobytes())
+        return buf
+    
+    # Группа - наименьшее число битов, кратное и размеру элемента, и размеру байта
+    group = size * 8 // gcd(size, 8)
+    gbytes = group // 8
+    per = group // size
+    mask = (1 << size) - 1
+    raw = value.to_bytes((nbits + group - 1) // group * gbytes, "little")
+    
+    res = []
+    for pos in range(0, len(raw), gbytes):
+        chunk = int.from_bytes(raw[pos:pos + gbytes], "little")
+        for i in range(0, per):
+            res.append(chunk & mask)
+            chunk >>= size
+    del res[count:]
+    
+    if code is None:
+        return res
+    return array(code, res)
+
+# Функция _packElems() собирает целое число из буфера элементов размером size битов (обратна _unpackElems())
+def _packElems(buf, size):
+    if isinstance(buf, (array, memoryview)) and buf.itemsize * 8 == size:
+        if sys.byteorder == "big" and buf.itemsize > 1:
+            buf = array(buf.typecode, buf)
+            buf.byteswap()
+        return int.from_bytes(buf, "little")
+    
+    view = _numpyView(buf)
+    if view is not None and size <= PACK_VECTOR_MAX_SIZE and len(buf) >= PACK_VECTOR_MIN_ELEMS:
+        return int.from_bytes(_packRows(view.reshape(1, -1), size, (len(buf) * size + 7) // 8).tobytes(), "little")
+    
+    group = size * 8 // gcd(size, 8)
+    gbytes = group // 8
+    per = group // size
+    
+    out = bytearray()
+    for pos in range(0, len(buf), per):
+        chunk = 0
+        for v in reversed(buf[pos:pos + per]):
+            chunk = (chunk << size) | v
+        out += chunk.to_bytes(gbytes, "little")
+    return int.from_bytes(out, "little")
+
+# Функция _matrixDtype() возвращает тип NumPy для элементов размером size битов (элементы длиннее 64 битов не поддерживаются)
+def _matrixDtype(size):
+    code = _elemTypecode(size)
+    if code is None or size <= 0:
+        raise Exception("Размер элемента должен быть от 1 до 64 битов")
+    return np.dtype("u" + str(array(code).itemsize))
+
+# Функция _unpackRows() раскладывает каждую строку матрицы байтов rows (байты - от младшего к старшему)
+# на count элементов размером size битов (size <= PACK_VECTOR_MAX_SIZE); возвращает матрицу элементов.
+# Строка делится на группы по НОК(size, 8) битов. Элемент с номером j внутри группы всегда начинается с одного и того же бита,
+# поэтому j-е элементы всех групп извлекаются сразу: 8 байтов от начала элемента читаются как целое число,
+# сдвигаются и маскируются. Число проходов равно числу элементов в группе (не больше 8)
+def _unpackRows(rows, size, count):
+    group = size * 8 // gcd(size, 8)
+    gbytes = group // 8
+    per = group // size
+    n, nbytes = rows.shape
+    groups = (count + per - 1) // per
+    used = min(nbytes, groups * gbytes)
+    
+    # Группы дополняются 8 нулевыми байтами, чтобы чтение 8 байтов не выходило за границу группы
+    padded = np.zeros((n, groups * gbytes), dtype = np.uint8)
+    padded[:, :used] = rows[:, :used]
+    mat = np.zeros((n, groups, gbytes + 8), dtype = np.uint8)
+    mat[:, :, :gbytes] = padded.reshape(n, groups, gbytes)
+    
+    res = np.empty((n, groups, per), dtype = np.uint64)
+    mask = np.uint64((1 << size) - 1)
+    for j in range(0, per):
+        off, shift = divmod(j * size, 8)
+        words = np.ascontiguousarray(mat[:, :, off:off + 8]).view("<u8")[:, :, 0]
+        res[:, :, j] = (words >> np.uint64(shift)) & mask
+    return res.reshape(n, groups * per)[:, :count].astype(_matrixDtype(size))
+
+# Функция _packRows() собирает каждую строку матрицы элементов matrix (размер элемента size битов) в nbytes байтов
+# (обратна _unpackRows()). Элементы не перекрываются по битам, поэтому j-е элементы всех групп,
+# сдвинутые на своё место, добавляются к байтам групп операцией "или"
+def _packRows(matrix, size, nbytes):
+    group = size * 8 // gcd(size, 8)
+    gbytes = group // 8
+    per = group // size
+    n, count = matrix.shape
+    groups = (count + per - 1) // per
+    
+    vals = np.zeros((n, groups * per), dtype = np.uint64)
+    vals[:, :count] = matrix
+    vals = vals.reshape(n, groups, per)
+    mat = np.zeros((n, groups, gbytes + 8), dtype = np.uint8)
+    for j in range(0, per):
+        off, shift = divmod(j * size, 8)
+        words = (vals[:, :, j] << np.uint64(shift)).astype("<u8")
+        mat[:, :, off:off + 8] |= words.view(np.uint8).reshape(n, groups, 8)
+    
+    res = np.zeros((n, nbytes), dtype = np.uint8)
+    used = min(nbytes, groups * gbytes)
+    res[:, :used] = mat[:, :, :gbytes].reshape(n, groups * gbytes)[:, :used]
+    return res
+
+# Функция unpackElems() раскладывает данные data (целое число или двоичную последовательность, байты - от младшего
+# к старшему) на count элементов размером size битов (по умолчанию - столько, сколько нужно, чтобы вместить все биты).
+# Возвращает буфер элементов (array, для элементов длиннее 64 битов - list) за линейное время
+# при любом размере элемента, в том числе не кратном 8 битам
+def unpackElems(data, size, count = None):
+    if size <= 0:
+        raise Exception("Размер элемента должен быть положительным")
+    if isinstance(data, int):
+        nbits = data.bit_length()
+    else:
+        data = memoryview(data).cast("B")
+        nbits = len(data) * 8
+    if count is None:
+        count = (nbits + size - 1) // size
+    
+    if not isinstance(data, int):
+        code = _elemTypecode(size)
+        if np is not None and code is not None and size <= PACK_VECTOR_MAX_SIZE:
+            # Байты раскладываются без перевода в целое число
+            raw = np.frombuffer(data, dtype = np.uint8)[:(size * count + 7) // 8]
+            buf = array(code)
+            buf.frombytes(_unpackRows(raw.reshape(1, -1), size, count).tobytes())
+            return buf
+        data = int.from_bytes(data, "little")
+    if data < 0:
+        raise Exception("Отрицательные числа на элементы не раскладываются")
+    return _unpackElems(data, size, count)
+
+# Функция packElems() собирает буфер элементов elems размером size битов в двоичную последовательность
+# (len(elems) * size битов, округлённые вверх до целого числа байтов; обратна unpackElems())
+def packElems(elems, size):
+    nbytes = (len(elems) * size + 7) // 8
+    code = _elemTypecode(size)
+    if np is not None and code is not None and size <= PACK_VECTOR_MAX_SIZE:
+        view = np.asarray(elems)
+        if view.size > 0 and (view.min() < 0 or int(view.max()) >> size):
+            raise Exception("Значение элемента не помещается в " + str(size) + " битов")
+        return _packRows(view.astype(np.uint64).reshape(1, -1), size, nbytes).tobytes()
+    
+    if any(v < 0 or v >> size for v in elems):
+        raise Exception("Значение элемента не помещается в " + str(size) + " битов")
+    return _packElems(elems, size).to_bytes(nbytes, "little")
+
+# Функция _numpyView() возвращает массив NumPy, разделяющий память с буфером элементов buf (без копирования).
+# Если NumPy не установлен или буфер не является массивом array или memoryview, возвращается None
+def _numpyView(buf):
+    if np is None or not isinstance(buf, (array, memoryview)):
+        return None
+    return np.frombuffer(buf, dtype="u" + str(buf.itemsize))
+
+# Функция _inverseTable() строит обратную таблицу для алфавита замены abc (элементы размером size битов).
+# inv[v] - индекс первого вхождения v в abc (как у abc.index(v)), либо -1, если v в алфавите нет
+def _inverseTable(abc, size):
+    inv = [-1] * (1 << size)
+    for i in range(len(abc) - 1, -1, -1):
+        v = abc[i]
+        if 0 <= v < len(inv):
+            inv[v] = i
+    return inv
+
+# Функция _windows() разбивает буфер из count элементов на окна, длина которых кратна периоду ключа period.
+# Подстановки обрабатывают буфер по окнам, чтобы временные массивы не зависели от размера блока
+# (это важно для блоков, отображённых на большие файлы, см. Datablock.fromFile())
+def _windows(count, period):
+    window = period * max(1, SUBST_WINDOW // period)
+    for start in range(0, count, window):
+        yield start, min(start + window, count)
+
+# Функция _substShifted() выполняет сдвиговую подстановку элементов буфера buf (размер элемента size битов) на месте.
+# keys - ключи сдвига, применяемые к элементам циклически (один ключ - моноалфавитная подстановка);
+# direction - прямая (True) или обратная (False) подстановка
+def _substShifted(buf, size, keys, direction):
+    m = 1 << size
+    if direction:
+        keys = [k % m for k in keys]
+    else:
+        keys = [(m - k) % m for k in keys]
+    keylen = len(keys)
+    mask = m - 1
+    
+    view = _numpyView(buf)
+    if view is not None:
+        karr = np.array(keys, dtype=view.dtype)
+    
+    for start, end in _windows(len(buf), keylen):
+        if view is not None:
+            # Полные периоды ключа обрабатываются как матрица (строка = период), ключ добавляется ко всем строкам сразу
+            part = view[start:end]
+            full = len(part) - len(part) % keylen
+            body = part[:full].reshape(-1, keylen)
+            body += karr
+            tail = part[full:]
+            tail += karr[:len(tail)]
+            if size < view.itemsize * 8:
+                part &= mask
+            continue
+        
+        if keylen == 1:
+            k = keys[0]
+            res = [(v + k) & mask for v in buf[start:end]]
+        else:
+            res = [(v + k) & mask for v, k in zip(buf[start:end], cycle(keys))]
+        _storeElems(buf, res, start)
+
+# Функция _substTables() выполняет табличную подстановку элементов буфера buf (размер элемента size битов) на месте.
+# tables - таблицы замены, применяемые к элементам циклически (одна таблица - моноалфавитная подстановка).
+# Значение -1 в таблице означает, что замены для элемента нет (см. _inverseTable()).
+# matrix - те же таблицы, заранее собранные в матрицу NumPy (необязательно, см. SubstitutionKey)
+def _substTables(buf, size, tables, matrix = None):
+    m = 1 << size
+    keylen = len(tables)
+    
+    view = _numpyView(buf)
+    if view is not None and matrix is None and len(set(len(t) for t in tables)) == 1:
+        matrix = np.array(tables, dtype=np.int64)
+    
+    for start, end in _windows(len(buf), keylen):
+        if view is not None and matrix is not None:
+            # Все таблицы собраны в одну матрицу, и замена выполняется одной выборкой по индексам
+            part = view[start:end]
+            full = len(part) - len(part) % keylen
+            res = np.empty(len(part), dtype=np.int64)
+            res[:full].reshape(-1, keylen)[...] = matrix[np.arange(keylen), part[:full].reshape(-1, keylen)]
+            res[full:] = matrix[np.arange(len(part) - full), part[full:]]
+            if len(res) > 0:
+                _checkSubstResult(int(res.min()), int(res.max()), m)
+            part[...] = res
+            continue
+        
+        if keylen == 1:
+            t = tables[0]
+            res = [t[v] for v in buf[start:end]]
+        else:
+            res = [t[v] for v, t in zip(buf[start:end], cycle(tables))]
+        if len(res) > 0:
+            _checkSubstResult(min(res), max(res), m)
+        _storeElems(buf, res, start)
+
+# Функция _checkSubstResult() проверяет, что результат подстановки (минимум lo и максимум hi) помещается в элемент
+def _checkSubstResult(lo, hi, m):
+    if lo < 0:
+        raise Exception("Значение элемента отсутствует в алфавите подстановки")
+    if hi >= m:
+        raise Exception("Размер указанного значения превышает установленный размер элемента")
+
+# Функция _storeElems() записывает список значений values в буфер элементов buf, начиная с позиции start
+def _storeElems(buf, values, start = 0):
+    end = start + len(values)
+    if isinstance(buf, array):
+        buf[start:end] = array(buf.typecode, values)
+    elif isinstance(buf, memoryview):
+        buf[start:end] = array(buf.format, values)
+    else:
+        buf[start:end] = values
+
+# Функция _applyTask() выполняет над буфером элементов buf (размер элемента size битов) одно из поэлементных преобразований:
+#     "shift" - сдвиговая подстановка, args = (ключи, направление);
+#     "tables" - табличная подстановка, args = (таблицы, матрица NumPy или None);
+#     "simple" - простая перестановка, args = (ключ, направление)
+def _applyTask(buf, size, task, args):
+    if task == "shift":
+        _substShifted(buf, size, *args)
+    elif task == "tables":
+        _substTables(buf, size, *args)
+    else:
+        _transposBuffer(buf, "simple", args[0], (), args[1])
+
+# Функция _runTask() выполняет преобразование task (см. _applyTask()) над буфером buf параллельно, если workers -
+# число процессов больше 1 или готовый пул процессов (concurrent.futures.Executor). Переданный пул используется
+# повторно и не закрывается, поэтому при частых вызовах процессы не запускаются заново каждый раз.
+# Буфер делится на части, кратные периоду преобразования period (длине ключа), поэтому результат совпадает с
+# последовательной обработкой бит в бит. Данные передаются процессам через разделяемую память (SharedMemory),
+# а не сериализацией, окнами по PARALLEL_WINDOW элементов - блоки, отображённые на файл, не копируются целиком.
+# Последовательно обрабатываются:
+#     небольшие блоки (меньше PARALLEL_MIN_ELEMS элементов, с готовым пулом - PARALLEL_EXECUTOR_MIN_ELEMS);
+#     блоки с элементами длиннее 64 битов;
+#     сдвиговые подстановки при установленном NumPy - копирование в разделяемую память дольше самой подстановки
+# Примечание: на платформах, где процессы запускаются методом spawn (Windows, macOS), вызывающий код
+# должен быть защищён условием if __name__ == "__main__"
+def _runTask(buf, size, task, args, period, workers):
+    count = len(buf)
+    if isinstance(workers, Executor):
+        parts = os.cpu_count() or 1
+        minElems = PARALLEL_EXECUTOR_MIN_ELEMS
+    else:
+        parts = workers
+        minElems = PARALLEL_MIN_ELEMS
+    if (parts <= 1 or count < minElems or not isinstance(buf, (array, memoryview))
+            or (task == "shift" and np is not None)):
+        _applyTask(buf, size, task, args)
+        return
+    
+    code = buf.format if isinstance(buf, memoryview) else buf.typecode
+    itemsize = buf.itemsize
+    window = min(count, max(1, PARALLEL_WINDOW // period) * period)
+    raw = memoryview(buf).cast("B")
+    shm = SharedMemory(create = True, size = window * itemsize)
+    try:
+        if isinstance(workers, Executor):
+            pool = nullcontext(workers)
+        else:
+            pool = ProcessPoolExecutor(max_workers = workers)
+        with pool as executor:
+            for wstart in range(0, count, window):
+                n = min(window, count - wstart)
+                lo, hi = wstart * itemsize, (wstart + n) * itemsize
+                shm.buf[:hi - lo] = raw[lo:hi]
+                step = (n + period * parts - 1) // (period * parts) * period
+                jobs = [(shm.name, code, start, min(start + step, n), size, task, args) for start in range(0, n, step)]
+                for done in executor.map(_parallelWorker, jobs):
+                    pass
+                raw[lo:hi] = shm.buf[:hi - lo]
+    finally:
+        raw.release()
+        shm.close()
+        shm.unlink()
+
+# Функция _parallelWorker() обрабатывает в дочернем процессе часть буфера, находящегося в разделяемой памяти
+def _parallelWorker(job):
+    name, code, start, end, size, task, args = job
+    shm = SharedMemory(name = name)
+    try:
+        whole = shm.buf.cast(code)
+        part = whole[start:end]
+        try:
+            _applyTask(part, size, task, args)
+        finally:
+            part.release()
+            whole.release()
+    finally:
+        shm.close()
+    return end - start
+
+# Функция _copyElems() возвращает независимую копию буфера элементов buf
+def _copyElems(buf):
+    if isinstance(buf, memoryview):
+        res = array(buf.format)
+        res.frombytes(buf.cast("B"))
+        return res
+    return buf[:]
+
+# Функция _findAligned() перебирает вхождения needle в двоичную последовательность hay, начинающиеся на границе
+# элемента (позиция кратна itemsize байтам), начиная с элемента start. Возвращает номера элементов.
+# Поиск выполняет bytes.find(); вхождение не на границе элемента пропускается до следующей границы
+def _findAligned(hay, needle, itemsize, start):
+    pos = start * itemsize
+    while True:
+        p = hay.find(needle, pos)
+        if p < 0:
+            return
+        if p % itemsize == 0:
+            yield p // itemsize
+            pos = p + itemsize
+        else:
+            pos = p - p % itemsize + itemsize
+
+# Функция _horspool() перебирает вхождения последовательности pat в последовательность hay начиная с позиции start
+# (алгоритм Бойера-Мура-Хорспула). Используется для элементов длиннее 64 битов, которые хранятся в списке
+def _horspool(hay, pat, start):
+    m = len(pat)
+    shift = {}
+    for i, v in enumerate(pat[:-1]):
+        shift[v] = m - 1 - i
+    last = pat[-1]
+    
+    i = start
+    while i + m <= len(hay):
+        v = hay[i + m - 1]
+        if v == last and hay[i:i + m] == pat:
+            yield i
+        i += shift.get(v, m)
+
+# Вес Хемминга каждого значения байта и таблицы перевода между битами (байты 0 и 1) и символами "0" и "1"
+_BYTE_WEIGHTS = bytes(bin(i).count("1") for i in range(0, 256))
+_BITS_TO_CHARS = bytes.maketrans(b"\x00\x01", b"01")
+_CHARS_TO_BITS = bytes.maketrans(b"01", b"\x00\x01")
+
+# Функция _requireNumpy() проверяет, что NumPy установлен (для методов, которые возвращают или принимают массивы NumPy)
+def _requireNumpy():
+    if np is None:
+        raise Exception("Для этой операции требуется NumPy")
+
+# Функция _joinElems() возвращает новый буфер элементов: элементы first, за которыми следуют элементы second
+def _joinElems(first, second):
+    res = _copyElems(first)
+    if isinstance(res, array) and isinstance(second, (array, memoryview)):
+        res.frombytes(memoryview(second).cast("B"))
+    else:
+        res.extend(second)
+    return res
+
+# Функция _isNativeElemSize() проверяет, что элемент размером size битов совпадает с машинным типом
+# и может храниться в памяти "как есть" (байты от младшего к старшему)
+def _isNativeElemSize(size):
+    code = _elemTypecode(size)
+    return code is not None and array(code).itemsize * 8 == size and (size == 8 or sys.byteorder == "little")
+
+# Функция _bytesToInt() переводит двоичную последовательность в целое число (байты - от младшего к старшему, как fromBytes())
+def _bytesToInt(value):
+    return int.from_bytes(value, "little")
+
+# Преобразования операндов в целые числа по точному типу операнда (int и Datablock проверяются раньше)
+_INT_COERCIONS = {bool: int, bytes: _bytesToInt, bytearray: _bytesToInt, memoryview: _bytesToInt}
+
+# Функция _toInt() переводит операнд value в целое число: блок данных - в его значение, двоичную последовательность
+# (bytes, bytearray, memoryview) - как fromBytes(), bool, целые числа NumPy и любые объекты с методом __index__() -
+# в соответствующее целое число. Если операнд перевести нельзя, возвращается None.
+# Тип операнда ищется в словаре (без сравнения строковых имён типов), поэтому перевод не зависит от того,
+# под каким именем импортирован модуль
+def _toInt(value):
+    if type(value) is int:
+        return value
+    if isinstance(value, Datablock):
+        return value.asInt()
+    conv = _INT_COERCIONS.get(type(value))
+    if conv is not None:
+        return conv(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return _bytesToInt(value)
+    try:
+        return operator.index(value)
+    except TypeError:
+        return None
+
     
 # Класс Datablock описывает объект, способный вести себя одновременно как:
 #     - натуральное число;
@@ -25,31 +555,164 @@ retMode = RM_DATABLOCK # Режим отображения элемента, п
 #     - __value - значение блока данных, целое число (фактически - неотрицательное);
 #     - __bitSize - установленный размер блока данных в битах.
 # Примечание: значение __bitSize может быть не равным реальному размеру поля __value
+#
+# Кроме того, блок может хранить свои элементы в компактном изменяемом буфере (array или list):
+#     - __elems - буфер элементов размером __elemsSize битов (None, если буфер не создан);
+#     - __elemsHigh - биты значения, лежащие выше последнего элемента (сохраняются при записи элементов).
+# Блок, созданный методом fromFile(), хранит ещё и отображение файла в память (__mapping), см. ниже.
+# Поля __elemSize и __retMode - собственные размер элемента и режим отображения блока (None - действуют общие настройки).
+# Буфер создаётся при первом обращении к элементу по индексу. Запись элемента меняет только буфер,
+# а поле __value при этом сбрасывается в None и пересобирается лишь тогда, когда оно действительно нужно
+# (asInt(), арифметика, modPow() и т. п.). Поэлементные циклы поэтому работают за линейное время.
 class Datablock:
+    # Поля хранятся в слотах, а не в словаре экземпляра: блоки получаются компактнее и быстрее создаются
+    # (арифметика создаёт много временных блоков)
+    __slots__ = ("__value", "__bitSize", "__elems", "__elemsSize", "__elemsHigh", "__mapping", "__elemSize", "__retMode")
+    
     # Конструктор по умолчанию устанавливает нулевое значение блока данных и нулевой размер
     def __init__(self):
         self.__value = 0
         self.__bitSize = 0
+        self.__elems = None
+        self.__elemsSize = 0
+        self.__elemsHigh = 0
+        self.__mapping = None
+        self.__elemSize = None
+        self.__retMode = None
+    
+    # Метод getElemSize() возвращает размер элемента, действующий для блока:
+    # собственный (см. setElemSize()), иначе - заданный в текущем контексте, иначе - глобальный elemSize
+    def getElemSize(self):
+        if self.__elemSize is not None:
+            return self.__elemSize
+        size = _elemSizeVar.get()
+        if size is None:
+            return elemSize
+        return size
+    
+    # Метод setElemSize() устанавливает собственный размер элемента блока (None - использовать общий)
+    # Возвращает ссылку на самого себя
+    def setElemSize(self, size):
+        self.__elemSize = size
+        return self
+    
+    # Метод getRetMode() возвращает режим отображения элементов, действующий для блока (аналогично getElemSize())
+    def getRetMode(self):
+        if self.__retMode is not None:
+            return self.__retMode
+        mode = _retModeVar.get()
+        if mode is None:
+            return retMode
+        return mode
+    
+    # Метод setRetMode() устанавливает собственный режим отображения элементов блока (None - использовать общий)
+    # Возвращает ссылку на самого себя
+    def setRetMode(self, mode):
+        self.__retMode = mode
+        return self
+    
+    # Вспомогательный метод __derive() создаёт пустой блок с теми же собственными настройками, что у текущего
+    def __derive(self):
+        dblock = Datablock()
+        dblock.__elemSize = self.__elemSize
+        dblock.__retMode = self.__retMode
+        return dblock
+    
+    # Вспомогательный метод __getValue() возвращает значение блока в виде целого числа,
+    # при необходимости собирая его из буфера элементов
+    def __getValue(self):
+        if self.__value is None:
+            self.__value = _packElems(self.__elems, self.__elemsSize) + (self.__elemsHigh << (len(self.__elems) * self.__elemsSize))
+        return self.__value
+    
+    # Вспомогательный метод __setValue() устанавливает значение блока и сбрасывает буфер элементов
+    def __setValue(self, val):
+        self.__value = val
+        self.__elems = None
+    
+    # Вспомогательный метод __getElems() возвращает буфер элементов текущего размера elemSize,
+    # при необходимости раскладывая значение блока на элементы
+    def __getElems(self):
+        es = self.getElemSize()
+        if self.__elems is None or self.__elemsSize != es:
+            val = self.__getValue()
+            count = len(self)
+            self.__elems = _unpackElems(val, es, count)
+            self.__elemsSize = es
+            self.__elemsHigh = val >> (count * es)
+        return self.__elems
+    
+    # Вспомогательный метод __elemsForRewrite() готовит буфер элементов к перезаписи всех элементов сразу.
+    # Неполный последний элемент обрезается до установленного размера блока, а размер блока дополняется
+    # до целого числа элементов - так же, как это происходит при поэлементной записи через self[i]
+    def __elemsForRewrite(self):
+        es = self.getElemSize()
+        elems = self.__getElems()
+        count = len(elems)
+        if count > 0:
+            tail = self.__bitSize - (count - 1) * es
+            if tail < es:
+                elems[count - 1] &= (1 << tail) - 1
+            self.__bitSize = count * es
+        self.__value = None
+        return elems
         
     # Метод asBytes() возвращает содержимое блока данных в виде двоичной последовательности
+    # (старшие нулевые байты отбрасываются)
     def asBytes(self):
-        barr = bytearray()
-        v = self.__value
-        while v != 0:
-            barr.append(v % 256)
-            v >>= 8
-        return bytes(barr)
+        v = self.__getValue()
+        return v.to_bytes((v.bit_length() + 7) // 8, "little")
+    
+    # Метод asBuffer() возвращает содержимое блока данных в виде memoryview: getBitSize() битов,
+    # округлённые вверх до целого числа байтов, байты - от младшего к старшему.
+    # Если размер элемента равен 8, 16, 32 или 64 битам, копия не создаётся: memoryview ссылается прямо
+    # на буфер элементов блока (и на память исходного буфера, если блок создан методом fromBuffer()).
+    # Пока такой memoryview не освобождён (release()), размер блока нельзя менять: insert(), setBitSize() и другие
+    # методы, меняющие число элементов, завершаются ошибкой BufferError.
+    # Исключение - блоки, у которых в последнем байте установлены биты за пределами getBitSize() (например, после
+    # setBitSize()): эти биты обнуляются в копии.
+    # Результат можно сразу передавать в file.write(), socket.sendall() и т. п.
+    def asBuffer(self):
+        es = self.getElemSize()
+        nbytes = (self.__bitSize + 7) // 8
+        if _isNativeElemSize(es):
+            view = memoryview(self.__getElems()).cast("B")[:nbytes]
+            tail = self.__bitSize % 8
+            if tail == 0 or view[nbytes - 1] >> tail == 0:
+                return view
+            res = bytearray(view)
+            view.release()
+            res[-1] &= (1 << tail) - 1
+            return memoryview(res)
+        val = self.__getValue() & ((1 << self.__bitSize) - 1)
+        return memoryview(bytearray(val.to_bytes(nbytes, "little")))
+    
+    # Метод asElems() возвращает копию буфера элементов блока (array или, для элементов длиннее 64 битов, list).
+    # Элемент с индексом 0 - младший, неполный последний элемент обрезан до размера блока
+    def asElems(self):
+        return _copyElems(self.__elemValues())
+    
+    # Метод writeTo() записывает содержимое блока (см. asBuffer()) в двоичный файл или иной объект с методом write().
+    # Если размер блока не кратен 8, копируется только последний байт (с обнулёнными лишними битами)
+    def writeTo(self, f):
+        es = self.getElemSize()
+        if not _isNativeElemSize(es) or self.__bitSize % 8 == 0:
+            return f.write(self.asBuffer())
+        nbytes = (self.__bitSize + 7) // 8
+        with memoryview(self.__getElems()).cast("B") as raw:
+            last = raw[nbytes - 1] & ((1 << (self.__bitSize % 8)) - 1)
+            return f.write(raw[:nbytes - 1]) + f.write(bytes([last]))
         
     # Метод asInt() возвращает содержимое блока данных в виде большого целого числа
     def asInt(self, base = 10):
         if base == 2:
-            return bin(self.__value)
+            return bin(self.__getValue())
         elif base == 8:
-            return oct(self.__value)
+            return oct(self.__getValue())
         elif base == 16:
-            return hex(self.__value)
+            return hex(self.__getValue())
         else:
-            return self.__value
+            return self.__getValue()
     
     # Метод asText() возвращает содержимое блока данных в виде текста.
     # Иначе говоря, возвращает строку, закодированную значением self.__value.
@@ -63,16 +726,20 @@ class Datablock:
         return s
 
     # Метод asBitArray() представляет значение блока данных в виде двоичного массива
+    # Биты переводятся в байты 0 и 1 одним вызовом (unpackbits или перевод двоичной записи числа), без цикла по битам
     def asBitArray(self):
         if self.__bitSize == 0:
             return []
-        
-        res = []
-        val = self.__value
-        for i in range(0, self.__bitSize):
-            res.append(val % 2)
-            val >>= 1
-        return res
+        if np is not None:
+            return self.asBitVector().tolist()
+        val = self.__getValue() & ((1 << self.__bitSize) - 1)
+        return list(format(val, "0" + str(self.__bitSize) + "b")[::-1].encode().translate(_CHARS_TO_BITS))
+    
+    # Метод asBitVector() возвращает биты блока (getBitSize() штук, начиная с младшего) в виде массива NumPy uint8 из 0 и 1
+    def asBitVector(self):
+        _requireNumpy()
+        raw = np.frombuffer(self.asBuffer(), dtype = np.uint8)
+        return np.unpackbits(raw, count = self.__bitSize, bitorder = "little")
     
     # Метод getBitSize() возвращает установленный размер блока в битах
     def getBitSize(self):
@@ -80,42 +747,178 @@ class Datablock:
     
     # Метод wt возвращает вес Хемминга для блока данных
     def wt(self):
-        v = self.__value
-        res = 0
+        return self.__getValue().bit_count()
     
-        while v != 0:
-            res += v % 2
-            v >>= 1
+    # Метод hammingDistance() возвращает расстояние Хемминга между блоком и other (блоком данных или целым числом)
+    def hammingDistance(self, other):
+        return (self.__getValue() ^ self.__otherToInt(other)).bit_count()
     
-        return res
+    # Метод wtElems() возвращает веса Хемминга всех элементов блока (array типа "B"; для элементов длиннее 255 битов - list)
+    def wtElems(self):
+        elems = self.__elemValues()
+        if isinstance(elems, list):
+            if self.getElemSize() > 255:
+                return [v.bit_count() for v in elems]
+            return array("B", [v.bit_count() for v in elems])
+        
+        raw = memoryview(elems).cast("B")
+        if elems.itemsize == 1:
+            return array("B", raw.tobytes().translate(_BYTE_WEIGHTS))
+        if np is not None:
+            weights = np.frombuffer(_BYTE_WEIGHTS, dtype = np.uint8)[np.frombuffer(raw, dtype = np.uint8)]
+            return array("B", weights.reshape(-1, elems.itemsize).sum(axis = 1, dtype = np.uint8).tobytes())
+        return array("B", [v.bit_count() for v in elems])
     
     # Метод fromDatablock() инициализирует значение блока данных на основе блока данных other
     # Возвращает ссылку на самого себя
+    # Если у other есть актуальный буфер элементов, копируется буфер, а целое число не собирается
     def fromDatablock(self, other):
-        self.__value = other.asInt()
+        if other.__value is None:
+            self.__value = None
+            self.__elems = _copyElems(other.__elems)
+            self.__elemsSize = other.__elemsSize
+            self.__elemsHigh = other.__elemsHigh
+        else:
+            self.__setValue(other.__value)
         self.__bitSize = other.getBitSize()
         return self
     
     # Метод fromBytes() инициализирует значение блока данных на основе последовательности двоичных данных bts
     # Возвращает ссылку на самого себя
     def fromBytes(self, bts):
-        res = 0
-        for i in range(len(bts), 0, -1):
-            res += bts[i - 1]
-            if i != 1:
-                res <<= 8
-        self.__value = res
-        self.__bitSize = ceil(log2(res + 1))
+        res = int.from_bytes(bts, "little")
+        self.__setValue(res)
+        self.__bitSize = res.bit_length()
+        return self
+    
+    # Метод fromFile() отображает файл path в память (mmap) и делает его содержимое значением блока данных.
+    # Элементы блока хранятся прямо в отображённых страницах файла, поэтому __getitem__, __setitem__, subblock(),
+    # методы subst* и т. п. работают с файлом на месте: в памяти находятся лишь страницы, к которым идёт обращение,
+    # а подстановки обрабатывают блок окнами по SUBST_WINDOW элементов.
+    # Если writable = False, изменения блока не попадают в файл (отображение "копирование при записи").
+    # Размер элемента должен быть 8, 16, 32 или 64 битам и не должен меняться, пока блок используется;
+    # методы, которым нужно целое значение (asInt(), арифметика, перестановки и т. п.), загружают файл в память целиком.
+    # После работы блок нужно закрыть методом close() (или использовать его в операторе with).
+    # Возвращает ссылку на самого себя
+    def fromFile(self, path, writable = True):
+        es = self.getElemSize()
+        if not _isNativeElemSize(es):
+            raise Exception("Отображение файла в память поддерживается только для элементов размером 8, 16, 32 или 64 бита")
+        
+        with open(path, "r+b" if writable else "rb") as f:
+            f.seek(0, 2)
+            size = f.tell()
+            if size * 8 % es != 0:
+                raise Exception("Размер файла не кратен размеру элемента")
+            if size == 0:
+                return self.fromInt(0)
+            mapping = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_COPY)
+        
+        self.close()
+        self.fromBuffer(mapping)
+        self.__mapping = mapping
+        return self
+    
+    # Метод flush() сбрасывает изменения блока, отображённого на файл, на диск
+    def flush(self):
+        if self.__mapping is not None:
+            self.__mapping.flush()
+        return self
+    
+    # Метод close() закрывает отображение файла (см. fromFile()); после этого блок становится пустым.
+    # Для блоков, не связанных с файлом, ничего не делает.
+    # Все представления памяти файла, полученные от блока (например, asBuffer()), должны быть освобождены
+    # до закрытия (memoryview.release() или выход из with); иначе close() выбрасывает исключение, а блок остаётся открытым
+    def close(self):
+        if self.__mapping is None:
+            return self
+        elems = self.__elems
+        if isinstance(elems, memoryview):
+            code = elems.format
+            count = len(elems)
+            elems.release()
+        try:
+            self.__mapping.close()
+        except BufferError:
+            # Отображение ещё используется: буфер элементов восстанавливается, блок по-прежнему связан с файлом
+            if isinstance(elems, memoryview):
+                self.__elems = memoryview(self.__mapping).cast(code)[:count]
+            raise Exception("Нельзя закрыть файл: остались неосвобождённые представления его памяти (memoryview)")
+        self.__mapping = None
+        self.__elems = None
+        self.__value = 0
+        self.__bitSize = 0
+        return self
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+    
+    # Метод fromBuffer() инициализирует блок данных содержимым буфера buf (bytes, bytearray, memoryview, mmap и т. п.).
+    # В отличие от fromBytes(), размер блока равен размеру буфера: старшие нулевые байты не отбрасываются.
+    # Если буфер изменяемый, а размер элемента равен 8, 16, 32 или 64 битам, данные не копируются:
+    # элементы блока хранятся прямо в памяти буфера, и запись элементов (в том числе методами subst* и transpos*)
+    # изменяет сам буфер. Операции, заменяющие значение блока целиком (fromInt(), арифметика и т. п.), эту связь разрывают.
+    # Возвращает ссылку на самого себя
+    def fromBuffer(self, buf):
+        es = self.getElemSize()
+        mv = memoryview(buf).cast("B")
+        
+        if _isNativeElemSize(es) and len(mv) * 8 % es == 0:
+            code = _elemTypecode(es)
+            if mv.readonly:
+                elems = array(code)
+                elems.frombytes(mv)
+            else:
+                elems = mv.cast(code)
+            self.__value = None
+            self.__elems = elems
+            self.__elemsSize = es
+            self.__elemsHigh = 0
+        else:
+            self.__setValue(int.from_bytes(mv, "little"))
+        
+        self.__bitSize = len(mv) * 8
+        return self
+    
+    # Метод fromElems() инициализирует блок последовательностью элементов elems (целых чисел размером elemSize битов);
+    # размер блока - len(elems) * elemSize. Если elems - array подходящего типа (см. asElems()), он не копируется,
+    # а становится буфером элементов блока. Возвращает ссылку на самого себя
+    def fromElems(self, elems):
+        es = self.getElemSize()
+        code = _elemTypecode(es)
+        if code is None:
+            buf = list(elems)
+        elif isinstance(elems, array) and elems.typecode == code:
+            buf = elems
+        else:
+            buf = array(code, elems)
+        
+        if len(buf) > 0 and (code is None or es < buf.itemsize * 8):
+            view = _numpyView(buf)
+            if view is not None:
+                high = int(view.max())
+            else:
+                high = max(buf)
+            if high >> es or (code is None and min(buf) < 0):
+                raise Exception("Значение элемента не помещается в " + str(es) + " битов")
+        
+        self.__value = None
+        self.__elems = buf
+        self.__elemsSize = es
+        self.__elemsHigh = 0
+        self.__bitSize = len(buf) * es
         return self
-
     
     # Метод fromInt() инициализирует значение блока данных на основе целого числа val
     # Возвращает ссылку на самого себя
     def fromInt(self, val):
         if val < 0:
             raise Exception("Отрицательные числа в блок данных не переводятся")
-        self.__value = val
-        self.__bitSize = ceil(log2(val + 1))
+        self.__setValue(val)
+        self.__bitSize = val.bit_length()
         return self
     
     # Метод fromText() инициализирует значение блока данных на основе строки s, используя кодировку encoding
@@ -126,16 +929,40 @@ class Datablock:
     
     # Метод fromBitArray() инициализирует значение блока данных на основе строки двоичного массива
     # Возвращает ссылку на самого себя
+    # Массив из нулей и единиц переводится в число одним вызовом; иные значения складываются как arr[i] * 2 ** i
     def fromBitArray(self, arr):
-        self.__value = 0
-        for i in range(0, len(arr)):
-            self.__value += arr[i] * 2 ** i
+        if np is not None and isinstance(arr, np.ndarray):
+            return self.fromBitVector(arr)
+        try:
+            bits = bytes(arr)
+        except (TypeError, ValueError):
+            bits = None
+        
+        if bits is not None and len(bits.translate(None, b"\x00\x01")) == 0:
+            val = int(bits[::-1].translate(_BITS_TO_CHARS), 2) if len(bits) > 0 else 0
+        else:
+            val = 0
+            for i in range(0, len(arr)):
+                val += arr[i] << i
+        self.__setValue(val)
         self.__bitSize = len(arr)
         return self
     
+    # Метод fromBitVector() инициализирует блок битами из массива NumPy (0 и 1, начиная с младшего бита);
+    # размер блока - длина массива. Возвращает ссылку на самого себя
+    def fromBitVector(self, vec):
+        _requireNumpy()
+        vec = np.asarray(vec)
+        if vec.size > 0 and (vec.min() < 0 or vec.max() > 1):
+            raise Exception("Битовый вектор должен состоять из нулей и единиц")
+        packed = np.packbits(vec.astype(np.uint8, copy = False), bitorder = "little")
+        self.__setValue(int.from_bytes(packed.tobytes(), "little"))
+        self.__bitSize = len(vec)
+        return self
+    
     # Метод clone() возвращает точную копию блока данных self ("клонирует" текущий объект)
     def clone(self):
-        dblock = Datablock().fromDatablock(self)
+        dblock = self.__derive().fromDatablock(self)
         return dblock
     
     # Вспомогательный метод __subb() возвращает подблок на основе битовой подпоследовательности,
@@ -148,7 +975,7 @@ class Datablock:
         if wherefrom < 0:
             raise Exception("Индекс должен быть неортицательной величиной")
         
-        val = self.__value
+        val = self.__getValue()
         val >>= wherefrom
         val %= 2 ** howmany
         dblock = Datablock().fromInt(val)
@@ -160,87 +987,123 @@ class Datablock:
         # howmany - устанавливаемый размер;
         # cutIfNotZeros - принудительное "урезание" блока, если его размер уменьшается, а "отбрасываемые" старшие разряды (хотя бы некоторые) не нулевые
         #     если True, то уменьшение размер меняется в любом случае, даже в сторону уменьшения, с возможной потерей ненулевых битов
+    # Если элементы блока разложены в буфер, размер меняется прямо в буфере: у блока, отображённого на файл
+    # или созданного fromBuffer(), буфер остаётся общим с внешней памятью (увеличить такой блок сверх размера буфера нельзя)
     def setBitSize(self, howmany, cutIfNotZeros = False):
-        if howmany > 0:
-            if self.__value > 2 ** howmany and cutIfNotZeros:
-                self.__value %= 2 ** howmany
-            self.__bitSize = howmany
+        if howmany <= 0:
+            return self
+        cut = cutIfNotZeros and self.__getValue() > 2 ** howmany
+        if cut:
+            self.__value %= 2 ** howmany
+        if self.__elems is not None:
+            self.__resizeElems(howmany, cut)
+        self.__bitSize = howmany
         return self
+    
+    # Вспомогательный метод __resizeElems() приводит буфер элементов к размеру блока howmany битов.
+    # Значение блока не меняется: лишние элементы переносятся в __elemsHigh, недостающие берутся из него.
+    # Если cut = True, биты начиная с howmany отбрасываются (последний элемент обрезается)
+    def __resizeElems(self, howmany, cut):
+        es = self.__elemsSize
+        elems = self.__elems
+        count = len(elems)
+        newCount = (howmany + es - 1) // es
+        
+        if newCount > count:
+            if isinstance(elems, memoryview):
+                raise Exception("Размер блока, хранящегося во внешнем буфере, нельзя увеличить больше размера буфера")
+            elems.extend(_unpackElems(self.__elemsHigh, es, newCount - count))
+            self.__elemsHigh >>= (newCount - count) * es
+        elif newCount < count:
+            if not cut:
+                rest = _packElems(elems[newCount:], es)
+                self.__elemsHigh = rest + (self.__elemsHigh << ((count - newCount) * es))
+            if isinstance(elems, memoryview):
+                self.__elems = elems[:newCount]
+            else:
+                del elems[newCount:]
+        
+        if cut:
+            self.__elemsHigh = 0
+            tail = howmany - (newCount - 1) * es
+            if newCount > 0 and tail < es:
+                self.__elems[newCount - 1] &= (1 << tail) - 1
 
     # Перегружаемый метод __str__ отвечает за строковое представление блока данных, в том числе при его выводе с помощью функции print()
     # Способ представления зависит от установленного режима отображения (retMode)
     def __str__(self):
-        global retMode
-        if retMode == RM_BYTES:
+        rm = self.getRetMode()
+        if rm == RM_BYTES:
             return str(self.asBytes())
-        if retMode == RM_INT:
-            return str(self.__value)
-        if retMode == RM_TEXT:
+        if rm == RM_INT:
+            return str(self.__getValue())
+        if rm == RM_TEXT:
             return self.asText()
-        return "В строковом виде: " + self.asText() + "; в числовом виде: " + str(hex(self.__value)) + "; размер в битах: " + str(self.getBitSize())
+        return "В строковом виде: " + self.asText() + "; в числовом виде: " + str(hex(self.__getValue())) + "; размер в битах: " + str(self.getBitSize())
 
     def __len__(self):
-        res = self.__bitSize // elemSize
-        if self.__bitSize % elemSize > 0:
+        es = self.getElemSize()
+        res = self.__bitSize // es
+        if self.__bitSize % es > 0:
             res += 1
         return res
 
     # Перегрузка операции индексирования
     # Общая идея: по индексу можно обратиться к элементу двоичной последовательности размером elemSize битов
     # При этом элемент представляется в виде, задаваемом режимом отображения
+    # Элементы читаются из буфера элементов (см. __getElems()), поэтому чтение не требует сдвигов большого числа
     def __getitem__(self, key):
-        firstBitIndex = key * elemSize
-        if firstBitIndex > self.__bitSize:
+        es = self.getElemSize()
+        rm = self.getRetMode()
+        firstBitIndex = key * es
+        if key < 0 or firstBitIndex >= self.__bitSize:
             raise Exception("Индекс вне границ блока данных")
-        lastBitIndex = firstBitIndex + elemSize
-        if lastBitIndex > self.__bitSize:
-            lastBitIndex = self.__bitSize
-        dblock = self.__subb(firstBitIndex, lastBitIndex - firstBitIndex)
-        if retMode == RM_BYTES:
+        val = self.__getElems()[key]
+        howmany = es
+        if firstBitIndex + es > self.__bitSize:
+            # Последний элемент неполный: отбрасываются биты за пределами установленного размера
+            howmany = self.__bitSize - firstBitIndex
+            val &= (1 << howmany) - 1
+        if rm == RM_INT:
+            return val
+        dblock = self.__derive().fromInt(val).setBitSize(howmany)
+        if rm == RM_BYTES:
             return dblock.asBytes()
-        elif retMode == RM_DATABLOCK:
+        elif rm == RM_DATABLOCK:
             return dblock
-        elif retMode == RM_INT:
+        elif rm == RM_INT:
             return dblock.asInt()
-        elif retMode == RM_TEXT:
+        elif rm == RM_TEXT:
             return dblock.asText()
         else:
             raise Exception("Странный режим отображения элементов тут у вас")
             
     
     def __setitem__(self, key, value):
+        es = self.getElemSize()
+        if key < 0:
+            raise Exception("Индекс вне границ блока данных")
         if key >= len(self):
             raise Exception("Индекс превышает длину блока данных")
-        if str(type(value)) == "<class 'datablocks.Datablock'>" or str(type(value)) == "<class 'Datablock'>":
-            val = value.asInt()
-        elif str(type(value)) == "<class 'bytes'>":
-            val = Datablock().fromBytes(value).asInt()
-        elif str(type(value)) == "<class 'str'>":
+        if type(value) is str:
             val = Datablock().fromText(value).asInt()
-        elif str(type(value)) == "<class 'int'>":
-            val = value
         else:
+            val = _toInt(value)
+        if val is None:
             raise Exception("Недопустимое присваивание: попытка присвоить значение типа " + str(type(value)) + " подблоку данных")
         
         if val < 0:
             raise Exception("Отрицательные значения не допускаются")
-        if val >= 2 ** elemSize:
+        if val >= 2 ** es:
             raise Exception("Размер указанного значения превышает установленный размер элемента")
         
-        firstBitIndex = key * elemSize
-        lastBitIndex = (key + 1) * elemSize
+        # Запись идёт только в буфер элементов, целое значение будет собрано при необходимости
+        self.__getElems()[key] = val
+        self.__value = None
         
+        lastBitIndex = (key + 1) * es
         if lastBitIndex > self.__bitSize:
-            self.setBitSize(lastBitIndex)
-        
-        bsz = self.getBitSize()
-        
-        res = self.__value >> lastBitIndex
-        res <<= lastBitIndex
-        res += val << firstBitIndex
-        res += self.__value % 2 ** firstBitIndex
-        
-        self.fromInt(res).setBitSize(bsz)
+            self.__bitSize = lastBitIndex
 
     # Метод random() устанавливает случайное значение блока данных, имеющие размер size битов
     def random(self, size):
@@ -248,263 +1111,329 @@ class Datablock:
         self.setBitSize(size)
         return self
 
-    # не работает!
+    # Метод probablePrime() устанавливает значением блока случайное (вероятно) простое число размером size битов
+    # (см. generatePrime()). Возвращает ссылку на самого себя
     def probablePrime(self, size):
-        while True:
-            self.random(size)
-            
-            if self.__value % 2 == 0:
-                self.__value += 1
-                self.__value %= 2 ** size
-            
-            isPrime = True
-            
-            for i in range(0, 64):
-                a = randint(2, self.__value)
-                qwe = pow(a, self.__value - 1, self.__value)
-                if qwe != 1:
-                    isPrime = False
-                    print("is not prime; ", pow(a, self.__value - 1, self.__value))
-                    break
-            
-            if isPrime:
-                break
-            
-        return self
+        return self.generatePrime(size)
 
     def generatePrime(self, bitlen: int):
         """
-        - Генерирует простое число (проверка на простоту происходит с помощью алгоритма Миллера-Рабина)
-        - Вероятность того, что число окажется составным оценивается как величина, не превышающая 4**(-k),\\
-        где k - количество раундов проверки: k = log2(2**bitlen) = bitlen
-        - Возвращает значение типа int
+        - Генерирует простое число длиной ровно bitlen битов и делает его значением блока (размер блока - bitlen битов)
+        - Поиск идёт от случайного нечётного числа вверх; кандидаты сначала отсеиваются решетом по малым простым числам,
+        \
+        оставшиеся проверяются алгоритмом Миллера-Рабина (см. isProbablePrime())
+        - Возвращает ссылку на самого себя (блок данных)
         """
-        
-        def isPrime(n, k):
-            """
-            Проверка на простоту случайного числа алгоритмом Миллера-Рабина
-            n - случайное число, k - количество раундов
-            """
-            def isStrongPseudoprime(n, a):
-                d, s = n - 1, 0
-                while d % 2 == 0:
-                    d, s = d//2, s+1
-                t = pow(a, d, n)
-                if t == 1:
-                    return True
-                while s > 0:
-                    if t == n - 1:
-                        return True
-                    t, s = pow(t, 2, n), s - 1
-                return False
-
-            if n % 2 == 0:
-                return n == 2
-            for i in range(1, k):
-                a = randrange(2, n)
-                if not isStrongPseudoprime(n, a):
-                    return False
-            return True
-
-        while True:
-            genrand = randrange(0, int(2**bitlen))
-
-            k = int(log2(genrand))
-            if isPrime(genrand, k) == True:
-                break
-        return genrand
+        self.fromInt(_randomPrime(bitlen))
+        self.setBitSize(bitlen)
+        return self
 
 
     # Два метода, позволяющие сравнить блок данных с нулём
     def isZero(self):
-        return self.__value == 0
+        return self.__getValue() == 0
     
     def isNotZero(self):
-        return self.__value != 0
+        return self.__getValue() != 0
 
+    # Вспомогательный метод __otherToInt() переводит второй операнд в целое число (см. _toInt()).
+    # Целые числа и блоки данных - самые частые операнды - распознаются одной проверкой точного типа
     def __otherToInt(self, other):
-        typeother = str(type(other))
-        if typeother == "<class '__main__.Datablock'>" or typeother == "<class 'datablocks.Datablock'>":
-            return other.asInt()
-        if typeother == "<class 'int'>":
+        if type(other) is int:
             return other
-        else:
-            raise Exception("Недопустимый тип второго оператора ", typeother)
+        if type(other) is Datablock:
+            return other.__getValue()
+        val = _toInt(other)
+        if val is None:
+            raise Exception("Недопустимый тип второго оператора ", str(type(other)))
+        return val
             
+    # Вспомогательный метод __result() возвращает новый блок со значением val (размер - длина числа в битах, как у fromInt()).
+    # Поля заполняются напрямую, без вызова fromInt(); собственные настройки блока (см. __derive()) переносятся в результат
+    def __result(self, val):
+        if val < 0:
+            raise Exception("Отрицательные числа в блок данных не переводятся")
+        dblock = self.__derive()
+        dblock.__value = val
+        dblock.__bitSize = val.bit_length()
+        return dblock
+    
+    # Вспомогательный метод __assign() записывает результат операции val в текущий блок (для операторов +=, ^= и т. п.):
+    # собственные настройки блока сохраняются, буфер элементов сбрасывается
+    def __assign(self, val):
+        if val < 0:
+            raise Exception("Отрицательные числа в блок данных не переводятся")
+        self.__value = val
+        self.__elems = None
+        self.__bitSize = val.bit_length()
+        return self
+    
+    # Метод setToCompute() вычисляет fn(значение блока, значения operands...) над целыми числами и сохраняет результат
+    # в текущем блоке. Операнды - блоки данных или целые числа. Если задан bitSize, результат берётся
+    # по модулю 2 ** bitSize, и размер блока становится равным bitSize. Так цепочка операций (например, раунд ARX)
+    # вычисляется одним вызовом без промежуточных блоков:
+    #     x.setToCompute(lambda a, b: ((a + b) ^ (a << 3)), y, bitSize = 32)
+    # Возвращает ссылку на самого себя
+    def setToCompute(self, fn, *operands, bitSize = None):
+        val = fn(self.__getValue(), *[self.__otherToInt(x) for x in operands])
+        if bitSize is None:
+            return self.__assign(val)
+        self.__assign(val & ((1 << bitSize) - 1))
+        self.__bitSize = bitSize
+        return self
+    
     # Оператор +
     # Все арифметические операторы, поразрядные логические операторы и операторы отношения
     # принимают в качестве второго операнда как блок данных, так и целое число
     def __add__(self, other):
-        return Datablock().fromInt(self.asInt() + self.__otherToInt(other))
+        return self.__result(self.__getValue() + self.__otherToInt(other))
 
     # Оператор +=
     def __iadd__(self, other):
-        return self.fromInt(self.asInt() + self.__otherToInt(other))
+        return self.__assign(self.__getValue() + self.__otherToInt(other))
     
     # Оператор -
     def __sub__(self, other):
-        return Datablock().fromInt(self.asInt() - self.__otherToInt(other))
+        return self.__result(self.__getValue() - self.__otherToInt(other))
 
     # Оператор -=
     def __isub__(self, other):
-        return self.fromInt(self.asInt() - self.__otherToInt(other))
+        return self.__assign(self.__getValue() - self.__otherToInt(other))
 
     # Оператор *
     def __mul__(self, other):
-        return Datablock().fromInt(self.asInt() * self.__otherToInt(other))
+        return self.__result(self.__getValue() * self.__otherToInt(other))
     
     # Оператор *=
     def __imul__(self, other):
-        return self.fromInt(self.asInt() * self.__otherToInt(other))
+        return self.__assign(self.__getValue() * self.__otherToInt(other))
     
     # Оператор //
     def __floordiv__(self, other):
-        return Datablock().fromInt(self.asInt() // self.__otherToInt(other))
+        return self.__result(self.__getValue() // self.__otherToInt(other))
 
     # Оператор //=
     def __ifloordiv__(self, other):
-        return self.fromInt(self.asInt() // self.__otherToInt(other))
+        return self.__assign(self.__getValue() // self.__otherToInt(other))
     
     # Оператор %
     def __mod__(self, other):
-        return Datablock().fromInt(self.asInt() % self.__otherToInt(other))
+        return self.__result(self.__getValue() % self.__otherToInt(other))
 
     # Оператор %=
     def __imod__(self, other):
-        return self.fromInt(self.asInt() % self.__otherToInt(other))
+        return self.__assign(self.__getValue() % self.__otherToInt(other))
     
     # Оператор **
     def __pow__(self, other):
-        return Datablock().fromInt(self.asInt() ** self.__otherToInt(other))
+        return self.__result(self.__getValue() ** self.__otherToInt(other))
     
     # Оператор **=
     def __ipow__(self, other):
-        return self.fromInt(self.asInt() ** self.__otherToInt(other))
+        return self.__assign(self.__getValue() ** self.__otherToInt(other))
     
     # Метод modPow() выполняет возведение блока данных в степень other по модулю modulo
     def modPow(self, other, modulo):
-        return Datablock().fromInt(pow(self.asInt(), self.__otherToInt(other), self.__otherToInt(modulo)))
+        return self.__result(pow(self.__getValue(), self.__otherToInt(other), self.__otherToInt(modulo)))
         
     # Метод setToModPow() аналогичен предыдущему, при этом результат сохраняется в текущем блоке
     def setToModPow(self, other, modulo):
-        return self.fromInt(pow(self.asInt(), self.__otherToInt(other), self.__otherToInt(modulo)))
+        return self.__assign(pow(self.__getValue(), self.__otherToInt(other), self.__otherToInt(modulo)))
     
     # Оператор <<
     def __lshift__(self, other):
-        return Datablock().fromInt(self.asInt() << self.__otherToInt(other))
+        return self.__result(self.__getValue() << self.__otherToInt(other))
 
     # Оператор <<=
     def __ilshift__(self, other):
-        return self.fromInt(self.asInt() << self.__otherToInt(other))
+        return self.__assign(self.__getValue() << self.__otherToInt(other))
     
     # Оператор >>
     def __rshift__(self, other):
-        return Datablock().fromInt(self.asInt() >> self.__otherToInt(other))
+        return self.__result(self.__getValue() >> self.__otherToInt(other))
     
     # Оператор >>=
     def __irshift__(self, other):
-        return self.fromInt(self.asInt() >> self.__otherToInt(other))
+        return self.__assign(self.__getValue() >> self.__otherToInt(other))
 
     # Оператор &
     def __and__(self, other):
-        return Datablock().fromInt(self.asInt() & self.__otherToInt(other))
+        return self.__result(self.__getValue() & self.__otherToInt(other))
 
     # Оператор &=
     def __iand__(self, other):
-        return self.fromInt(self.asInt() & self.__otherToInt(other))
+        return self.__assign(self.__getValue() & self.__otherToInt(other))
     
     # Оператор ^
     def __xor__(self, other):
-        return Datablock().fromInt(self.asInt() ^ self.__otherToInt(other))
+        return self.__result(self.__getValue() ^ self.__otherToInt(other))
 
     # Оператор ^=
     def __ixor__(self, other):
-        return self.fromInt(self.asInt() ^ self.__otherToInt(other))
+        return self.__assign(self.__getValue() ^ self.__otherToInt(other))
 
     # Оператор |
     def __or__(self, other):
-        return Datablock().fromInt(self.asInt() | self.__otherToInt(other))
+        return self.__result(self.__getValue() | self.__otherToInt(other))
 
     # Оператор |=
     def __ior__(self, other):
-        return self.fromInt(self.asInt() | self.__otherToInt(other))
+        return self.__assign(self.__getValue() | self.__otherToInt(other))
+
+    # Отражённые операторы: вызываются, когда блок данных - правый операнд, а левый - целое число и т. п. (например, 5 + x).
+    # Атрибут __array_ufunc__ = None сообщает NumPy, что операции с блоком выполняет сам блок
+    # (иначе целое число NumPy попыталось бы перебрать блок как последовательность элементов)
+    __array_ufunc__ = None
+    
+    def __radd__(self, other):
+        return self.__result(self.__otherToInt(other) + self.__getValue())
+    
+    def __rsub__(self, other):
+        return self.__result(self.__otherToInt(other) - self.__getValue())
+    
+    def __rmul__(self, other):
+        return self.__result(self.__otherToInt(other) * self.__getValue())
+    
+    def __rfloordiv__(self, other):
+        return self.__result(self.__otherToInt(other) // self.__getValue())
+    
+    def __rmod__(self, other):
+        return self.__result(self.__otherToInt(other) % self.__getValue())
+    
+    def __rpow__(self, other):
+        return self.__result(self.__otherToInt(other) ** self.__getValue())
+    
+    def __rlshift__(self, other):
+        return self.__result(self.__otherToInt(other) << self.__getValue())
+    
+    def __rrshift__(self, other):
+        return self.__result(self.__otherToInt(other) >> self.__getValue())
+    
+    def __rand__(self, other):
+        return self.__result(self.__otherToInt(other) & self.__getValue())
+    
+    def __rxor__(self, other):
+        return self.__result(self.__otherToInt(other) ^ self.__getValue())
+    
+    def __ror__(self, other):
+        return self.__result(self.__otherToInt(other) | self.__getValue())
 
     # Оператор ~
     def __invert__(self):
-        ones = 2 ** self.__bitSize - 1
-        return Datablock().fromInt(self.__value ^ ones)
+        ones = (1 << self.__bitSize) - 1
+        return self.__result(self.__getValue() ^ ones)
 
     # Оператор ==
     def __eq__(self, other):
-        return self.__value == self.__otherToInt(other)
+        return self.__getValue() == self.__otherToInt(other)
     
     # Оператор !=
     def __ne__(self, other):
-        return self.__value != self.__otherToInt(other)
+        return self.__getValue() != self.__otherToInt(other)
     
     # Оператор <
     def __lt__(self, other):
-        return self.__value < self.__otherToInt(other)
+        return self.__getValue() < self.__otherToInt(other)
     
     # Оператор >
     def __gt__(self, other):
-        return self.__value > self.__otherToInt(other)
+        return self.__getValue() > self.__otherToInt(other)
     
     # Оператор <=
     def __le__(self, other):
-        return self.__value <= self.__otherToInt(other)
+        return self.__getValue() <= self.__otherToInt(other)
     
     # Оператор >=
     def __ge__(self, other):
-        return self.__value >= self.__otherToInt(other)
+        return self.__getValue() >= self.__otherToInt(other)
     
     # Метод bitConcat() присоединяет к текущему блоку блок other. Оба блока представляются как битовые последовательности.
     # При этом от каждого блока берётся ровно __bitSIze битов.
     # Результат этого метода не всегда совпадает с результатом метода concat()!
     # Результат конкатенации сохраняется в текущем 
     def bitConcat(self, other):
-        slf = self.__value
+        slf = self.__getValue()
         oth = other.asInt()
         cnc = (oth << self.__bitSize) + slf
         return Datablock().fromInt(cnc).setBitSize(other.getBitSize() + self.__bitSize)
     
     # Метод cshl() возвращает результат циклического сдвига текущего блока влево на other позиций
     def cshl(self, other):
-        howmany = self.__otherToInt(other) % self.__bitSize
-        if howmany == 0:
-            return self.clone()
-        
-        last = self.__subb(0, self.__bitSize - howmany)
-        most = self.__subb(self.__bitSize - howmany, howmany)
-
-        return most.bitConcat(last)
+        dblock = self.__derive()
+        dblock.__value = self.__rotated(self.__otherToInt(other))
+        dblock.__bitSize = self.__bitSize
+        return dblock
     
     # Метод cshr() возвращает результат циклического сдвига текущего блока вправо на other позиций
     def cshr(self, other):
-        howmany = self.__otherToInt(other) % self.__bitSize
-        if howmany == 0:
-            return self.clone()
-        
-        last = self.__subb(0, howmany)
-        most = self.__subb(howmany, self.__bitSize - howmany)
-        
-        return most.bitConcat(last)
+        dblock = self.__derive()
+        dblock.__value = self.__rotated(-self.__otherToInt(other))
+        dblock.__bitSize = self.__bitSize
+        return dblock
     
+    # Методы setToCshl() и setToCshr() выполняют циклический сдвиг на месте (размер блока не меняется)
     def setToCshl(self, other):
-        self.fromDatablock(self.cshl(other))
+        self.__setValue(self.__rotated(self.__otherToInt(other)))
         return self
     
     def setToCshr(self, other):
-        self.fromDatablock(self.cshr(other))
+        self.__setValue(self.__rotated(-self.__otherToInt(other)))
+        return self
+    
+    # Вспомогательный метод __rotated() возвращает значение блока (__bitSize битов), циклически сдвинутое влево
+    # на howmany позиций: два сдвига и маска над целым числом
+    def __rotated(self, howmany):
+        size = self.__bitSize
+        howmany %= size
+        if howmany == 0:
+            return self.__getValue()
+        mask = (1 << size) - 1
+        val = self.__getValue() & mask
+        return ((val << howmany) | (val >> (size - howmany))) & mask
+    
+    # Метод asWords() возвращает блок в виде массива NumPy слов размером width битов (8, 16, 32 или 64; слово с индексом 0 - младшее).
+    # Число слов - getBitSize() / width с округлением вверх. Массив можно обрабатывать функциями cshlWords(), addWords() и т. п.
+    def asWords(self, width = 32):
+        dtype = _wordDtype(width)
+        count = (self.__bitSize + width - 1) // width
+        raw = (self.__getValue() & ((1 << (count * width)) - 1)).to_bytes(count * dtype.itemsize, "little")
+        return np.frombuffer(raw, dtype = dtype.newbyteorder("<")).astype(dtype)
+    
+    # Метод fromWords() инициализирует блок массивом слов words размером width битов (слово с индексом 0 - младшее);
+    # размер блока - len(words) * width. Возвращает ссылку на самого себя
+    def fromWords(self, words, width = 32):
+        dtype = _wordDtype(width)
+        if isinstance(words, np.ndarray):
+            bad = words.size > 0 and (words.min() < 0 or int(words.max()) >> width)
+        else:
+            words = list(words)
+            bad = any(v < 0 or v >> width for v in words)
+        if bad:
+            raise Exception("Значение слова не помещается в " + str(width) + " битов")
+        words = np.asarray(words, dtype = dtype)
+        self.__setValue(int.from_bytes(words.astype(dtype.newbyteorder("<")).tobytes(), "little"))
+        self.__bitSize = words.size * width
         return self
     
-    # Метод extEuc реализует расширенный алгоритм Евклида
-    # Используется в методе modInverse() - см. далее.
+    # Метод extEuc реализует расширенный алгоритм Евклида: возвращает [d, x, y], где d = НОД(self, other) и self * x + other * y = d.
+    # Для положительных чисел используются встроенные gcd() и pow(a, -1, m); коэффициенты те же, что дал бы
+    # классический алгоритм: |x| <= other / (2 * d)
     def extEuc(self, other):
         a0 = self.asInt()
         a1 = self.__otherToInt(other)
         if a0 == 0 or a1 == 0:
             return None
+        
+        if a0 > 0 and a1 > 0:
+            d = gcd(a0, a1)
+            m = a1 // d
+            x = 0
+            if m > 1:
+                x = pow(a0 // d, -1, m)
+                if 2 * x > m:
+                    x -= m
+            return [d, x, (d - a0 * x) // a1]
+        
         x0 = 1
         x1 = 0
         y0 = 0
@@ -521,39 +1450,23 @@ class Datablock:
         out.append(y0)
         return out
     
-    # Метод modInverse() возвращает число (в виде блока данных), обратное self по модулю other
+    # Метод modInverse() возвращает число (в виде блока данных), обратное self по модулю other.
+    # Если обратного числа не существует, возвращается None
     def modInverse(self, other):
-        dxy = self.extEuc(other)
-        if dxy[0] == 1:
-            if dxy[1] > 0:
-                return Datablock().fromInt(dxy[1])
-            return Datablock().fromInt(self.__otherToInt(other) - abs(dxy[1]))
-        return None
+        try:
+            return Datablock().fromInt(pow(self.asInt(), -1, self.__otherToInt(other)))
+        except ValueError:
+            return None
     
     # Метод gcd() возвращает наибольший общий делитель self и other
     def gcd(self, other):
-        slf = self.__value
+        slf = self.__getValue()
         oth = self.__otherToInt(other)
         
         if slf == oth:
             return self.clone()
         
-        if slf > oth:
-            a, b = slf, oth
-        else:
-            a, b = oth, slf
-        
-        while True:
-            r = a % b
-            q = a // b
-            
-            if r == 0:
-                break
-            
-            a = b
-            b = r
-        
-        return dbi(b)
+        return dbi(gcd(slf, oth))
     
     # Метод subblock() возвращает подблок текущего блока.
     # Параметры:
@@ -562,22 +1475,32 @@ class Datablock:
          # Если howmany = 0 или wherefrom превышает количество элементов в текущем блоке, возвращается пустой (нулевой) блок данных.
          # Если howmany < -1 (значение по умолчанию), то в подблок включаются элементы, начиная с позиции wherefrom и заканчивая последним элементом текущего блока
     def subblock(self, wherefrom, howmany = -1):
+        es = self.getElemSize()
+        if wherefrom < 0:
+            raise Exception("Индекс должен быть неортицательной величиной")
         if wherefrom >= len(self):
-            return Datablock()
+            return self.__derive()
         if howmany == 0:
-            return Datablock()
+            return self.__derive()
         if howmany < 0:
             howmany = len(self) - wherefrom
         
-        firstBitIndex = wherefrom * elemSize
-        lastBitIndex = (wherefrom + howmany) * elemSize
+        lastBitIndex = (wherefrom + howmany) * es
         
         if lastBitIndex > self.__bitSize:
             lastBitIndex = self.__bitSize
-            
-        dblock = self.__subb(firstBitIndex, lastBitIndex - firstBitIndex)
-        dblock.setBitSize(howmany * elemSize)
         
+        # Подблок копируется из буфера элементов (при первом обращении блок раскладывается на элементы за линейное время)
+        dblock = self.__derive()
+        part = _copyElems(self.__getElems()[wherefrom:wherefrom + howmany])
+        tail = lastBitIndex - (wherefrom + len(part) - 1) * es
+        if tail < es:
+            part[len(part) - 1] &= (1 << tail) - 1
+        part.extend([0] * (howmany - len(part)))
+        dblock.__value = None
+        dblock.__elems = part
+        dblock.__elemsSize = es
+        dblock.__bitSize = howmany * es
         return dblock
     
     # Метод concat() объединяет блоки self и other.
@@ -588,263 +1511,1999 @@ class Datablock:
     #     Метод bitConcat() просто сливает две битовые последовательности (первая справа, вторая слева): 10110101011
     #     Метод concat() представляет первый блок как: 0000 1011. Второй блок: 0010 1101.
     #     При объединении получается 0010 1101 0000 1011.
+    # Другой блок при этом не изменяется. Если элементы обоих блоков уже разложены, склеиваются буферы элементов
     def concat(self, other):
-        self.setBitSize(len(self) * elemSize)
-        other.setBitSize(len(other) * elemSize)
-        self.fromDatablock(self.bitConcat(other))
+        es = self.getElemSize()
+        n1 = len(self)
+        n2 = len(other)
+        
+        if self.__elems is not None and self.__elemsSize == es and self.__elemsHigh == 0 and other.getElemSize() == es:
+            tail = other.__getElems()
+            if other.__elemsHigh == 0:
+                self.__elems = _joinElems(self.__elems, tail)
+                self.__value = None
+                self.__bitSize = (n1 + n2) * es
+                return self
+        
+        val = self.__getValue() + (other.asInt() << (n1 * es))
+        self.__setValue(val)
+        if n1 + n2 > 0:
+            self.__bitSize = (n1 + n2) * es
         return self
     
-    # Метод replace() выполняет замену подблока текущего блока, расположенного в позиции wherefrom, на подблок subblock
+    # Вспомогательный метод __elemsOf() возвращает count элементов блока other в текущем размере элемента
+    def __elemsOf(self, other, count):
+        es = self.getElemSize()
+        if other.getElemSize() == es and len(other) == count:
+            elems = other.__getElems()
+            if isinstance(elems, memoryview):
+                elems = _copyElems(elems)
+            return elems
+        return _unpackElems(other.asInt(), es, count)
+    
+    # Метод replace() выполняет замену подблока текущего блока, расположенного в позиции wherefrom, на подблок subblock.
+    # Элементы заменяются прямо в буфере элементов (размер блока дополняется до целого числа элементов)
     def replace(self, wherefrom, subblock):
-        if wherefrom + len(subblock) > len(self):
-            raise Exception("Размер предлагаемого подблока слишком велик: " + str(wherefrom + len(subblock)) + " " + str(self.len()))
-            
-        last = self.subblock(0, wherefrom)
-        most = self.subblock(wherefrom + len(subblock))
-        self.fromDatablock(last.concat(subblock).concat(most))
-        return self
+        count = len(subblock)
+        if wherefrom + count > len(self):
+            raise Exception("Размер предлагаемого подблока слишком велик: " + str(wherefrom + count) + " " + str(len(self)))
         
-    # Метод subblockIndex() возвращает индекс первого вхождения подблока в блок
-    def subblockIndex(self, other):
-        selflen = len(self)
-        otherlen = len(other)
+        elems = self.__elemsForRewrite()
+        elems[wherefrom:wherefrom + count] = self.__elemsOf(subblock, count)
+        self.__elemsHigh = 0
+        return self
         
-        if selflen < otherlen:
+    # Метод subblockIndex() возвращает индекс первого вхождения подблока other в блок (поиск начинается с элемента start).
+    # Если вхождений нет, возвращается None
+    def subblockIndex(self, other, start = 0):
+        if len(self) < len(other):
             raise Exception("Искомый подблок имеет слишком большой размер")
-        m = 2 ** (elemSize * otherlen)
-        slf = self.asInt()
+        return next(self.findAll(other, start), None)
+    
+    # Метод findAll() перебирает индексы всех вхождений подблока other в блок, начиная с элемента start
+    # (вхождения могут перекрываться). Подблок рассматривается как последовательность len(other) элементов текущего размера.
+    # Элементы обоих блоков переводятся в байты машинного размера, и поиск выполняет bytes.find() с проверкой границ элементов;
+    # элементы длиннее 64 битов ищутся алгоритмом Бойера-Мура-Хорспула
+    def findAll(self, other, start = 0):
+        es = self.getElemSize()
+        count = len(other)
         oth = other.asInt()
-
-        for i in range(0, selflen - otherlen + 1):
-            if (slf >> i * elemSize) % m == oth:
-                return i
-            
-        return None
+        if oth >> (es * count) != 0:
+            return iter(())
+        return self.__findElems(_unpackElems(oth, es, count), start)
+    
+    # Метод count() возвращает количество вхождений подблока other в блок, начиная с элемента start (см. findAll())
+    def count(self, other, start = 0):
+        return sum(1 for i in self.findAll(other, start))
     
-    # Метод index() возвращает индекс первого вхождения элемента elem в текущий блок данных
-    def index(self, elem):
-        for i in range(0, len(self)):
+    # Метод index() возвращает индекс первого вхождения элемента elem (целого числа или блока данных)
+    # в текущий блок данных, начиная с элемента start. Если вхождений нет, возвращается None
+    def index(self, elem, start = 0):
+        es = self.getElemSize()
+        if isinstance(elem, (int, Datablock)):
+            v = self.__otherToInt(elem)
+            if not 0 <= v < 1 << es:
+                return None
+            return next(self.__findElems(_unpackElems(v, es, 1), start), None)
+        
+        # Элемент в ином представлении (текст, байты - см. retMode) сравнивается с self[i]
+        for i in range(start, len(self)):
             if self[i] == elem:
                 return i
         return None
     
-    # Метод insert() осуществляет вставку подблока other в текущий блок по позиции index
+    # Вспомогательный метод __findElems() перебирает вхождения буфера элементов pattern в буфер элементов блока
+    def __findElems(self, pattern, start):
+        n = len(self)
+        if start < 0:
+            start = max(0, start + n)
+        if len(pattern) == 0:
+            return iter(range(start, n + 1))
+        
+        hay = self.__elemValues()
+        if isinstance(hay, list):
+            return _horspool(hay, list(pattern), start)
+        needle = memoryview(pattern).cast("B").tobytes()
+        return _findAligned(memoryview(hay).cast("B").tobytes(), needle, hay.itemsize, start)
+    
+    # Метод insert() осуществляет вставку подблока other в текущий блок по позиции index.
+    # Элементы вставляются прямо в буфер элементов (если index больше длины блока, недостающие элементы - нулевые)
     def insert(self, other, index):
-        last = self.subblock(0, index)
-        most = self.subblock(index)
-        self.fromDatablock(last.concat(other).concat(most))
+        es = self.getElemSize()
+        elems = self.__elemsForRewrite()
+        if isinstance(elems, memoryview):
+            # Буфер, разделяющий память с внешним объектом, не может менять длину
+            elems = _copyElems(elems)
+            self.__elems = elems
+        if index > len(elems):
+            elems.extend([0] * (index - len(elems)))
+        elems[index:index] = self.__elemsOf(other, len(other))
+        self.__elemsHigh = 0
+        self.__bitSize = len(elems) * es
         return self
     
     # Метод substMonoShiftedAbc() выполняет простое подстановочное преобразование блока данных
     # key - ключ подстановки;
     # direction - прямая (True) или обратная (False) подстановка
-    def substMonoShiftedAbc(self, key, direction):
-        global retMode
-        m = 2 ** elemSize
+    # workers - число процессов для параллельной обработки больших блоков (по умолчанию 1 - без параллелизма)
+    # или готовый пул процессов ProcessPoolExecutor, который используется повторно (см. _runTask());
+    # то же относится ко всем методам subst* и методу transposSimple()
+    # Подстановки выполняются сразу над всем буфером элементов (векторно, если установлен NumPy)
+    def substMonoShiftedAbc(self, key, direction, workers = 1):
+        es = self.getElemSize()
+        m = 2 ** es
         
         if key >= m:
             raise Exception("Ключ при текущем размере элемента не должен превышать " + str(m - 1))
         
-        curRetMode = retMode
-        retMode = RM_INT
-        for i in range(0, len(self)):
-            if direction:
-                self[i] = (self[i] + key) % m
-            else:
-                self[i] = (self[i] + m - key) % m
-                
-        retMode = curRetMode
+        _runTask(self.__elemsForRewrite(), es, "shift", ([key], direction), 1, workers)
         return self
 
     # Метод substMonoMixedAbc() выполняет простое подстановочное преобразование блока данных с использованием одного перемешанного алфавита
     # abc - алфавит замены;
     # direction - прямая (True) или обратная (False) подстановка
-    def substMonoMixedAbc(self, abc, direction):
-        global retMode
+    # abc может быть и скомпилированным ключом SubstitutionKey (см. compileSubstitutionKey()) -
+    # тогда прямая и обратная таблицы берутся из него готовыми
+    def substMonoMixedAbc(self, abc, direction, workers = 1):
+        es = self.getElemSize()
+        if isinstance(abc, SubstitutionKey):
+            abc.checkElemSize(es)
+            _runTask(self.__elemsForRewrite(), es, "tables", ([abc.getTable(direction)], abc.getMatrix(direction)), 1, workers)
+            return self
         
-        curRetMode = retMode
-        retMode = RM_INT
-        
-        for i in range(0, len(self)):
-            if direction:
-                self[i] = abc[self[i]]
-            else:
-                self[i] = abc.index(self[i])
-        
-        retMode = curRetMode
+        if direction:
+            table = abc
+        else:
+            table = _inverseTable(abc, es)
         
+        _runTask(self.__elemsForRewrite(), es, "tables", ([table], None), 1, workers)
         return self
     
     # Метод substPolyShiftedAbc() выполняет полиалфавитное подстановочное преобразование блока данных с использованием нескольких смещённых алфавитов
     # key - ключ подстановки;
     # direction - прямая (True) или обратная (False) подстановка
-    def substPolyShiftedAbc(self, key, direction):
-        global retMode
-        
+    def substPolyShiftedAbc(self, key, direction, workers = 1):
+        es = self.getElemSize()
         keylen = len(key)
         if keylen == 0:
             raise Exception("Ключ подстановки пуст")
-        m = 2 ** elemSize
-        
-        curRetMode = retMode
-        retMode = RM_INT
-        
-        for i in range(0, len(self)):
-            if direction:
-                self[i] = (self[i] + key[i % keylen]) % m
-            else:
-                self[i] = (self[i] + m - key[i % keylen]) % m
-        
-        retMode = curRetMode
         
+        _runTask(self.__elemsForRewrite(), es, "shift", (list(key), direction), keylen, workers)
         return self
     
     # Метод substPolyMixedAbc() выполняет полиалфавитное подстановочное преобразование блока данных с использованием нескольких перемешанных алфавитов
-    # abcs - перемешанные алфавиты;
+    # abcs - перемешанные алфавиты (или скомпилированный ключ PolyAlphabetKey, см. compilePolyAlphabetKey());
     # direction - прямая (True) или обратная (False) подстановка
-    def substPolyMixedAbc(self, abcs, direction):
-        global retMode
+    def substPolyMixedAbc(self, abcs, direction, workers = 1):
+        es = self.getElemSize()
+        if isinstance(abcs, PolyAlphabetKey):
+            abcs.checkElemSize(es)
+            _runTask(self.__elemsForRewrite(), es, "tables", (abcs.getTables(direction), abcs.getMatrix(direction)), len(abcs), workers)
+            return self
         
         keylen = len(abcs)
         if keylen == 0:
             raise Exception("Ключ подстановки пуст")
-            
-        curRetMode = retMode
-        retMode = RM_INT
-        
-        for i in range(0, len(self)):
-            if direction:
-                self[i] = abcs[i % keylen][self[i]]
-            else:
-                self[i] = abcs[i % keylen].index(self[i])
         
-        retMode = curRetMode
+        if direction:
+            tables = list(abcs)
+        else:
+            tables = [_inverseTable(abc, es) for abc in abcs]
         
-        return self        
+        _runTask(self.__elemsForRewrite(), es, "tables", (tables, None), keylen, workers)
+        return self
     
     # Метод transposSimple() выполняет простую перестановку элементов блока данных.
     # key - ключ подстановки;
     # direction - прямая (True) или обратная (False) перестановка
-    def transposSimple(self, key, direction):
-        global retMode
-        
-        keylen = len(key)
-
-        if len(self) % keylen != 0:
-            raise Exception("Размер блока не кратен размеру ключа")
-
-        curRetMode = retMode
-        retMode = RM_INT
-        
-        tmp = self.clone()
-        
-        for i in range(0, len(self), keylen):
-            for j in range(0, keylen):
-                if direction:
-                    self[i + j] = tmp[i + key.index(j)]
-                else:
-                    self[i + key.index(j)] = tmp[i + j]
-                   
-        retMode = curRetMode
+    # Если установлен NumPy, перестановка выполняется над буфером элементов как над матрицей (строка - len(key) элементов):
+    # выборка столбцов по ключу, без таблицы индексов длины блока (см. _transposed()); иначе применяется план перестановки
+    def transposSimple(self, key, direction, workers = 1):
+        if isinstance(workers, Executor) or workers > 1:
+            # Каждый процесс строит план для своей части блока, поэтому здесь проверяются только ключ и длина
+            key = _checkTranspositionKey(key)[0]
+            if len(self) % len(key) != 0:
+                raise Exception("Размер блока не кратен размеру ключа")
+            _runTask(self.__elemsForRewrite(), self.getElemSize(), "simple", (key, direction), len(key), workers)
+            return self
         
+        _transposBuffer(self.__elemsForRewrite(), "simple", key, (), direction)
         return self
 
     # Метод transposTbl() выполняет  перестановку элементов блока данных с усложнением по таблице.
     # key - ключ подстановки;
     # direction - прямая (True) или обратная (False) перестановка
     def transposTbl(self, key1, key2, direction):
-        global retMode
-        
-        l = len(self)
-        l1 = len(key1)
+        _transposBuffer(self.__elemsForRewrite(), "tbl", key1, key2, direction)
+        return self
 
-        if l % l1 != 0:
-            raise Exception("Блок данных не может быть равномерно разбит на " + str(l1) + " подблоков " + str(l))        
-        
-        l2 = len(key2)
-        sbSize = l // l1
-            
-        if l2 != sbSize:
+    # Метод transposSimple() выполняет  перестановку элементов блока данных с усложнением по маршруту.
+    # key - ключ подстановки;
+    # direction - прямая (True) или обратная (False) перестановка
+    # Простая перестановка и перестановка по маршруту выполняются одной выборкой, поэтому блок обходится один раз
+    def transposRoute(self, key, direction):
+        _transposBuffer(self.__elemsForRewrite(), "route", key, (), direction)
+        return self
+    
+    # Метод transposPlan() применяет к блоку готовый план перестановки plan (например, объединённый методом then()).
+    # direction - прямая (True) или обратная (False) перестановка
+    def transposPlan(self, plan, direction = True):
+        if len(plan) != len(self):
+            raise Exception("План перестановки рассчитан на " + str(len(plan)) + " элементов, а в блоке их " + str(len(self)))
+        if not direction:
+            plan = plan.inverse()
+        plan.apply(self.__elemsForRewrite())
+        return self
+    
+    # Метод getProbabilityTable() возвращает таблицу частот элементов текущего блока
+    def getProbabilityTable(self):
+        return self.getFrequencyTable().getProbabilityTable()
+    
+    # Метод getFrequencyTable() возвращает таблицу частот n-грамм элементов блока (см. класс FrequencyTable)
+    def getFrequencyTable(self, n = 1):
+        return FrequencyTable(self.getElemSize(), n).updateElems(self.__elemValues())
+    
+    # Вспомогательный метод __elemValues() возвращает буфер элементов, в котором неполный последний элемент
+    # обрезан до установленного размера блока (если обрезать есть что - возвращается копия буфера)
+    def __elemValues(self):
+        es = self.getElemSize()
+        elems = self.__getElems()
+        count = len(elems)
+        if count > 0:
+            tail = self.__bitSize - (count - 1) * es
+            if tail < es and elems[count - 1] >> tail:
+                elems = _copyElems(elems)
+                elems[count - 1] &= (1 << tail) - 1
+        return elems
+
+# Класс SubstitutionKey описывает "скомпилированный" перемешанный алфавит для метода substMonoMixedAbc().
+# Алфавит проверяется один раз при создании ключа: он должен быть перестановкой всех 2 ** size значений элемента.
+# Прямая и обратная таблицы замены вычисляются заранее, поэтому обратная подстановка не ищет элементы в алфавите.
+# Ключи удобнее создавать функцией compileSubstitutionKey(), которая кэширует их по содержимому
+class SubstitutionKey:
+    # Конструктор принимает алфавит abc и размер элемента size (по умолчанию - действующий в текущем контексте)
+    def __init__(self, abc, size = None):
+        if size is None:
+            size = currentElemSize()
+        self.__elemSize = size
+        self.__forward = _checkAlphabet(abc, size)
+        inverse = [0] * len(self.__forward)
+        for i, v in enumerate(self.__forward):
+            inverse[v] = i
+        self.__inverse = tuple(inverse)
+        self.__matrices = {}
+    
+    # Метод getElemSize() возвращает размер элемента, для которого скомпилирован ключ
+    def getElemSize(self):
+        return self.__elemSize
+    
+    # Метод checkElemSize() проверяет, что ключ может применяться при размере элемента size
+    def checkElemSize(self, size):
+        if size != self.__elemSize:
+            raise Exception("Ключ скомпилирован для размера элемента " + str(self.__elemSize) + ", а текущий размер - " + str(size))
+    
+    # Метод getTable() возвращает таблицу прямой (direction = True) или обратной (direction = False) замены
+    def getTable(self, direction):
+        if direction:
+            return self.__forward
+        return self.__inverse
+    
+    # Метод getMatrix() возвращает таблицу замены в виде матрицы NumPy из одной строки (None, если NumPy не установлен)
+    def getMatrix(self, direction):
+        if np is None:
+            return None
+        if direction not in self.__matrices:
+            self.__matrices[direction] = np.array([self.getTable(direction)], dtype=np.int64)
+        return self.__matrices[direction]
+    
+    def __len__(self):
+        return len(self.__forward)
+
+
+# Класс PolyAlphabetKey описывает "скомпилированный" набор перемешанных алфавитов для метода substPolyMixedAbc().
+# Каждый алфавит проверяется и обращается один раз; ключи удобнее создавать функцией compilePolyAlphabetKey()
+class PolyAlphabetKey:
+    # Конструктор принимает список алфавитов abcs (списков или ключей SubstitutionKey)
+    # и размер элемента size (по умолчанию - действующий в текущем контексте)
+    def __init__(self, abcs, size = None):
+        if size is None:
+            size = currentElemSize()
+        if len(abcs) == 0:
+            raise Exception("Ключ подстановки пуст")
+        self.__elemSize = size
+        self.__keys = tuple(abc if isinstance(abc, SubstitutionKey) else SubstitutionKey(abc, size) for abc in abcs)
+        for key in self.__keys:
+            key.checkElemSize(size)
+        self.__matrices = {}
+    
+    # Метод getElemSize() возвращает размер элемента, для которого скомпилирован ключ
+    def getElemSize(self):
+        return self.__elemSize
+    
+    # Метод checkElemSize() проверяет, что ключ может применяться при размере элемента size
+    def checkElemSize(self, size):
+        if size != self.__elemSize:
+            raise Exception("Ключ скомпилирован для размера элемента " + str(self.__elemSize) + ", а текущий размер - " + str(size))
+    
+    # Метод getTables() возвращает список таблиц прямой (direction = True) или обратной (direction = False) замены
+    def getTables(self, direction):
+        return [key.getTable(direction) for key in self.__keys]
+    
+    # Метод getMatrix() возвращает таблицы замены в виде матрицы NumPy (строка - алфавит); None, если NumPy не установлен
+    def getMatrix(self, direction):
+        if np is None:
+            return None
+        if direction not in self.__matrices:
+            self.__matrices[direction] = np.array(self.getTables(direction), dtype=np.int64)
+        return self.__matrices[direction]
+    
+    # Количество алфавитов в ключе
+    def __len__(self):
+        return len(self.__keys)
+    
+    def __getitem__(self, index):
+        return self.__keys[index]
+
+
+# Функция _checkAlphabet() проверяет, что abc - перестановка всех значений элемента размером size битов.
+# Возвращает алфавит в виде кортежа
+def _checkAlphabet(abc, size):
+    m = 2 ** size
+    abc = tuple(abc)
+    if len(abc) != m:
+        raise Exception("Алфавит должен содержать ровно " + str(m) + " элементов, а содержит " + str(len(abc)))
+    seen = bytearray(m)
+    for v in abc:
+        if not 0 <= v < m or seen[v]:
+            raise Exception("Алфавит не является перестановкой значений элемента: ошибка в значении " + str(v))
+        seen[v] = 1
+    return abc
+
+# Функции compileSubstitutionKey() и compilePolyAlphabetKey() возвращают скомпилированные ключи
+# для размера элемента size (по умолчанию - действующего в текущем контексте).
+# Ключи кэшируются по содержимому (хранятся последние KEY_CACHE_SIZE ключей каждого вида),
+# поэтому повторное использование одних и тех же алфавитов не требует повторной компиляции
+def compileSubstitutionKey(abc, size = None):
+    if isinstance(abc, SubstitutionKey):
+        return abc
+    if size is None:
+        size = currentElemSize()
+    return _cachedSubstitutionKey(tuple(abc), size)
+
+def compilePolyAlphabetKey(abcs, size = None):
+    if isinstance(abcs, PolyAlphabetKey):
+        return abcs
+    if size is None:
+        size = currentElemSize()
+    return _cachedPolyAlphabetKey(tuple(abc.getTable(True) if isinstance(abc, SubstitutionKey) else tuple(abc) for abc in abcs), size)
+
+@lru_cache(maxsize = KEY_CACHE_SIZE)
+def _cachedSubstitutionKey(abc, size):
+    return SubstitutionKey(abc, size)
+
+@lru_cache(maxsize = KEY_CACHE_SIZE)
+def _cachedPolyAlphabetKey(abcs, size):
+    return PolyAlphabetKey([_cachedSubstitutionKey(abc, size) for abc in abcs], size)
+
+
+# Класс TranspositionPlan описывает перестановку элементов блока фиксированной длины в виде плоской таблицы индексов:
+# после применения плана элемент с индексом p берётся из позиции perm[p] исходного блока.
+# План вычисляется один раз для длины блока и ключа (см. planTransposSimple() и др.), а применяется одной выборкой.
+# Последовательные перестановки объединяются в один план методом then(), поэтому цепочка перестановок
+# обходит блок один раз
+class TranspositionPlan:
+    # Конструктор принимает таблицу индексов perm (любая последовательность целых чисел)
+    def __init__(self, perm):
+        if isinstance(perm, array) and perm.typecode == "q":
+            self.__perm = perm
+        else:
+            self.__perm = array("q", perm)
+    
+    def __len__(self):
+        return len(self.__perm)
+    
+    # Метод getPerm() возвращает таблицу индексов плана
+    def getPerm(self):
+        return self.__perm
+    
+    # Метод apply() переставляет элементы буфера buf (array или list) на месте
+    def apply(self, buf):
+        if len(buf) != len(self.__perm):
+            raise Exception("Размер буфера не совпадает с размером плана перестановки")
+        view = _numpyView(buf)
+        if view is not None:
+            view[...] = view[np.frombuffer(self.__perm, dtype=np.int64)]
+            return
+        perm = self.__perm
+        _storeElems(buf, [buf[i] for i in perm])
+    
+    # Метод then() возвращает план, равносильный применению сначала текущего плана, а затем плана other
+    def then(self, other):
+        if len(other) != len(self):
+            raise Exception("Планы перестановки рассчитаны на блоки разной длины")
+        if np is not None:
+            first = np.frombuffer(self.__perm, dtype=np.int64)
+            return TranspositionPlan(_int64Array(first[np.frombuffer(other.getPerm(), dtype=np.int64)]))
+        perm = self.__perm
+        return TranspositionPlan([perm[i] for i in other.getPerm()])
+    
+    # Метод inverse() возвращает план обратной перестановки
+    def inverse(self):
+        if np is not None:
+            inv = np.empty(len(self.__perm), dtype=np.int64)
+            inv[np.frombuffer(self.__perm, dtype=np.int64)] = np.arange(len(self.__perm), dtype=np.int64)
+            return TranspositionPlan(_int64Array(inv))
+        inv = [0] * len(self.__perm)
+        for i, v in enumerate(self.__perm):
+            inv[v] = i
+        return TranspositionPlan(inv)
+
+
+# Функция _int64Array() переводит массив NumPy с элементами int64 в array("q")
+def _int64Array(arr):
+    res = array("q")
+    res.frombytes(arr.astype(np.int64).tobytes())
+    return res
+
+# Функция _outerSum() возвращает таблицу индексов [r + c for r in rows for c in cols] в виде array("q")
+def _outerSum(rows, cols):
+    if np is not None:
+        res = np.array(rows, dtype=np.int64)[:, None] + np.array(cols, dtype=np.int64)[None, :]
+        return _int64Array(res.ravel())
+    return array("q", [r + c for r in rows for c in cols])
+
+# Функция _checkTranspositionKey() проверяет, что key - перестановка чисел 0, 1, ..., len(key) - 1.
+# Возвращает ключ и обратный ему ключ (inv[j] = key.index(j)) в виде кортежей
+def _checkTranspositionKey(key):
+    key = tuple(key)
+    if len(key) == 0:
+        raise Exception("Ключ перестановки пуст")
+    inv = [-1] * len(key)
+    for i, v in enumerate(key):
+        if not 0 <= v < len(key) or inv[v] != -1:
+            raise Exception("Ключ перестановки должен содержать числа от 0 до " + str(len(key) - 1) + " без повторов")
+        inv[v] = i
+    return key, tuple(inv)
+
+# Функции planTransposSimple(), planTransposTbl() и planTransposRoute() возвращают планы перестановки,
+# равносильные методам transposSimple(), transposTbl() и transposRoute() для блока из n элементов.
+# Планы длиной до PLAN_CACHE_MAX_ELEMS элементов кэшируются (хранятся последние PLAN_CACHE_SIZE планов);
+# более длинные планы строятся заново, чтобы кэш не удерживал большие таблицы индексов
+def planTransposSimple(n, key, direction):
+    return _cachedPlan("simple", n, tuple(key), (), direction)
+
+def planTransposTbl(n, key1, key2, direction):
+    return _cachedPlan("tbl", n, tuple(key1), tuple(key2), direction)
+
+def planTransposRoute(n, key, direction):
+    return _cachedPlan("route", n, tuple(key), (), direction)
+
+def _cachedPlan(kind, n, key1, key2, direction):
+    if n > PLAN_CACHE_MAX_ELEMS:
+        return _buildPlan(kind, n, key1, key2, direction)
+    return _smallPlan(kind, n, key1, key2, direction)
+
+@lru_cache(maxsize = PLAN_CACHE_SIZE)
+def _smallPlan(kind, n, key1, key2, direction):
+    return _buildPlan(kind, n, key1, key2, direction)
+
+# Функция _planKeys() проверяет ключи перестановки вида kind для блока из n элементов.
+# Возвращает ключи и обратные им ключи: (key1, inv1, key2, inv2); для простой перестановки и перестановки по маршруту key2 = inv2 = ()
+def _planKeys(kind, n, key1, key2):
+    if kind == "tbl":
+        l1 = len(key1)
+        if l1 == 0 or n % l1 != 0:
+            raise Exception("Блок данных не может быть равномерно разбит на " + str(l1) + " подблоков " + str(n))
+        if len(key2) != n // l1:
             raise Exception("Размер второго ключа не равен размеру подблока")
+        key1, inv1 = _checkTranspositionKey(key1)
+        key2, inv2 = _checkTranspositionKey(key2)
+        return key1, inv1, key2, inv2
+    
+    key, inv = _checkTranspositionKey(key1)
+    if n % len(key) != 0:
+        raise Exception("Размер блока не кратен размеру ключа")
+    return key, inv, (), ()
+
+def _buildPlan(kind, n, key1, key2, direction):
+    key1, inv1, key2, inv2 = _planKeys(kind, n, key1, key2)
+    if kind == "tbl":
+        l1 = len(key1)
+        sbSize = n // l1
+        if direction:
+            # Строки таблицы считываются по порядку key2, подблоки - по порядку key1
+            return TranspositionPlan(_outerSum(inv2, [i * sbSize for i in inv1]))
+        return TranspositionPlan(_outerSum(key1, [i * l1 for i in key2]))
+    
+    key, inv = key1, inv1
+    keylen = len(key)
+    
+    if kind == "simple":
+        if direction:
+            return TranspositionPlan(_outerSum(range(0, n, keylen), inv))
+        return TranspositionPlan(_outerSum(range(0, n, keylen), key))
+    
+    # Перестановка по маршруту: простая перестановка, затем чтение таблицы (строка - keylen элементов) по столбцам
+    rows = n // keylen
+    if direction:
+        return TranspositionPlan(_outerSum(inv, range(0, n, keylen)))
+    return TranspositionPlan(_outerSum(range(0, rows), [i * rows for i in key]))
+
+# Функция _transposed() переставляет элементы массива NumPy arr по последней оси (длина n) так же, как план
+# _cachedPlan(kind, n, key1, key2, direction), и возвращает результат (новый массив). Таблица индексов длины n не строится:
+# массив меняет форму (строки по len(key) элементов), столбцы выбираются по ключу, при чтении по маршруту и по таблице
+# матрица ещё и транспонируется. Ведущие оси (например, строки DatablockArray) переставляются независимо
+def _transposed(arr, kind, key1, key2, direction):
+    lead = arr.shape[:-1]
+    n = arr.shape[-1]
+    key1, inv1, key2, inv2 = _planKeys(kind, n, key1, key2)
+    l1 = len(key1)
+    
+    if kind == "simple":
+        res = arr.reshape(lead + (n // l1, l1))[..., list(inv1 if direction else key1)]
+    elif kind == "route":
+        if direction:
+            res = arr.reshape(lead + (n // l1, l1))[..., list(inv1)].swapaxes(-1, -2)
+        else:
+            res = arr.reshape(lead + (l1, n // l1))[..., list(key1), :].swapaxes(-1, -2)
+    else:
+        sbSize = n // l1
+        if direction:
+            res = arr.reshape(lead + (l1, sbSize))[..., list(inv1), :][..., list(inv2)].swapaxes(-1, -2)
+        else:
+            res = arr.reshape(lead + (sbSize, l1))[..., list(key2), :][..., list(key1)].swapaxes(-1, -2)
+    return res.reshape(lead + (n,))
+
+# Функция _transposBuffer() переставляет элементы буфера buf на месте (см. _transposed());
+# без NumPy и для элементов длиннее 64 битов применяется план перестановки
+def _transposBuffer(buf, kind, key1, key2, direction):
+    view = _numpyView(buf)
+    if view is not None:
+        view[...] = _transposed(view, kind, tuple(key1), tuple(key2), direction)
+        return
+    _cachedPlan(kind, len(buf), tuple(key1), tuple(key2), direction).apply(buf)
+
+
+# Класс CipherPipeline описывает фиксированную цепочку шифрующих преобразований блока данных.
+# Цепочка задаётся списком операций вида (имя метода, аргументы...), например:
+#     CipherPipeline([("substMonoShiftedAbc", 3), ("substMonoMixedAbc", abc), ("transposTbl", k1, k2), ("transposRoute", k)])
+# Допустимы методы subst* и transpos* (вместо имени можно передать сам метод, например Datablock.transposSimple).
+# При создании цепочки соседние подстановки объединяются в одну (одна таблица замены или один ключ сдвига),
+# а соседние перестановки - в один план перестановки. Поэтому блок раскладывается на элементы один раз,
+# каждое объединённое звено обходит буфер элементов один раз, а целое значение собирается только в конце.
+# Обратное преобразование (decrypt()) выполняет звенья в обратном порядке с обратными ключами
+class CipherPipeline:
+    # Наибольший размер (в элементах) объединённых таблиц замены; более длинные цепочки подстановок не объединяются
+    MAX_FUSED_TABLE = 1 << 22
+    
+    # Конструктор принимает список операций operations и размер элемента size (по умолчанию - действующий в текущем контексте)
+    def __init__(self, operations, size = None):
+        if size is None:
+            size = currentElemSize()
+        self.__elemSize = size
+        self.__stages = []
+        self.__plans = {}
         
-        curRetMode = retMode
-        retMode = RM_INT
+        for op in operations:
+            self.__addStage(op)
         
-        tbl = []
-          
-        if direction:
-            for i in range(0, l1):
-                tbl.append(self.subblock(key1.index(i) * sbSize, sbSize))
-                
-            j = 0
-            
-            for i in range(0, l2):
-                for db in tbl:
-                    self[j] = db[key2.index(i)]
-                    j += 1
+        # Таблицы замены компилируются в ключи (с проверкой и обращением) один раз
+        for stage in self.__stages:
+            if stage[0] == "tables":
+                stage[1] = PolyAlphabetKey(stage[1], size)
+    
+    # Вспомогательный метод __addStage() переводит операцию в звено цепочки и объединяет его с предыдущим звеном.
+    # Звенья бывают трёх видов:
+    #     ["shift", ключи] - сдвиговая подстановка с периодическим ключом;
+    #     ["tables", таблицы] - табличная подстановка с периодическим набором таблиц;
+    #     ["transpos", операции] - перестановка (план строится при применении, т. к. зависит от длины блока)
+    def __addStage(self, op):
+        name = getattr(op[0], "__name__", op[0])
+        args = op[1:]
+        m = 2 ** self.__elemSize
+        
+        if name == "substMonoShiftedAbc":
+            if args[0] >= m:
+                raise Exception("Ключ при текущем размере элемента не должен превышать " + str(m - 1))
+            stage = ["shift", [args[0] % m]]
+        elif name == "substPolyShiftedAbc":
+            if len(args[0]) == 0:
+                raise Exception("Ключ подстановки пуст")
+            stage = ["shift", [k % m for k in args[0]]]
+        elif name == "substMonoMixedAbc":
+            stage = ["tables", [SubstitutionKey(args[0], self.__elemSize).getTable(True)]]
+        elif name == "substPolyMixedAbc":
+            stage = ["tables", PolyAlphabetKey(args[0], self.__elemSize).getTables(True)]
+        elif name in ("transposSimple", "transposTbl", "transposRoute"):
+            stage = ["transpos", [(name, args)]]
         else:
-            for i in range(0, l1):
-                tbl.append(Datablock().fromInt(2 ** (elemSize * l2) - 1))
-            
-            for j in range(0, l):
-                tbl[j % l1][key2.index(j // l1)] = self[j]
-                
-            for i in range(0, l1):
-                self.replace(key1.index(i) * sbSize, tbl[i])
+            raise Exception("Операция " + str(name) + " не может входить в цепочку преобразований")
         
-        retMode = curRetMode
+        if len(self.__stages) == 0:
+            self.__stages.append(stage)
+            return
+        last = self.__stages[-1]
         
-        return self
+        if last[0] == "transpos" and stage[0] == "transpos":
+            last[1].extend(stage[1])
+        elif last[0] == "shift" and stage[0] == "shift":
+            period = lcm(len(last[1]), len(stage[1]))
+            last[1] = [(last[1][i % len(last[1])] + stage[1][i % len(stage[1])]) % m for i in range(0, period)]
+        elif last[0] != "transpos" and stage[0] != "transpos" and lcm(len(last[1]), len(stage[1])) * m <= self.MAX_FUSED_TABLE:
+            first = _substStageTables(last, m)
+            second = _substStageTables(stage, m)
+            period = lcm(len(first), len(second))
+            last[0] = "tables"
+            last[1] = [_composeTables(first[i % len(first)], second[i % len(second)]) for i in range(0, period)]
+        else:
+            self.__stages.append(stage)
+    
+    # Вспомогательный метод __getPlan() возвращает объединённый план перестановки звена index для блока из n элементов
+    # и обратный ему план. Хранятся планы не более чем для PLAN_CACHE_SIZE последних длин блоков
+    # (планы строятся только для блоков не длиннее PLAN_CACHE_MAX_ELEMS элементов, см. apply())
+    def __getPlan(self, index, n):
+        key = (index, n)
+        if key in self.__plans:
+            # Использованный план переносится в конец словаря, первым вытесняется самый давний
+            self.__plans[key] = self.__plans.pop(key)
+            return self.__plans[key]
+        
+        planners = {"transposSimple": planTransposSimple, "transposTbl": planTransposTbl, "transposRoute": planTransposRoute}
+        plan = None
+        for name, args in self.__stages[index][1]:
+            step = planners[name](n, *args, True)
+            plan = step if plan is None else plan.then(step)
+        self.__plans[key] = (plan, plan.inverse())
+        if len(self.__plans) > PLAN_CACHE_SIZE:
+            del self.__plans[next(iter(self.__plans))]
+        return self.__plans[key]
+    
+    def __len__(self):
+        return len(self.__stages)
+    
+    # Метод getElemSize() возвращает размер элемента, для которого построена цепочка
+    def getElemSize(self):
+        return self.__elemSize
+    
+    # Метод getPeriod() возвращает пару (period, fixed), где period - наименьшая длина блока (в элементах),
+    # при которой цепочку можно применять к частям сообщения независимо (кратна периодам ключей и ширине перестановок),
+    # а fixed - признак того, что блок должен иметь ровно такую длину (этого требует transposTbl())
+    def getPeriod(self):
+        period = 1
+        fixed = None
+        for kind, data in self.__stages:
+            if kind != "transpos":
+                period = lcm(period, len(data))
+                continue
+            for name, args in data:
+                if name == "transposTbl":
+                    size = len(args[0]) * len(args[1])
+                    if fixed is not None and fixed != size:
+                        raise Exception("Перестановки по таблице в цепочке рассчитаны на блоки разной длины")
+                    fixed = size
+                else:
+                    period = lcm(period, len(args[0]))
+        if fixed is not None:
+            if fixed % period != 0:
+                raise Exception("Длина блока перестановки по таблице не кратна периоду остальных звеньев цепочки")
+            return fixed, True
+        return period, False
+    
+    # Метод apply() применяет цепочку к блоку данных block (блок изменяется на месте и возвращается).
+    # direction - прямое (True) или обратное (False) преобразование.
+    # Для блоков длиннее PLAN_CACHE_MAX_ELEMS элементов перестановки звена выполняются по очереди методами transpos*
+    # (без таблиц индексов длины блока), для остальных - одним объединённым планом
+    def apply(self, block, direction):
+        if block.getElemSize() != self.__elemSize:
+            raise Exception("Цепочка построена для размера элемента " + str(self.__elemSize) + ", а размер элемента блока - " + str(block.getElemSize()))
+        
+        order = range(0, len(self.__stages))
+        if not direction:
+            order = reversed(order)
+        
+        for index in order:
+            kind, data = self.__stages[index]
+            if kind == "shift":
+                block.substPolyShiftedAbc(data, direction)
+            elif kind == "tables":
+                block.substPolyMixedAbc(data, direction)
+            elif len(block) > PLAN_CACHE_MAX_ELEMS:
+                ops = data if direction else reversed(data)
+                for name, args in ops:
+                    getattr(block, name)(*args, direction)
+            else:
+                plan, inverse = self.__getPlan(index, len(block))
+                block.transposPlan(plan if direction else inverse)
+        return block
+    
+    # Метод encrypt() выполняет прямое преобразование блока
+    def encrypt(self, block):
+        return self.apply(block, True)
+    
+    # Метод decrypt() выполняет обратное преобразование блока
+    def decrypt(self, block):
+        return self.apply(block, False)
 
-    # Метод transposSimple() выполняет  перестановку элементов блока данных с усложнением по маршруту.
-    # key - ключ подстановки;
-    # direction - прямая (True) или обратная (False) перестановка
-    def transposRoute(self, key, direction):
-        global retMode
+
+# Функция cipherStream() выполняет потоковое шифрование (direction = True) или расшифрование (direction = False).
+# source - двоичный файл (объект с методом read()) или итерируемая последовательность объектов bytes;
+# operations - цепочка преобразований (CipherPipeline или список операций для её создания);
+# chunkSize - желаемый размер обрабатываемой части в байтах.
+# Является генератором: выдаёт результат частями (объектами bytes), поэтому в памяти одновременно находится
+# не больше одной части сообщения, каким бы большим оно ни было.
+# Размер части выравнивается так, чтобы он был кратен периоду цепочки (см. CipherPipeline.getPeriod()) и целому числу байтов.
+# Перестановки применяются к каждой части как к отдельному блоку, поэтому при расшифровании нужно указывать тот же chunkSize.
+# Если в цепочке есть transposTbl(), размер части равен размеру её таблицы, а длина сообщения должна быть ему кратна.
+# Длина последней части в битах должна быть кратна размеру элемента
+def cipherStream(source, operations, direction = True, chunkSize = 1 << 20):
+    if isinstance(operations, CipherPipeline):
+        pipeline = operations
+    else:
+        pipeline = CipherPipeline(operations)
+    
+    size = pipeline.getElemSize()
+    period, fixed = pipeline.getPeriod()
+    unitBits = lcm(period * size, 8)
+    if fixed:
+        if unitBits != period * size:
+            raise Exception("Размер таблицы перестановки не соответствует целому числу байтов")
+        chunkBytes = unitBits // 8
+    else:
+        chunkBytes = unitBits // 8 * max(1, chunkSize * 8 // unitBits)
+    
+    if hasattr(source, "read"):
+        pieces = iter(lambda: source.read(chunkBytes), b"")
+    else:
+        pieces = iter(source)
+    
+    pending = bytearray()
+    for piece in pieces:
+        pending += piece
+        while len(pending) >= chunkBytes:
+            yield _cipherChunk(pipeline, pending[:chunkBytes], direction)
+            del pending[:chunkBytes]
+    
+    if len(pending) > 0:
+        if len(pending) * 8 % size != 0:
+            raise Exception("Длина сообщения в битах не кратна размеру элемента " + str(size))
+        yield _cipherChunk(pipeline, pending, direction)
+
+# Функция cipherFile() шифрует (direction = True) или расшифровывает (direction = False) файл srcPath в файл dstPath
+# частями размером около chunkSize байтов (см. cipherStream())
+def cipherFile(srcPath, dstPath, operations, direction = True, chunkSize = 1 << 20):
+    with open(srcPath, "rb") as src, open(dstPath, "wb") as dst:
+        for chunk in cipherStream(src, operations, direction, chunkSize):
+            dst.write(chunk)
+
+# Функция _cipherChunk() применяет цепочку pipeline к части сообщения chunk и возвращает результат той же длины
+def _cipherChunk(pipeline, chunk, direction):
+    block = Datablock().setElemSize(pipeline.getElemSize()).fromBuffer(chunk)
+    pipeline.apply(block, direction)
+    return bytes(block.asBuffer())
+
+# Функция _substStageTables() возвращает таблицы замены для звена подстановки stage (см. CipherPipeline)
+def _substStageTables(stage, m):
+    if stage[0] == "tables":
+        return stage[1]
+    return [[(v + k) % m for v in range(0, m)] for k in stage[1]]
+
+# Функция _composeTables() возвращает таблицу, равносильную замене по таблице first, а затем по таблице second
+def _composeTables(first, second):
+    if np is not None:
+        return np.asarray(second)[np.asarray(first)].tolist()
+    return [second[v] for v in first]
+
+
+# Класс DatablockBuilder собирает блок данных из многих частей. Части хранятся как ссылки на участки буферов элементов
+# (таблица фрагментов), поэтому добавление, вставка и замена стоят O(размер части), а не O(размер блока):
+# при вставке в середину фрагмент лишь делится на два. Фрагменты объединены в группы примерно по BUILDER_RUN штук
+# с известным количеством элементов, так что нужный фрагмент находится без обхода всей таблицы.
+# Блок собирается один раз - методом build().
+# Части - блоки данных (их элементы в размере элемента сборщика), двоичные последовательности (bytes, bytearray и т. п.)
+# или последовательности значений элементов (array, list)
+class DatablockBuilder:
+    # size - размер элемента (по умолчанию - действующий в текущем контексте; тогда и собранный блок не получает собственного размера)
+    def __init__(self, size = None):
+        self.__ownSize = size is not None
+        if size is None:
+            size = currentElemSize()
+        self.__elemSize = size
+        self.__runs = [] # группы фрагментов: [количество элементов, [(буфер, начало, конец), ...]]
+        self.__length = 0
+    
+    def getElemSize(self):
+        return self.__elemSize
+    
+    # Количество элементов в собираемом блоке
+    def __len__(self):
+        return self.__length
+    
+    # Вспомогательный метод __elemsOf() переводит часть в буфер элементов
+    def __elemsOf(self, piece):
+        size = self.__elemSize
+        if isinstance(piece, Datablock):
+            if piece.getElemSize() != size:
+                piece = Datablock().setElemSize(size).fromDatablock(piece)
+            return piece.asElems()
+        if isinstance(piece, (array, list)):
+            return Datablock().setElemSize(size).fromElems(piece).asElems()
+        return Datablock().setElemSize(size).fromBuffer(piece).asElems()
+    
+    # Вспомогательный метод __split() делит фрагменты так, чтобы элемент index был первым элементом фрагмента.
+    # Возвращает пару (номер группы, номер фрагмента в группе) - место, куда вставляется часть перед элементом index
+    def __split(self, index):
+        if index == self.__length:
+            if len(self.__runs) == 0:
+                self.__runs.append([0, []])
+            return len(self.__runs) - 1, len(self.__runs[-1][1])
         
-        curRetMode = retMode
-        retMode = RM_INT
+        for r, run in enumerate(self.__runs):
+            if index < run[0]:
+                break
+            index -= run[0]
+        pieces = self.__runs[r][1]
+        for p, (buf, start, end) in enumerate(pieces):
+            if index < end - start:
+                break
+            index -= end - start
+        if index > 0:
+            pieces[p:p + 1] = [(buf, start, start + index), (buf, start + index, end)]
+            p += 1
+        return r, p
+    
+    def __checkIndex(self, index, count):
+        if index < 0 or index + count > self.__length:
+            raise Exception("Позиция " + str(index) + " выходит за пределы собираемого блока (" + str(self.__length) + " элементов)")
+    
+    # Вспомогательный метод __put() вставляет буфер элементов elems в группу r перед фрагментом p
+    def __put(self, r, p, elems):
+        run = self.__runs[r]
+        run[1].insert(p, (elems, 0, len(elems)))
+        run[0] += len(elems)
+        self.__length += len(elems)
+        if len(run[1]) > 2 * BUILDER_RUN:
+            tail = run[1][BUILDER_RUN:]
+            del run[1][BUILDER_RUN:]
+            count = sum(end - start for buf, start, end in tail)
+            run[0] -= count
+            self.__runs.insert(r + 1, [count, tail])
+    
+    # Метод append() добавляет часть piece в конец. Возвращает ссылку на самого себя
+    def append(self, piece):
+        return self.insert(self.__length, piece)
+    
+    # Метод insert() вставляет часть piece перед элементом index. Возвращает ссылку на самого себя
+    def insert(self, index, piece):
+        self.__checkIndex(index, 0)
+        elems = self.__elemsOf(piece)
+        if len(elems) > 0:
+            r, p = self.__split(index)
+            self.__put(r, p, elems)
+        return self
+    
+    # Метод replace() заменяет элементы, начиная с index, элементами части piece. Возвращает ссылку на самого себя
+    def replace(self, index, piece):
+        elems = self.__elemsOf(piece)
+        count = len(elems)
+        self.__checkIndex(index, count)
+        if count == 0:
+            return self
         
-        keylen = len(key)
-        dblen = len(self)
-        db = self.clone()
-        if(direction):
-            db.transposSimple(key, True)
-            k = 0
-            for i in range(0, keylen):
-                for j in range(0, dblen, keylen):
-                    self[k] = db[j + i]
-                    k += 1
+        # Фрагменты, покрывающие элементы index ... index + count - 1, удаляются, на их место вставляется часть
+        r1, p1 = self.__split(index)
+        r2, p2 = self.__split(index + count)
+        runs = self.__runs
+        if r1 == r2:
+            del runs[r1][1][p1:p2]
+        else:
+            del runs[r2][1][:p2]
+            del runs[r1][1][p1:]
+            del runs[r1 + 1:r2]
+        for run in runs[r1:r1 + 2]:
+            run[0] = sum(end - start for buf, start, end in run[1])
+        self.__length -= count
+        self.__put(r1, p1, elems)
+        return self
+    
+    def __fragments(self):
+        for count, pieces in self.__runs:
+            yield from pieces
+    
+    # Метод build() собирает блок данных из всех частей
+    def build(self):
+        size = self.__elemSize
+        code = _elemTypecode(size)
+        if code is None:
+            elems = []
+            for buf, start, end in self.__fragments():
+                elems.extend(buf[start:end])
+        else:
+            elems = array(code)
+            for buf, start, end in self.__fragments():
+                elems.frombytes(memoryview(buf)[start:end].cast("B"))
+        
+        dblock = Datablock()
+        if self.__ownSize:
+            dblock.setElemSize(size)
+        with localConfig(size = size):
+            return dblock.fromElems(elems)
+
+
+# Функция _flipMasks() возвращает все маски из width битов, в которых ровно count единиц (кэшируется)
+@lru_cache(maxsize = FLIP_MASKS_CACHE_SIZE)
+def _flipMasks(width, count):
+    return tuple(sum(1 << i for i in bits) for bits in combinations(range(0, width), count))
+
+# Класс HammingIndex - индекс блоков данных одинакового размера bitSize для поиска по расстоянию Хемминга
+# (многоиндексное хэширование). Каждый блок делится на s участков примерно по chunkBits битов, и для каждого участка
+# хранится словарь {значение участка: номера блоков}. Если расстояние между блоками не больше r, то хотя бы один участок
+# отличается не больше чем на r // s битов, поэтому кандидаты находятся перебором значений участков запроса
+# с небольшим числом изменённых битов, а расстояние вычисляется только для кандидатов.
+# Если такой перебор дороже полного просмотра (большой радиус), индекс просматривается целиком.
+# Блоки получают номера при вставке (insert() возвращает номер), по номеру блок можно удалить
+class HammingIndex:
+    def __init__(self, bitSize, chunkBits = 16):
+        if bitSize <= 0:
+            raise Exception("Размер блоков индекса должен быть положительным")
+        count = max(1, (bitSize + chunkBits - 1) // chunkBits)
+        self.__bitSize = bitSize
+        # Участки: (сдвиг, ширина); ширины отличаются не больше чем на 1
+        self.__chunks = []
+        pos = 0
+        for i in range(0, count):
+            width = bitSize // count + (1 if i < bitSize % count else 0)
+            self.__chunks.append((pos, width))
+            pos += width
+        self.__tables = [{} for c in self.__chunks]
+        self.__values = {}
+        self.__nextId = 0
+    
+    def getBitSize(self):
+        return self.__bitSize
+    
+    def __len__(self):
+        return len(self.__values)
+    
+    def __contains__(self, ident):
+        return ident in self.__values
+    
+    # Метод get() возвращает блок данных с номером ident
+    def get(self, ident):
+        return Datablock().fromInt(self.__values[ident]).setBitSize(self.__bitSize)
+    
+    def __code(self, block):
+        v = _intArg(block)
+        if v < 0 or v >> self.__bitSize:
+            raise Exception("Блок не помещается в " + str(self.__bitSize) + " битов")
+        return v
+    
+    # Метод insert() добавляет в индекс блок block (блок данных или целое число) и возвращает его номер
+    def insert(self, block):
+        v = self.__code(block)
+        ident = self.__nextId
+        self.__nextId += 1
+        self.__values[ident] = v
+        for (pos, width), table in zip(self.__chunks, self.__tables):
+            key = (v >> pos) & ((1 << width) - 1)
+            if key in table:
+                table[key].add(ident)
+            else:
+                table[key] = {ident}
+        return ident
+    
+    # Метод delete() удаляет из индекса блок с номером ident
+    def delete(self, ident):
+        v = self.__values.pop(ident)
+        for (pos, width), table in zip(self.__chunks, self.__tables):
+            key = (v >> pos) & ((1 << width) - 1)
+            table[key].discard(ident)
+            if len(table[key]) == 0:
+                del table[key]
+    
+    # Метод load() добавляет в индекс блоки из двоичной последовательности buf, разрезанной на части по bitSize / 8 байтов
+    # (байты каждой части - от младшего к старшему, как у fromBytes()). Возвращает список номеров добавленных блоков
+    def load(self, buf):
+        if self.__bitSize % 8 != 0:
+            raise Exception("Загружать из байтов можно только блоки размером в целое число байтов")
+        step = self.__bitSize // 8
+        mv = memoryview(buf).cast("B")
+        if len(mv) % step != 0:
+            raise Exception("Длина буфера не кратна размеру блока " + str(step) + " байтов")
+        return [self.insert(int.from_bytes(mv[i:i + step], "little")) for i in range(0, len(mv), step)]
+    
+    # Вспомогательный метод __candidates() возвращает номера блоков, у которых участок номер c отличается от участка
+    # запроса q ровно на flips битов
+    def __candidates(self, q, c, flips):
+        pos, width = self.__chunks[c]
+        table = self.__tables[c]
+        key = (q >> pos) & ((1 << width) - 1)
+        found = []
+        for mask in _flipMasks(width, flips):
+            ids = table.get(key ^ mask)
+            if ids:
+                found.extend(ids)
+        return found
+    
+    # Вспомогательный метод __probeExceeds() возвращает True, если перебор до flips изменённых битов требует не меньше limit
+    # обращений к словарям (число масок считается без их построения, подсчёт прекращается при достижении limit)
+    def __probeExceeds(self, flips, limit):
+        total = 0
+        for f in range(0, flips + 1):
+            for pos, width in self.__chunks:
+                total += comb(width, f)
+                if total >= limit:
+                    return True
+        return False
+    
+    def __scan(self, q):
+        return [(ident, (v ^ q).bit_count()) for ident, v in self.__values.items()]
+    
+    # Метод radius() возвращает список пар (номер, расстояние) для всех блоков на расстоянии не больше r от query,
+    # упорядоченный по расстоянию
+    def radius(self, query, r):
+        q = self.__code(query)
+        flips = r // len(self.__chunks)
+        if self.__probeExceeds(flips, len(self.__values)):
+            found = [x for x in self.__scan(q) if x[1] <= r]
         else:
-            k = 0
-            for i in range(0, keylen):
-                for j in range(0, dblen, keylen):
-                    self[i + j] = db[k]
-                    k += 1
-            self.transposSimple(key, False)
+            seen = set()
+            for f in range(0, flips + 1):
+                for c in range(0, len(self.__chunks)):
+                    seen.update(self.__candidates(q, c, f))
+            values = self.__values
+            found = [(ident, (values[ident] ^ q).bit_count()) for ident in seen]
+            found = [x for x in found if x[1] <= r]
+        found.sort(key = lambda x: (x[1], x[0]))
+        return found
+    
+    # Метод nearest() возвращает список пар (номер, расстояние) для k ближайших к query блоков, упорядоченный по расстоянию.
+    # Участки перебираются с растущим числом изменённых битов f; блоки, ещё не найденные после шага f, отличаются
+    # от запроса в каждом участке больше чем на f битов, т. е. не меньше чем на s * (f + 1) битов в сумме.
+    # Поэтому поиск останавливается, как только k-й найденный блок ближе этой границы
+    def nearest(self, query, k):
+        q = self.__code(query)
+        k = min(k, len(self.__values))
+        if k <= 0:
+            return []
+        s = len(self.__chunks)
+        values = self.__values
         
-        retMode = curRetMode
+        seen = {}
+        for f in range(0, self.__bitSize + 1):
+            if self.__probeExceeds(f, len(values)):
+                seen = dict(self.__scan(q))
+                break
+            for c in range(0, s):
+                for ident in self.__candidates(q, c, f):
+                    if ident not in seen:
+                        seen[ident] = (values[ident] ^ q).bit_count()
+            if len(seen) >= k and sorted(seen.values())[k - 1] < s * (f + 1):
+                break
         
+        found = sorted(seen.items(), key = lambda x: (x[1], x[0]))
+        return found[:k]
+
+
+# Функция _bitsToElemMatrix() собирает из матрицы битов bits (строка - биты одного блока, начиная с младшего)
+# матрицу элементов размером size битов; неполный последний элемент дополняется нулями
+def _bitsToElemMatrix(bits, size):
+    rows, nbits = bits.shape
+    count = (nbits + size - 1) // size
+    dtype = _matrixDtype(size)
+    width = dtype.itemsize * 8
+    # Биты каждого элемента дополняются до ширины машинного типа и упаковываются одним вызовом packbits()
+    full = np.zeros((rows, count * width), dtype = np.uint8)
+    full.reshape(rows, count, width)[:, :nbits // size, :size] = bits[:, :nbits - nbits % size].reshape(rows, -1, size)
+    if nbits % size:
+        full[:, (count - 1) * width:(count - 1) * width + nbits % size] = bits[:, nbits - nbits % size:]
+    packed = np.packbits(full, axis = 1, bitorder = "little")
+    return packed.view("<u" + str(dtype.itemsize)).astype(dtype, copy = False)
+
+# Функция _elemMatrixToBits() раскладывает матрицу элементов размером size битов в матрицу битов (обратна _bitsToElemMatrix())
+def _elemMatrixToBits(matrix, size):
+    rows, count = matrix.shape
+    itemsize = matrix.dtype.itemsize
+    raw = np.ascontiguousarray(matrix, dtype = "<u" + str(itemsize)).view(np.uint8).reshape(rows, count, itemsize)
+    bits = np.unpackbits(raw, axis = 2, bitorder = "little")[:, :, :size]
+    return bits.reshape(rows, count * size)
+
+# Класс DatablockArray описывает набор из N блоков данных одинакового размера, хранящийся как одна матрица элементов NumPy
+# (строка - элементы одного блока, элемент с индексом 0 - младший). Преобразования (подстановки, перестановки,
+# поразрядные операции с ключом, циклические сдвиги, вес Хемминга) выполняются над всеми блоками сразу,
+# без создания объекта Datablock на каждый блок. Результат для каждой строки совпадает с результатом
+# соответствующего метода Datablock для блока той же длины и с тем же размером элемента.
+# Размер элемента - от 1 до 64 битов. Для работы класса требуется NumPy
+class DatablockArray:
+    # size - размер элемента (по умолчанию - действующий в текущем контексте; тогда и блоки, возвращаемые
+    # методами asBlocks() и __getitem__(), не получают собственного размера)
+    def __init__(self, size = None):
+        _requireNumpy()
+        self.__ownSize = size is not None
+        if size is None:
+            size = currentElemSize()
+        self.__elemSize = size
+        self.__matrix = np.zeros((0, 0), dtype = _matrixDtype(size))
+        self.__bitSize = 0
+    
+    def getElemSize(self):
+        return self.__elemSize
+    
+    # Метод getBitSize() возвращает размер каждого блока в битах
+    def getBitSize(self):
+        return self.__bitSize
+    
+    # Количество блоков
+    def __len__(self):
+        return self.__matrix.shape[0]
+    
+    # Метод asMatrix() возвращает матрицу элементов (без копирования: изменения матрицы меняют и блоки)
+    def asMatrix(self):
+        return self.__matrix
+    
+    # Вспомогательный метод __setMatrix() устанавливает матрицу элементов и размер блоков, обнуляя биты за пределами размера
+    def __setMatrix(self, matrix, bitSize):
+        size = self.__elemSize
+        count = (bitSize + size - 1) // size
+        if matrix.shape[1] != count:
+            raise Exception("Блок из " + str(bitSize) + " битов должен состоять из " + str(count) + " элементов")
+        tail = bitSize - (count - 1) * size
+        if count > 0 and tail < size:
+            matrix[:, count - 1] &= (1 << tail) - 1
+        self.__matrix = matrix
+        self.__bitSize = bitSize
         return self
     
-    # Метод getProbabilityTable() возвращает таблицу частот элементов текущего блока
+    # Метод fromBytes() инициализирует набор двоичной последовательностью buf, разрезанной на блоки по rowBytes байтов
+    # (байты каждого блока - от младшего к старшему, как у Datablock.fromBytes()); размер блоков - rowBytes * 8 битов.
+    # Возвращает ссылку на самого себя
+    def fromBytes(self, buf, rowBytes):
+        raw = np.frombuffer(buf, dtype = np.uint8)
+        if rowBytes <= 0 or len(raw) % rowBytes != 0:
+            raise Exception("Длина буфера не кратна размеру блока " + str(rowBytes) + " байтов")
+        return self.__fromRows(raw.reshape(-1, rowBytes), rowBytes * 8)
+    
+    # Вспомогательный метод __fromRows() инициализирует набор матрицей байтов rows (строка - байты одного блока)
+    def __fromRows(self, rows, bitSize):
+        size = self.__elemSize
+        dtype = _matrixDtype(size)
+        if size == dtype.itemsize * 8 and rows.shape[1] % dtype.itemsize == 0 and bitSize == rows.shape[1] * 8:
+            # Элементы совпадают с машинным типом - байты просто читаются как целые числа
+            matrix = np.ascontiguousarray(rows).view("<u" + str(dtype.itemsize)).astype(dtype)
+        elif size <= PACK_VECTOR_MAX_SIZE:
+            matrix = _unpackRows(rows, size, (bitSize + size - 1) // size)
+        else:
+            bits = np.unpackbits(rows, axis = 1, bitorder = "little")[:, :bitSize]
+            matrix = _bitsToElemMatrix(bits, size)
+        return self.__setMatrix(matrix, bitSize)
+    
+    # Метод fromBlocks() инициализирует набор блоками данных blocks; размер блоков - наибольший из их размеров
+    # Возвращает ссылку на самого себя
+    def fromBlocks(self, blocks):
+        values = [_intArg(b) for b in blocks]
+        sizes = [b.getBitSize() for b in blocks if isinstance(b, Datablock)]
+        bitSize = max(sizes + [v.bit_length() for v in values] + [0])
+        rowBytes = (bitSize + 7) // 8
+        raw = b"".join(v.to_bytes(rowBytes, "little") for v in values)
+        return self.__fromRows(np.frombuffer(raw, dtype = np.uint8).reshape(len(values), rowBytes), bitSize)
+    
+    # Метод fromMatrix() инициализирует набор матрицей элементов matrix (копируется);
+    # bitSize - размер блоков (по умолчанию - число столбцов, умноженное на размер элемента).
+    # Возвращает ссылку на самого себя
+    def fromMatrix(self, matrix, bitSize = None):
+        size = self.__elemSize
+        matrix = np.asarray(matrix)
+        if matrix.ndim != 2:
+            raise Exception("Матрица элементов должна быть двумерной")
+        if matrix.size > 0 and (matrix.min() < 0 or int(matrix.max()) >> size):
+            raise Exception("Значение элемента не помещается в " + str(size) + " битов")
+        if bitSize is None:
+            bitSize = matrix.shape[1] * size
+        return self.__setMatrix(matrix.astype(_matrixDtype(size)), bitSize)
+    
+    # Метод asBytes() возвращает все блоки одной двоичной последовательностью: каждый блок занимает
+    # getBitSize() битов, округлённые вверх до целого числа байтов (обратно fromBytes())
+    def asBytes(self):
+        return self.__rowBytes(self.__matrix).tobytes()
+    
+    # Вспомогательный метод __rowBytes() переводит строки матрицы элементов matrix в строки байтов
+    def __rowBytes(self, matrix):
+        itemsize = matrix.dtype.itemsize
+        if self.__elemSize == itemsize * 8 and self.__bitSize == matrix.shape[1] * self.__elemSize:
+            return np.ascontiguousarray(matrix, dtype = "<u" + str(itemsize)).view(np.uint8)
+        if self.__elemSize <= PACK_VECTOR_MAX_SIZE:
+            return _packRows(matrix, self.__elemSize, (self.__bitSize + 7) // 8)
+        bits = _elemMatrixToBits(matrix, self.__elemSize)[:, :self.__bitSize]
+        return np.packbits(bits, axis = 1, bitorder = "little")
+    
+    # Метод asBlocks() возвращает список блоков данных
+    def asBlocks(self):
+        rows = self.__rowBytes(self.__matrix)
+        return [self.__block(row) for row in rows]
+    
+    def __block(self, row):
+        dblock = Datablock()
+        if self.__ownSize:
+            dblock.setElemSize(self.__elemSize)
+        return dblock.fromBytes(row.tobytes()).setBitSize(self.__bitSize)
+    
+    # Перегрузка операции индексирования: блок данных с номером key (копия)
+    def __getitem__(self, key):
+        if not -len(self) <= key < len(self):
+            raise Exception("Индекс вне границ набора блоков")
+        key %= len(self)
+        return self.__block(self.__rowBytes(self.__matrix[key:key + 1])[0])
+    
+    # Метод clone() возвращает копию набора блоков
+    def clone(self):
+        res = DatablockArray(self.__elemSize)
+        res.__ownSize = self.__ownSize
+        res.__matrix = self.__matrix.copy()
+        res.__bitSize = self.__bitSize
+        return res
+    
+    # Вспомогательный метод __forRewrite() готовит матрицу к перезаписи всех элементов: размер блоков дополняется
+    # до целого числа элементов (как Datablock.__elemsForRewrite(); биты за пределами размера и так нулевые)
+    def __forRewrite(self):
+        self.__bitSize = self.__matrix.shape[1] * self.__elemSize
+        return self.__matrix
+    
+    # Вспомогательный метод __substShifted() прибавляет к столбцу j ключ keys[j % len(keys)] по модулю 2 ** elemSize
+    def __substShifted(self, keys, direction):
+        m = 1 << self.__elemSize
+        if len(keys) == 0:
+            raise Exception("Ключ подстановки пуст")
+        if direction:
+            keys = [k % m for k in keys]
+        else:
+            keys = [(m - k) % m for k in keys]
+        matrix = self.__forRewrite()
+        count = matrix.shape[1]
+        row = np.resize(np.array(keys, dtype = matrix.dtype), count)
+        matrix += row
+        if self.__elemSize < matrix.dtype.itemsize * 8:
+            matrix &= m - 1
+        return self
+    
+    # Вспомогательный метод __substTables() заменяет элементы столбца j по таблице tables[j % len(tables)]
+    def __substTables(self, tables):
+        m = 1 << self.__elemSize
+        if len(tables) == 0:
+            raise Exception("Ключ подстановки пуст")
+        if not (np is not None and isinstance(tables, np.ndarray)):
+            lookup = np.full((len(tables), m), -1, dtype = np.int64)
+            for i, t in enumerate(tables):
+                t = list(t)[:m]
+                lookup[i, :len(t)] = t
+            tables = lookup
+        matrix = self.__forRewrite()
+        if matrix.size == 0:
+            return self
+        cols = np.arange(matrix.shape[1]) % len(tables)
+        res = tables[cols[None, :], matrix]
+        _checkSubstResult(int(res.min()), int(res.max()), m)
+        matrix[...] = res
+        return self
+    
+    # Методы subst* выполняют над всеми блоками те же подстановки, что одноимённые методы Datablock
+    def substMonoShiftedAbc(self, key, direction):
+        m = 2 ** self.__elemSize
+        if key >= m:
+            raise Exception("Ключ при текущем размере элемента не должен превышать " + str(m - 1))
+        return self.__substShifted([key], direction)
+    
+    def substPolyShiftedAbc(self, key, direction):
+        return self.__substShifted(list(key), direction)
+    
+    def substMonoMixedAbc(self, abc, direction):
+        if isinstance(abc, SubstitutionKey):
+            abc.checkElemSize(self.__elemSize)
+            return self.__substTables(abc.getMatrix(direction))
+        if direction:
+            return self.__substTables([abc])
+        return self.__substTables([_inverseTable(abc, self.__elemSize)])
+    
+    def substPolyMixedAbc(self, abcs, direction):
+        if isinstance(abcs, PolyAlphabetKey):
+            abcs.checkElemSize(self.__elemSize)
+            return self.__substTables(abcs.getMatrix(direction))
+        if direction:
+            return self.__substTables(list(abcs))
+        return self.__substTables([_inverseTable(abc, self.__elemSize) for abc in abcs])
+    
+    # Методы transpos* выполняют над всеми блоками те же перестановки, что одноимённые методы Datablock
+    # (все строки переставляются одной выборкой по столбцам, см. _transposed())
+    def transposSimple(self, key, direction):
+        return self.__transpos("simple", key, (), direction)
+    
+    def transposTbl(self, key1, key2, direction):
+        return self.__transpos("tbl", key1, key2, direction)
+    
+    def transposRoute(self, key, direction):
+        return self.__transpos("route", key, (), direction)
+    
+    def __transpos(self, kind, key1, key2, direction):
+        matrix = self.__forRewrite()
+        matrix[...] = _transposed(matrix, kind, tuple(key1), tuple(key2), direction)
+        return self
+    
+    def transposPlan(self, plan, direction = True):
+        count = self.__matrix.shape[1]
+        if len(plan) != count:
+            raise Exception("План перестановки рассчитан на " + str(len(plan)) + " элементов, а в блоке их " + str(count))
+        if not direction:
+            plan = plan.inverse()
+        matrix = self.__forRewrite()
+        matrix[...] = matrix[:, np.frombuffer(plan.getPerm(), dtype = np.int64)]
+        return self
+    
+    # Вспомогательный метод __operand() переводит второй операнд поразрядной операции в матрицу или строку элементов:
+    # набор блоков того же размера - поблочно, блок данных или целое число (ключ) - одинаково для всех блоков
+    def __operand(self, other):
+        if isinstance(other, DatablockArray):
+            if other.__elemSize != self.__elemSize or other.__bitSize != self.__bitSize or len(other) != len(self):
+                raise Exception("Наборы блоков различаются размерами")
+            return other.__matrix
+        v = _intArg(other)
+        if v < 0 or v >> self.__bitSize:
+            raise Exception("Ключ не помещается в " + str(self.__bitSize) + " битов")
+        return np.array(_unpackElems(v, self.__elemSize, self.__matrix.shape[1]), dtype = self.__matrix.dtype)
+    
+    # Операции &, ^, | с ключом (блоком данных или целым числом, одинаковым для всех блоков) или с набором блоков
+    def __iand__(self, other):
+        self.__matrix &= self.__operand(other)
+        return self
+    
+    def __ixor__(self, other):
+        self.__matrix ^= self.__operand(other)
+        return self
+    
+    def __ior__(self, other):
+        self.__matrix |= self.__operand(other)
+        return self
+    
+    def __and__(self, other):
+        res = self.clone()
+        res &= other
+        return res
+    
+    def __xor__(self, other):
+        res = self.clone()
+        res ^= other
+        return res
+    
+    def __or__(self, other):
+        res = self.clone()
+        res |= other
+        return res
+    
+    # Метод cshl() возвращает набор, в котором каждый блок циклически сдвинут влево на other позиций (см. Datablock.cshl())
+    def cshl(self, other):
+        return self.clone().setToCshl(other)
+    
+    # Метод cshr() возвращает набор, в котором каждый блок циклически сдвинут вправо на other позиций
+    def cshr(self, other):
+        return self.clone().setToCshr(other)
+    
+    def setToCshl(self, other):
+        return self.__rotate(_intArg(other) % self.__bitSize)
+    
+    def setToCshr(self, other):
+        return self.__rotate(-_intArg(other) % self.__bitSize)
+    
+    # Вспомогательный метод __rotate() циклически сдвигает каждый блок влево на howmany битов.
+    # Сдвиг на целое число элементов - перестановка столбцов, иначе блоки сдвигаются как матрица битов
+    def __rotate(self, howmany):
+        size = self.__elemSize
+        matrix = self.__matrix
+        if howmany == 0:
+            return self
+        if howmany % size == 0 and self.__bitSize == matrix.shape[1] * size:
+            matrix[...] = np.roll(matrix, howmany // size, axis = 1)
+            return self
+        bits = _elemMatrixToBits(matrix, size)[:, :self.__bitSize]
+        matrix[...] = _bitsToElemMatrix(np.roll(bits, howmany, axis = 1), size)
+        return self
+    
+    # Метод wt() возвращает массив NumPy весов Хемминга всех блоков
+    def wt(self):
+        matrix = self.__matrix
+        if hasattr(np, "bitwise_count"):
+            return np.bitwise_count(matrix).sum(axis = 1, dtype = np.int64)
+        return np.unpackbits(np.ascontiguousarray(matrix).view(np.uint8), axis = 1).sum(axis = 1, dtype = np.int64)
+
+
+# Пакетные операции над словами для шифров вида ARX (сложение, циклический сдвиг, "исключающее или").
+# Операнды - массивы NumPy (или последовательности, или отдельные числа) слов размером width битов (8, 16, 32 или 64);
+# каждая функция обрабатывает все слова одним векторным вызовом и возвращает массив слов.
+# Если задан out, результат записывается в этот массив (без выделения памяти), и он же возвращается.
+# Пример раунда: x = xorWords(cshlWords(addWords(x, y), 7), k)
+
+# Функция _wordDtype() возвращает тип NumPy для слов размером width битов
+def _wordDtype(width):
+    _requireNumpy()
+    if width not in (8, 16, 32, 64):
+        raise Exception("Размер слова должен быть 8, 16, 32 или 64 битов")
+    return np.dtype("u" + str(width // 8))
+
+def _words(x, width):
+    return np.asarray(x, dtype = _wordDtype(width))
+
+# Функция addWords() складывает слова a и b по модулю 2 ** width
+def addWords(a, b, width = 32, out = None):
+    return np.add(_words(a, width), _words(b, width), out = out)
+
+# Функция subWords() вычитает слова b из слов a по модулю 2 ** width
+def subWords(a, b, width = 32, out = None):
+    return np.subtract(_words(a, width), _words(b, width), out = out)
+
+# Функция xorWords() выполняет поразрядное "исключающее или" слов a и b
+def xorWords(a, b, width = 32, out = None):
+    return np.bitwise_xor(_words(a, width), _words(b, width), out = out)
+
+# Функция cshlWords() циклически сдвигает слова words влево на howmany позиций
+# (howmany - число или массив сдвигов для каждого слова, как в сдвигах, зависящих от данных).
+# out может совпадать с words (сдвиг на месте): старшие биты вычисляются до записи в out
+def cshlWords(words, howmany, width = 32, out = None):
+    words = _words(words, width)
+    howmany = np.asarray(howmany) % width
+    left = howmany.astype(words.dtype)
+    right = ((width - howmany) % width).astype(words.dtype)
+    high = words >> right
+    res = np.left_shift(words, left, out = out)
+    res |= high
+    return res
+
+# Функция cshrWords() циклически сдвигает слова words вправо на howmany позиций
+def cshrWords(words, howmany, width = 32, out = None):
+    return cshlWords(words, -np.asarray(howmany), width, out)
+
+
+# Функция _countGrams() возвращает словарь {n-грамма: количество} для буфера элементов elems размером size битов.
+# n-грамма при n = 1 - значение элемента, при n > 1 - кортеж из n значений подряд.
+# С NumPy n-граммы кодируются целыми числами и считаются за один векторный проход (bincount или unique),
+# без NumPy - встроенным Counter
+def _countGrams(elems, size, n):
+    count = len(elems) - n + 1
+    if count <= 0:
+        return {}
+    
+    view = _numpyView(elems)
+    if view is not None and size * n <= 64:
+        codes = view[:count].astype(np.uint64)
+        for k in range(1, n):
+            codes = (codes << np.uint64(size)) | view[k:k + count]
+        if size * n <= FREQ_BINCOUNT_BITS:
+            hist = np.bincount(codes.astype(np.intp))
+            keys = np.flatnonzero(hist)
+            vals = hist[keys]
+        else:
+            keys, vals = np.unique(codes, return_counts = True)
+        keys = keys.tolist()
+        if n > 1:
+            mask = (1 << size) - 1
+            keys = [tuple((c >> (size * (n - 1 - k))) & mask for k in range(0, n)) for c in keys]
+        return dict(zip(keys, vals.tolist()))
+    
+    if n == 1:
+        return dict(Counter(elems))
+    return dict(Counter(zip(*[elems[k:k + count] for k in range(0, n)])))
+
+
+# Класс FrequencyTable - гистограмма n-грамм элементов (целочисленные количества) и статистики на её основе.
+# Таблицу можно пополнять по частям (update(), updateElems()): n-граммы на стыке частей учитываются,
+# поэтому поток, обработанный по частям, даёт ту же таблицу, что и целое сообщение.
+# Таблицы, посчитанные независимо (например, в разных процессах), объединяются методом merge()
+class FrequencyTable:
+    # Конструктор принимает размер элемента size (по умолчанию - действующий в текущем контексте) и длину n-граммы n
+    def __init__(self, size = None, n = 1):
+        if size is None:
+            size = currentElemSize()
+        if n < 1:
+            raise Exception("Длина n-граммы должна быть положительной")
+        self.__elemSize = size
+        self.__n = n
+        self.__counts = {}
+        self.__total = 0
+        self.__tail = []
+    
+    def getElemSize(self):
+        return self.__elemSize
+    
+    def getN(self):
+        return self.__n
+    
+    # Метод getTotal() возвращает общее количество учтённых n-грамм
+    def getTotal(self):
+        return self.__total
+    
+    # Метод getCounts() возвращает копию словаря {n-грамма: количество}
+    def getCounts(self):
+        return dict(self.__counts)
+    
+    def getCount(self, gram):
+        return self.__counts.get(gram, 0)
+    
+    # Количество различных n-грамм
+    def __len__(self):
+        return len(self.__counts)
+    
+    def __add(self, counts):
+        for k, c in counts.items():
+            self.__counts[k] = self.__counts.get(k, 0) + c
+            self.__total += c
+    
+    # Метод updateElems() добавляет в таблицу n-граммы буфера элементов elems (array, list, memoryview),
+    # продолжающего ранее добавленные элементы. Возвращает ссылку на самого себя
+    def updateElems(self, elems):
+        n = self.__n
+        if n > 1 and len(self.__tail) > 0:
+            # n-граммы, начинающиеся в хвосте предыдущей части
+            joined = self.__tail + list(elems[:n - 1])
+            self.__add(Counter(tuple(joined[i:i + n]) for i in range(0, len(self.__tail)) if i + n <= len(joined)))
+        self.__add(_countGrams(elems, self.__elemSize, n))
+        if n > 1:
+            self.__tail = (self.__tail + list(elems[-(n - 1):]))[-(n - 1):]
+        return self
+    
+    # Метод update() добавляет в таблицу элементы блока данных или двоичной последовательности source
+    # (bytes, bytearray, memoryview и т. п.). Возвращает ссылку на самого себя
+    def update(self, source):
+        if isinstance(source, Datablock):
+            if source.getElemSize() != self.__elemSize:
+                raise Exception("Размер элемента блока не совпадает с размером элемента таблицы частот")
+            return self.updateElems(source.asElems())
+        return self.updateElems(Datablock().setElemSize(self.__elemSize).fromBuffer(source).asElems())
+    
+    # Метод merge() прибавляет к таблице количества из независимо посчитанной таблицы other.
+    # n-граммы на стыке данных двух таблиц не учитываются. Возвращает ссылку на самого себя
+    def merge(self, other):
+        if other.getElemSize() != self.__elemSize or other.getN() != self.__n:
+            raise Exception("Объединять можно только таблицы с одинаковыми размером элемента и длиной n-граммы")
+        self.__add(other.getCounts())
+        return self
+    
+    # Метод getProbabilityTable() возвращает словарь {n-грамма: частота}
     def getProbabilityTable(self):
-        global retMode
-        curRetMode = retMode
-        
-        t = {}
-        
-        retMode = RM_INT
+        total = self.__total
+        return {k: c / total for k, c in self.__counts.items()}
+    
+    # Метод entropy() возвращает энтропию Шеннона распределения n-грамм (в битах на n-грамму)
+    def entropy(self):
+        total = self.__total
+        if total == 0:
+            return 0.0
+        return log2(total) - sum(c * log2(c) for c in self.__counts.values()) / total
+    
+    # Метод indexOfCoincidence() возвращает индекс совпадений: вероятность того, что две случайно выбранные
+    # (без возвращения) n-граммы одинаковы
+    def indexOfCoincidence(self):
+        total = self.__total
+        if total < 2:
+            return 0.0
+        return sum(c * (c - 1) for c in self.__counts.values()) / (total * (total - 1))
+    
+    # Метод chiSquared() возвращает статистику хи-квадрат для проверки соответствия таблицы эталонному распределению reference.
+    # reference - таблица частот (FrequencyTable) либо словарь {n-грамма: частота или количество} (нормируется автоматически).
+    # Если встречается n-грамма с нулевой эталонной частотой, возвращается бесконечность
+    def chiSquared(self, reference):
+        if isinstance(reference, FrequencyTable):
+            reference = reference.getCounts()
+        norm = sum(reference.values())
+        total = self.__total
         
-        for i in range(0, len(self)):
-            if self[i] in t:
-                t[self[i]] += 1 / len(self)
-            else:
-                t[self[i]] = 1 / len(self)
+        chi = 0.0
+        for k, c in self.__counts.items():
+            if reference.get(k, 0) == 0:
+                return float("inf")
+        for k, r in reference.items():
+            expected = total * r / norm
+            if expected > 0:
+                chi += (self.__counts.get(k, 0) - expected) ** 2 / expected
+        return chi
+
+# Функция frequencyStream() считает таблицу частот n-грамм сообщения, поступающего по частям:
+# source - двоичный файл (объект с методом read()) или итерируемый объект из bytes.
+# Части произвольной длины собираются в порции около chunkSize байтов, содержащие целое число элементов
+def frequencyStream(source, size = None, n = 1, chunkSize = 1 << 20):
+    if size is None:
+        size = currentElemSize()
+    unitBytes = lcm(size, 8) // 8
+    chunkBytes = unitBytes * max(1, chunkSize // unitBytes)
+    
+    if hasattr(source, "read"):
+        pieces = iter(lambda: source.read(chunkBytes), b"")
+    else:
+        pieces = iter(source)
+    
+    table = FrequencyTable(size, n)
+    pending = bytearray()
+    for piece in pieces:
+        pending += piece
+        if len(pending) >= chunkBytes:
+            whole = len(pending) // unitBytes * unitBytes
+            table.update(pending[:whole])
+            del pending[:whole]
+    if len(pending) > 0:
+        table.update(pending)
+    return table
+
+# Функция frequencyFile() считает таблицу частот n-грамм файла path.
+# При workers > 1 файл делится на части около chunkSize байтов, которые считаются параллельно в ProcessPoolExecutor;
+# каждая часть дочитывает n - 1 элементов следующей, так что n-граммы на стыках не теряются
+def frequencyFile(path, size = None, n = 1, chunkSize = 1 << 20, workers = 1):
+    if size is None:
+        size = currentElemSize()
+    if workers <= 1:
+        with open(path, "rb") as f:
+            return frequencyStream(f, size, n, chunkSize)
+    
+    unitBytes = lcm(size, 8) // 8
+    chunkBytes = unitBytes * max(1, chunkSize // unitBytes)
+    overlap = ((n - 1) * size + unitBytes * 8 - 1) // (unitBytes * 8) * unitBytes
+    with open(path, "rb") as f:
+        length = f.seek(0, 2)
+    jobs = [(path, pos, min(chunkBytes, length - pos), overlap, size, n) for pos in range(0, length, chunkBytes)]
+    
+    table = FrequencyTable(size, n)
+    with ProcessPoolExecutor(max_workers = workers) as executor:
+        for part in executor.map(_frequencyWorker, jobs):
+            table.merge(part)
+    return table
+
+# Функция _frequencyWorker() считает n-граммы, начинающиеся в части файла (см. frequencyFile())
+def _frequencyWorker(job):
+    path, pos, length, overlap, size, n = job
+    with open(path, "rb") as f:
+        f.seek(pos)
+        data = f.read(length + overlap)
+    own = (length * 8 + size - 1) // size
+    elems = Datablock().setElemSize(size).fromBuffer(data).asElems()
+    return FrequencyTable(size, n).updateElems(elems[:own + n - 1])
+
+
+# Функция _smallPrimes() возвращает список простых чисел, меньших limit (решето Эратосфена)
+def _smallPrimes(limit):
+    sieve = bytearray([1]) * limit
+    sieve[0:2] = bytes(2)
+    for i in range(2, int(limit ** 0.5) + 1):
+        if sieve[i]:
+            sieve[i * i::i] = bytes(len(range(i * i, limit, i)))
+    return [i for i in range(0, limit) if sieve[i]]
+
+_SMALL_PRIMES = _smallPrimes(PRIME_SIEVE_LIMIT)
+
+# Произведение всех малых простых чисел: один вызов gcd() заменяет пробное деление на каждое из них
+_SMALL_PRIMORIAL = 1
+for _p in _SMALL_PRIMES:
+    _SMALL_PRIMORIAL *= _p
+del _p
+
+# Источник случайности для простых чисел: криптографически стойкий и независимый в каждом процессе пула
+_sysRandom = SystemRandom()
+
+# Основания, с которыми тест Миллера-Рабина даёт точный ответ для всех n < 2 ** 64
+_MR_BASES_64 = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37)
+
+# Количество раундов Миллера-Рабина для случайных кандидатов в зависимости от их длины в битах
+# (вероятность ошибки не выше 2 ** -80, см. Menezes, van Oorschot, Vanstone, "Handbook of Applied Cryptography", табл. 4.4)
+_MR_ROUNDS = ((1300, 2), (850, 3), (650, 4), (550, 5), (450, 6), (400, 7), (350, 8), (300, 9), (250, 12), (200, 15), (150, 18), (100, 27))
+
+# Функция _millerRabin() проверяет нечётное n > PRIME_SIEVE_LIMIT тестом Миллера-Рабина.
+# rounds - количество раундов со случайными основаниями (None - выбирается по длине n); для n < 2 ** 64 проверка точная
+def _millerRabin(n, rounds = None):
+    s = ((n - 1) & (1 - n)).bit_length() - 1
+    d = (n - 1) >> s
+    
+    if n < 2 ** 64:
+        bases = _MR_BASES_64
+    else:
+        if rounds is None:
+            rounds = 40
+            for bits, r in _MR_ROUNDS:
+                if n.bit_length() >= bits:
+                    rounds = r
+                    break
+        bases = [_sysRandom.randrange(2, n - 1) for i in range(0, rounds)]
+    
+    for a in bases:
+        t = pow(a, d, n)
+        if t == 1 or t == n - 1:
+            continue
+        for i in range(1, s):
+            t = t * t % n
+            if t == n - 1:
+                break
+        else:
+            return False
+    return True
+
+# Функция isProbablePrime() проверяет, является ли целое число n (вероятно) простым.
+# Сначала n проверяется на делимость на малые простые числа, затем - тестом Миллера-Рабина (см. _millerRabin())
+def isProbablePrime(n, rounds = None):
+    if n < 2:
+        return False
+    if n < PRIME_SIEVE_LIMIT:
+        return n in _SMALL_PRIMES
+    if gcd(n, _SMALL_PRIMORIAL) != 1:
+        return False
+    return _millerRabin(n, rounds)
+
+# Функция _randomPrime() возвращает случайное простое число длиной ровно bitlen битов.
+# Поиск ведётся от случайного нечётного числа вверх окнами по PRIME_SEARCH_WINDOW нечётных кандидатов:
+# в каждом окне решетом вычёркиваются кратные малым простым числам, а тест Миллера-Рабина выполняется
+# только для оставшихся кандидатов
+def _randomPrime(bitlen):
+    if bitlen < 2:
+        raise Exception("Простых чисел длиной " + str(bitlen) + " бит не существует")
+    low = 1 << (bitlen - 1)
+    high = 1 << bitlen
+    
+    if high <= PRIME_SIEVE_LIMIT ** 2:
+        while True:
+            n = _sysRandom.randrange(low, high)
+            if isProbablePrime(n):
+                return n
+    
+    while True:
+        start = _sysRandom.randrange(low, high) | 1
         
-        retMode = curRetMode
+        while start < high:
+            # sieve[k] соответствует кандидату start + 2 * k
+            sieve = bytearray([1]) * PRIME_SEARCH_WINDOW
+            for p in _SMALL_PRIMES[1:]:
+                k = (-(start % p) * ((p + 1) // 2)) % p
+                sieve[k::p] = bytes(len(range(k, PRIME_SEARCH_WINDOW, p)))
+            
+            for k in range(0, PRIME_SEARCH_WINDOW):
+                if sieve[k]:
+                    n = start + 2 * k
+                    if n >= high:
+                        break
+                    if _millerRabin(n):
+                        return n
+            start += 2 * PRIME_SEARCH_WINDOW
+
+# Функция generatePrimes() возвращает список из count случайных простых чисел длиной bitlen битов (в виде блоков данных).
+# При workers > 1 числа ищутся параллельно в ProcessPoolExecutor
+def generatePrimes(count, bitlen, workers = 1):
+    if workers > 1 and count > 1:
+        with ProcessPoolExecutor(max_workers = workers) as executor:
+            primes = list(executor.map(_randomPrime, [bitlen] * count))
+    else:
+        primes = [_randomPrime(bitlen) for i in range(0, count)]
+    return [Datablock().fromInt(p).setBitSize(bitlen) for p in primes]
+
+# Функция modInverseMany() возвращает список чисел (в виде блоков данных), обратных блокам blocks по модулю modulus.
+# Используется приём Монтгомери: одно обращение произведения всех чисел и 3 * (N - 1) умножений вместо N обращений.
+# Если какое-то из чисел необратимо, каждое число обращается отдельно, а на месте необратимых возвращается None
+def modInverseMany(blocks, modulus):
+    values = [_intArg(b) for b in blocks]
+    modulus = _intArg(modulus)
+    if len(values) == 0:
+        return []
+    
+    # prefix[i] - произведение values[0] ... values[i] по модулю
+    prefix = [values[0] % modulus]
+    for v in values[1:]:
+        prefix.append(prefix[-1] * v % modulus)
+    try:
+        inv = pow(prefix[-1], -1, modulus)
+    except ValueError:
+        return [Datablock().fromInt(pow(v, -1, modulus)) if gcd(v, modulus) == 1 else None for v in values]
+    
+    out = [None] * len(values)
+    for i in range(len(values) - 1, 0, -1):
+        out[i] = Datablock().fromInt(inv * prefix[i - 1] % modulus)
+        inv = inv * values[i] % modulus
+    out[0] = Datablock().fromInt(inv)
+    return out
+
+# Функция _intArg() приводит операнд (блок данных, целое число и т. п., см. _toInt()) к целому числу
+def _intArg(x):
+    val = _toInt(x)
+    if val is None:
+        raise Exception("Недопустимый тип операнда ", str(type(x)))
+    return val
+
+# Функция _reduceExp() сокращает неотрицательный показатель e по модулю p - 1 (p - простое), сохраняя e > 0,
+# чтобы степень основания, кратного p, по-прежнему была равна 0
+def _reduceExp(e, p):
+    if e < 0:
+        raise Exception("Показатель степени не может быть отрицательным")
+    if e == 0:
+        return 0
+    return (e - 1) % (p - 1) + 1
+
+# Функция _baseTable() строит таблицу степеней фиксированного основания base по модулю mod:
+# table[i][d - 1] = base ** (d * 2 ** (window * i)), i - номер группы из window битов показателя, d = 1 ... 2 ** window - 1
+def _baseTable(base, mod, bits, window):
+    table = []
+    g = base % mod
+    for i in range(0, (bits + window - 1) // window):
+        row = [g]
+        for d in range(1, (1 << window) - 1):
+            row.append(row[-1] * g % mod)
+        table.append(row)
+        g = row[-1] * g % mod
+    return table
+
+# Функция _baseTablePow() возводит основание таблицы table в степень e: по одному умножению на каждую ненулевую группу битов e.
+# Показатели длиннее таблицы вычисляются встроенной функцией pow()
+def _baseTablePow(table, e, mod, window):
+    if e.bit_length() > len(table) * window:
+        return pow(table[0][0], e, mod)
+    r = 1 % mod
+    mask = (1 << window) - 1
+    i = 0
+    while e:
+        d = e & mask
+        if d:
+            r = r * table[i][d - 1] % mod
+        e >>= window
+        i += 1
+    return r
+
+# Функция _multiPow() вычисляет произведение bases[i] ** exps[i] по модулю mod за один проход по битам показателей
+# (метод Штрауса): основания разбиты на группы по MULTIPOW_GROUP, для каждой группы заранее вычислены
+# произведения всех подмножеств, поэтому на каждый бит приходится одно возведение в квадрат и одно умножение на группу
+def _multiPow(bases, exps, mod):
+    groups = []
+    bits = max([e.bit_length() for e in exps], default = 0)
+    for g in range(0, len(bases), MULTIPOW_GROUP):
+        table = [1]
+        for b in bases[g:g + MULTIPOW_GROUP]:
+            b %= mod
+            table += [t * b % mod for t in table]
+        rows = [format(e, "0" + str(bits) + "b") for e in exps[g:g + MULTIPOW_GROUP]]
+        # Номер подмножества для каждого бита: j-й бит номера - бит показателя j-го основания группы
+        idx = [sum((row[k] == "1") << j for j, row in enumerate(rows)) for k in range(0, bits)]
+        groups.append((table, idx))
+    
+    r = 1 % mod
+    for k in range(0, bits):
+        r = r * r % mod
+        for table, idx in groups:
+            if idx[k]:
+                r = r * table[idx[k]] % mod
+    return r
+
+
+# Класс ModContext хранит модуль и данные, заранее вычисленные для возведения в степень по этому модулю.
+# Он нужен, когда по одному модулю вычисляется много степеней:
+#     - setBase() строит таблицу степеней фиксированного основания (далее - одно умножение на window битов показателя);
+#     - setExponent() запоминает фиксированный показатель (и его остатки для КТО);
+#     - modPowMany() и basePowMany() вычисляют степени списка оснований или списка показателей;
+#     - multiPow() вычисляет произведение степеней за один проход.
+# Если задано разложение модуля factors (различные простые числа, например p и q для RSA), степени вычисляются
+# по каждому простому множителю с показателем, сокращённым по модулю p - 1, и собираются по китайской теореме об остатках.
+# Основания и показатели - блоки данных или целые числа, результаты возвращаются в виде блоков данных
+class ModContext:
+    def __init__(self, modulus, factors = None):
+        modulus = _intArg(modulus)
+        if modulus < 2:
+            raise Exception("Модуль должен быть больше 1")
+        self.__modulus = modulus
+        self.__factors = None
+        self.__coefs = None
+        self.__base = None
+        self.__tables = None
+        self.__window = None
+        self.__exponent = None
+        self.__exponents = None
         
-        return t
+        if factors is not None:
+            factors = [_intArg(p) for p in factors]
+            prod = 1
+            for p in factors:
+                prod *= p
+            if prod != modulus or len(set(factors)) != len(factors) or not all(isProbablePrime(p) for p in factors):
+                raise Exception("Разложение модуля должно состоять из различных простых чисел, произведение которых равно модулю")
+            self.__factors = factors
+            # Коэффициенты КТО: coefs[i] = 1 по модулю factors[i] и 0 по модулю остальных множителей
+            self.__coefs = [(modulus // p) * pow(modulus // p, -1, p) for p in factors]
+    
+    def getModulus(self):
+        return self.__modulus
+    
+    def getFactors(self):
+        return self.__factors
+    
+    # Метод setBase() задаёт фиксированное основание base и строит для него таблицу степеней.
+    # maxBits - наибольшая длина показателя, покрываемая таблицей (по умолчанию - длина модуля),
+    # window - количество битов показателя на одно умножение (таблица занимает maxBits / window * 2 ** window чисел).
+    # Возвращает ссылку на самого себя
+    def setBase(self, base, maxBits = None, window = 4):
+        self.__base = _intArg(base)
+        self.__window = window
+        if self.__factors is None:
+            if maxBits is None:
+                maxBits = self.__modulus.bit_length()
+            self.__tables = [_baseTable(self.__base, self.__modulus, maxBits, window)]
+        else:
+            # Показатели сокращаются по модулю p - 1, поэтому длина таблицы не зависит от maxBits
+            self.__tables = [_baseTable(self.__base, p, (p - 1).bit_length(), window) for p in self.__factors]
+        return self
+    
+    # Метод setExponent() задаёт фиксированный показатель exponent. Возвращает ссылку на самого себя
+    def setExponent(self, exponent):
+        self.__exponent = _intArg(exponent)
+        self.__exponents = self.__splitExp(self.__exponent)
+        return self
+    
+    # Вспомогательный метод __splitExp() возвращает показатели для каждого множителя модуля
+    def __splitExp(self, e):
+        if e < 0:
+            raise Exception("Показатель степени не может быть отрицательным")
+        if self.__factors is None:
+            return [e]
+        return [_reduceExp(e, p) for p in self.__factors]
+    
+    def __moduli(self):
+        if self.__factors is None:
+            return [self.__modulus]
+        return self.__factors
+    
+    # Вспомогательный метод __combine() собирает результат из остатков по множителям модуля
+    def __combine(self, residues):
+        if self.__factors is None:
+            return residues[0]
+        return sum(r * c for r, c in zip(residues, self.__coefs)) % self.__modulus
+    
+    def __pow(self, base, exps):
+        return self.__combine([pow(base, e, m) for e, m in zip(exps, self.__moduli())])
+    
+    def __basePow(self, exps):
+        if self.__tables is None:
+            raise Exception("Фиксированное основание не задано (см. setBase())")
+        w = self.__window
+        return self.__combine([_baseTablePow(t, e, m, w) for t, e, m in zip(self.__tables, exps, self.__moduli())])
+    
+    def __exps(self, exponent):
+        if exponent is None:
+            if self.__exponents is None:
+                raise Exception("Фиксированный показатель не задан (см. setExponent())")
+            return self.__exponents
+        return self.__splitExp(_intArg(exponent))
+    
+    # Метод modPow() возвращает base ** exponent по модулю. Если base (exponent) не указан,
+    # используется фиксированное основание (показатель)
+    def modPow(self, base = None, exponent = None):
+        exps = self.__exps(exponent)
+        if base is None:
+            return Datablock().fromInt(self.__basePow(exps))
+        return Datablock().fromInt(self.__pow(_intArg(base), exps))
+    
+    # Метод modPowMany() возвращает список степеней оснований bases с общим показателем exponent
+    # (по умолчанию - фиксированным)
+    def modPowMany(self, bases, exponent = None):
+        exps = self.__exps(exponent)
+        return [Datablock().fromInt(self.__pow(_intArg(b), exps)) for b in bases]
+    
+    # Метод basePowMany() возвращает список степеней фиксированного основания с показателями exponents
+    def basePowMany(self, exponents):
+        return [Datablock().fromInt(self.__basePow(self.__splitExp(_intArg(e)))) for e in exponents]
+    
+    # Метод multiPow() возвращает произведение bases[i] ** exponents[i] по модулю
+    def multiPow(self, bases, exponents):
+        bases = [_intArg(b) for b in bases]
+        exponents = [_intArg(e) for e in exponents]
+        if len(bases) != len(exponents):
+            raise Exception("Количество оснований и показателей должно совпадать")
+        split = [self.__splitExp(e) for e in exponents]
+        residues = []
+        for i, m in enumerate(self.__moduli()):
+            residues.append(_multiPow(bases, [exps[i] for exps in split], m))
+        return Datablock().fromInt(self.__combine(residues))
+
+
+# Функция compute() вычисляет fn(значения operands...) над целыми числами и возвращает результат в виде блока данных
+# (см. Datablock.setToCompute()). Операнды - блоки данных или целые числа
+def compute(fn, *operands, bitSize = None):
+    vals = [_intArg(x) for x in operands]
+    if len(vals) == 0:
+        return Datablock().setToCompute(lambda a: fn(), bitSize = bitSize)
+    return Datablock().fromInt(vals[0]).setToCompute(fn, *vals[1:], bitSize = bitSize)
+
 
 # Следующие функции созданы для удобства,
 # Чтобы при создании блоков данных не писать каждый раз Datablock().fromInt(...), Datablock().fromText(...) и т. п.
@@ -863,4 +3522,12 @@ def dbb(block):
 
 def dbbs(bts):
     dblock = Datablock().fromBytes(bts)
+    return dblock
+
+def dbbuf(buf):
+    dblock = Datablock().fromBuffer(buf)
+    return dblock
+
+def dbmap(path, writable = True):
+    dblock = Datablock().fromFile(path, writable)
     return dblock
\ No newline at end of file
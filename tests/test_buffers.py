@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+import io
+from random import Random
+
+import pytest
+
+from datablocks import Datablock, dbbuf
+
+
+def randomBytes(count, seed):
+    rnd = Random(seed)
+    return bytes(rnd.randrange(256) for i in range(0, count))
+
+
+# fromBuffer()/asBuffer() совпадают с fromBytes()/asBytes() (кроме старших нулевых байтов, которые fromBuffer() сохраняет)
+@pytest.mark.parametrize("size", [4, 8, 16, 32, 64])
+def test_bufferRoundTrip(size):
+    data = randomBytes(64, size) + b"\x00" * 8
+    block = Datablock().setElemSize(size).fromBuffer(data)
+    assert block.getBitSize() == len(data) * 8
+    assert block.asInt() == Datablock().fromBytes(data).asInt()
+    assert block.asBuffer().tobytes() == data
+    assert block.asBytes() == data.rstrip(b"\x00")
+
+# Изменяемый буфер не копируется: подстановка меняет сам буфер, а asBuffer() ссылается на ту же память
+def test_fromBufferZeroCopy():
+    data = bytearray(randomBytes(32, 1))
+    expected = bytes((v + 3) % 256 for v in data)
+    block = dbbuf(data).substMonoShiftedAbc(3, True)
+    assert bytes(data) == expected
+    view = block.asBuffer()
+    view[0] = 0
+    assert data[0] == 0
+    view.release()
+
+# Неизменяемый буфер копируется
+def test_fromBufferReadonly():
+    data = randomBytes(32, 2)
+    block = dbbuf(data).substMonoShiftedAbc(3, True)
+    assert block.asBuffer().tobytes() == bytes((v + 3) % 256 for v in data)
+
+# Биты за пределами getBitSize() не попадают в asBuffer() и writeTo()
+@pytest.mark.parametrize("size", [8, 16])
+def test_asBufferMasksTail(size):
+    block = Datablock().setElemSize(size).fromInt(0xFFFFFF).setBitSize(13)
+    assert block.asBuffer().tobytes() == b"\xff\x1f"
+    f = io.BytesIO()
+    assert block.writeTo(f) == 2
+    assert f.getvalue() == b"\xff\x1f"
+    assert block.asInt() == 0xFFFFFF
+
+# Пока представление asBuffer() не освобождено, размер блока менять нельзя
+def test_asBufferBlocksResize():
+    block = Datablock().fromBytes(b"abcd")
+    view = block.asBuffer()
+    with pytest.raises(BufferError):
+        block.insert(Datablock().fromBytes(b"x"), 1)
+    assert block.asBytes() == b"abcd"
+    view.release()
+    block.insert(Datablock().fromBytes(b"x"), 1)
+    assert block.asBytes() == b"axbcd"
+
+
+def writeFile(tmp_path, data):
+    path = tmp_path / "data.bin"
+    path.write_bytes(data)
+    return path
+
+# Блок, отображённый на файл, шифруется на месте; результат совпадает с шифрованием блока в памяти
+def test_fromFileInPlace(tmp_path):
+    data = randomBytes(4096, 3)
+    path = writeFile(tmp_path, data)
+    abc = Random(4).sample(range(0, 256), 256)
+    expected = Datablock().fromBuffer(data).substMonoMixedAbc(abc, True).substPolyShiftedAbc([1, 2, 3], True)
+    
+    with Datablock().fromFile(path) as block:
+        block.substMonoMixedAbc(abc, True).substPolyShiftedAbc([1, 2, 3], True)
+        assert block == expected
+    assert path.read_bytes() == expected.asBuffer().tobytes()
+    
+    with Datablock().fromFile(path) as block:
+        block.substPolyShiftedAbc([1, 2, 3], False).substMonoMixedAbc(abc, False)
+    assert path.read_bytes() == data
+
+# При writable = False изменения блока не попадают в файл
+def test_fromFileCopyOnWrite(tmp_path):
+    data = randomBytes(256, 5)
+    path = writeFile(tmp_path, data)
+    with Datablock().fromFile(path, writable = False) as block:
+        block.substMonoShiftedAbc(7, True)
+        assert block.asBuffer().tobytes() == bytes((v + 7) % 256 for v in data)
+    assert path.read_bytes() == data
+
+# Уменьшение размера блока не отвязывает его от файла
+def test_fromFileShrink(tmp_path):
+    data = randomBytes(64, 6)
+    path = writeFile(tmp_path, data)
+    with Datablock().fromFile(path) as block:
+        block.setBitSize(32 * 8)
+        block.substMonoShiftedAbc(1, True)
+    assert path.read_bytes() == bytes((v + 1) % 256 for v in data[:32]) + data[32:]
+
+# close() с неосвобождённым представлением памяти выбрасывает исключение, а блок остаётся открытым
+def test_closeWithLiveView(tmp_path):
+    data = randomBytes(64, 7)
+    path = writeFile(tmp_path, data)
+    block = Datablock().fromFile(path)
+    view = block.asBuffer()
+    with pytest.raises(Exception):
+        block.close()
+    assert block.asBuffer().tobytes() == data
+    view.release()
+    block.close()
+    assert block.getBitSize() == 0
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+from random import Random
+
+import pytest
+
+import datablocks
+from datablocks import Datablock, HammingIndex
+
+
+# Эталон - полный перебор
+def refRadius(values, q, r):
+    found = [(ident, (v ^ q).bit_count()) for ident, v in values.items()]
+    return sorted([x for x in found if x[1] <= r], key = lambda x: (x[1], x[0]))
+
+def refNearest(values, q, k):
+    found = [(ident, (v ^ q).bit_count()) for ident, v in values.items()]
+    return sorted(found, key = lambda x: (x[1], x[0]))[:k]
+
+def makeIndex(bitSize, count, seed, chunkBits = 16):
+    rnd = Random(seed)
+    index = HammingIndex(bitSize, chunkBits)
+    values = {}
+    base = [rnd.getrandbits(bitSize) for i in range(0, 8)]
+    for i in range(0, count):
+        # Значения группируются вокруг нескольких центров, чтобы находились близкие блоки
+        v = rnd.choice(base)
+        for j in range(0, rnd.randrange(0, 12)):
+            v ^= 1 << rnd.randrange(0, bitSize)
+        values[index.insert(Datablock().fromInt(v) if i % 2 else v)] = v
+    return rnd, index, values
+
+
+@pytest.mark.parametrize("bitSize, chunkBits", [(64, 16), (37, 8), (128, 32)])
+def test_radius(bitSize, chunkBits):
+    rnd, index, values = makeIndex(bitSize, 500, bitSize, chunkBits)
+    for r in (0, 3, 8, 20, bitSize):
+        for i in range(0, 5):
+            q = rnd.choice(list(values.values())) ^ (1 << rnd.randrange(0, bitSize))
+            assert index.radius(q, r) == refRadius(values, q, r)
+
+@pytest.mark.parametrize("bitSize, chunkBits", [(64, 16), (37, 8)])
+def test_nearest(bitSize, chunkBits):
+    rnd, index, values = makeIndex(bitSize, 500, bitSize + 1, chunkBits)
+    for k in (1, 5, 50, 1000):
+        for i in range(0, 5):
+            q = rnd.getrandbits(bitSize) if i == 0 else rnd.choice(list(values.values()))
+            res = index.nearest(q, k)
+            # Блоки на одинаковом расстоянии упорядочиваются по номеру, поэтому результат однозначен
+            assert res == refNearest(values, q, k)
+
+def test_deleteAndLoad():
+    rnd, index, values = makeIndex(32, 200, 3)
+    for ident in list(values)[::3]:
+        index.delete(ident)
+        del values[ident]
+    assert len(index) == len(values)
+    q = rnd.getrandbits(32)
+    assert index.radius(q, 10) == refRadius(values, q, 10)
+    
+    data = bytes(rnd.randrange(256) for i in range(0, 40))
+    idents = index.load(data)
+    for n, ident in enumerate(idents):
+        values[ident] = int.from_bytes(data[n * 4:n * 4 + 4], "little")
+        assert index.get(ident).asInt() == values[ident]
+    assert index.nearest(q, 20) == refNearest(values, q, 20)
+
+# Маски изменённых битов кэшируются ограниченно
+def test_flipMasksCache():
+    index = HammingIndex(256, 64)
+    index.insert(0)
+    index.radius(1, 12)
+    assert datablocks._flipMasks.cache_info().maxsize == datablocks.FLIP_MASKS_CACHE_SIZE
+
+def test_checks():
+    index = HammingIndex(8)
+    with pytest.raises(Exception):
+        index.insert(256)
+    with pytest.raises(Exception):
+        HammingIndex(0)
+    with pytest.raises(Exception):
+        HammingIndex(12).load(b"ab")
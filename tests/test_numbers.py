@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+from random import Random
+
+import pytest
+
+from datablocks import Datablock, ModContext, dbi, generatePrimes, isProbablePrime, modInverseMany
+
+
+# Эталон - пробное деление
+def refIsPrime(n):
+    if n < 2:
+        return False
+    i = 2
+    while i * i <= n:
+        if n % i == 0:
+            return False
+        i += 1
+    return True
+
+
+def test_isProbablePrimeSmall():
+    assert [n for n in range(0, 20000) if isProbablePrime(n)] == [n for n in range(0, 20000) if refIsPrime(n)]
+
+def test_isProbablePrimeLarge():
+    # Простые числа Мерсенна, числа Кармайкла и псевдопростые по основанию 2 (сильные)
+    assert isProbablePrime(2 ** 61 - 1)
+    assert isProbablePrime(2 ** 127 - 1)
+    assert isProbablePrime(2 ** 521 - 1)
+    for n in (561, 41041, 825265, 3215031751, 3825123056546413051, (2 ** 61 - 1) * (2 ** 89 - 1)):
+        assert not isProbablePrime(n)
+
+@pytest.mark.parametrize("bitlen", [2, 8, 21, 64, 256])
+def test_generatePrimes(bitlen):
+    primes = generatePrimes(3, bitlen)
+    assert len(primes) == 3
+    for p in primes:
+        assert p.getBitSize() == bitlen
+        assert p.asInt().bit_length() == bitlen
+        assert isProbablePrime(p.asInt())
+        if bitlen <= 32:
+            assert refIsPrime(p.asInt())
+
+def test_generatePrimesParallel():
+    primes = generatePrimes(4, 128, workers = 2)
+    assert all(p.asInt().bit_length() == 128 and isProbablePrime(p.asInt()) for p in primes)
+
+def test_generatePrime():
+    block = Datablock().generatePrime(96)
+    assert block.getBitSize() == 96
+    assert block.asInt().bit_length() == 96 and isProbablePrime(block.asInt())
+    with pytest.raises(Exception):
+        generatePrimes(1, 1)
+
+
+# Модули для ModContext: простой, произведение двух простых (с разложением и без) и чётный составной
+P = 2 ** 127 - 1
+Q = 2 ** 89 - 1
+MODULI = [(P, None), (P * Q, None), (P * Q, [P, Q]), (2 ** 64 * 3 ** 5, None)]
+
+@pytest.mark.parametrize("modulus, factors", MODULI)
+def test_modContextModPow(modulus, factors):
+    rnd = Random(modulus)
+    ctx = ModContext(modulus, factors)
+    bases = [rnd.randrange(0, modulus) for i in range(0, 5)] + [0, 1, P]
+    exps = [rnd.randrange(0, modulus * 4) for i in range(0, 5)] + [0, 1]
+    for b in bases:
+        for e in exps:
+            assert ctx.modPow(b, e).asInt() == pow(b, e, modulus)
+    
+    e = exps[0]
+    ctx.setExponent(Datablock().fromInt(e))
+    assert [x.asInt() for x in ctx.modPowMany(bases)] == [pow(b, e, modulus) for b in bases]
+    
+    ctx.setBase(bases[0], maxBits = (modulus * 4).bit_length())
+    assert [x.asInt() for x in ctx.basePowMany(exps)] == [pow(bases[0], e, modulus) for e in exps]
+    assert ctx.modPow(exponent = exps[1]).asInt() == pow(bases[0], exps[1], modulus)
+
+@pytest.mark.parametrize("modulus, factors", MODULI)
+def test_modContextMultiPow(modulus, factors):
+    rnd = Random(modulus + 1)
+    ctx = ModContext(modulus, factors)
+    for count in (1, 4, 7):
+        bases = [rnd.randrange(0, modulus) for i in range(0, count)]
+        exps = [rnd.randrange(0, modulus) for i in range(0, count)]
+        expected = 1
+        for b, e in zip(bases, exps):
+            expected = expected * pow(b, e, modulus) % modulus
+        assert ctx.multiPow(bases, exps).asInt() == expected
+
+def test_modContextChecks():
+    with pytest.raises(Exception):
+        ModContext(1)
+    with pytest.raises(Exception):
+        ModContext(P * Q, [P, Q + 2])
+    with pytest.raises(Exception):
+        ModContext(15, [15])
+    ctx = ModContext(P)
+    with pytest.raises(Exception):
+        ctx.modPow(3)
+    with pytest.raises(Exception):
+        ctx.modPow(exponent = 3)
+    with pytest.raises(Exception):
+        ctx.modPow(3, -1)
+
+
+# Эталон - расширенный алгоритм Евклида из исходной версии модуля
+def refExtEuc(a0, a1):
+    x0, x1, y0, y1 = 1, 0, 0, 1
+    while a1 != 0:
+        q = a0 // a1
+        a0, a1 = a1, a0 - a1 * q
+        x0, x1 = x1, x0 - x1 * q
+        y0, y1 = y1, y0 - y1 * q
+    return [a0, x0, y0]
+
+def test_extEuc():
+    rnd = Random(5)
+    pairs = [(1, 1), (1, 7), (7, 1), (12, 18), (240, 46), (2 ** 64, 3 ** 40), (P, Q), (P * 6, Q * 6), (35, -15)]
+    pairs += [(rnd.randrange(1, 2 ** 200), rnd.randrange(1, 2 ** 200)) for i in range(0, 50)]
+    for a, b in pairs:
+        assert dbi(a).extEuc(b) == refExtEuc(a, b)
+    assert dbi(5).extEuc(0) is None
+    assert dbi(0).extEuc(5) is None
+
+def test_gcdAndModInverse():
+    rnd = Random(6)
+    for i in range(0, 50):
+        a, m = rnd.randrange(1, 2 ** 100), rnd.randrange(2, 2 ** 100)
+        assert dbi(a).gcd(m).asInt() == refExtEuc(a, m)[0]
+        inv = dbi(a).modInverse(m)
+        if refExtEuc(a, m)[0] == 1:
+            assert inv.asInt() * a % m == 1 and 0 <= inv.asInt() < m
+        else:
+            assert inv is None
+
+def test_modInverseMany():
+    rnd = Random(7)
+    values = [rnd.randrange(1, P) for i in range(0, 100)]
+    res = modInverseMany([dbi(v) for v in values[:50]] + values[50:], dbi(P))
+    assert [r.asInt() for r in res] == [pow(v, -1, P) for v in values]
+    assert modInverseMany([], P) == []
+    
+    # Необратимые числа дают None, остальные обращаются как обычно
+    m = 2 ** 10 * 3 ** 5
+    values = [1, 2, 5, 6, 7, 9, 11, m + 1, 0]
+    res = modInverseMany(values, m)
+    assert [None if r is None else r.asInt() for r in res] == [pow(v, -1, m) if refExtEuc(v, m)[0] == 1 else None for v in values]
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+from concurrent.futures import ProcessPoolExecutor
+from random import Random
+
+import pytest
+
+import datablocks
+from datablocks import Datablock
+
+
+# Пороги уменьшены, чтобы параллельно обрабатывались и небольшие блоки, а окно разделяемой памяти было меньше блока
+@pytest.fixture
+def smallThresholds(monkeypatch):
+    monkeypatch.setattr(datablocks, "PARALLEL_MIN_ELEMS", 16)
+    monkeypatch.setattr(datablocks, "PARALLEL_EXECUTOR_MIN_ELEMS", 16)
+    monkeypatch.setattr(datablocks, "PARALLEL_WINDOW", 100)
+    monkeypatch.setattr(datablocks.os, "cpu_count", lambda: 3)
+    # Созданные в этом процессе участки разделяемой памяти - признак того, что обработка действительно параллельная
+    created = []
+    sharedMemory = datablocks.SharedMemory
+    def spy(*args, **kwargs):
+        shm = sharedMemory(*args, **kwargs)
+        created.append(shm.name)
+        return shm
+    monkeypatch.setattr(datablocks, "SharedMemory", spy)
+    return created
+
+def makeCase(seed):
+    rnd = Random(seed)
+    data = bytes(rnd.randrange(256) for i in range(0, 7 * 60))
+    abcs = [rnd.sample(range(0, 256), 256) for i in range(0, 3)]
+    key = rnd.sample(range(0, 7), 7)
+    return data, abcs, key
+
+def encrypt(block, abcs, key, workers):
+    return block.substPolyMixedAbc(abcs, True, workers).transposSimple(key, True, workers).substPolyShiftedAbc([5, 9], True, workers)
+
+def decrypt(block, abcs, key, workers):
+    return block.substPolyShiftedAbc([5, 9], False, workers).transposSimple(key, False, workers).substPolyMixedAbc(abcs, False, workers)
+
+
+# Параллельная обработка совпадает с последовательной бит в бит
+@pytest.mark.parametrize("engine", ["numpy", "python"])
+def test_parallelMatchesSerial(smallThresholds, monkeypatch, engine):
+    if engine == "python":
+        monkeypatch.setattr(datablocks, "np", None)
+    data, abcs, key = makeCase(1)
+    expected = encrypt(Datablock().fromBuffer(data), abcs, key, 1)
+    block = encrypt(Datablock().fromBuffer(data), abcs, key, 2)
+    assert block == expected
+    assert len(smallThresholds) > 0
+    assert decrypt(block, abcs, key, 2).asBuffer().tobytes() == data
+
+# Готовый пул процессов используется повторно и не закрывается; буфер fromBuffer() изменяется на месте
+def test_parallelExecutor(smallThresholds):
+    data, abcs, key = makeCase(2)
+    expected = encrypt(Datablock().fromBuffer(data), abcs, key, 1)
+    buf = bytearray(data)
+    with ProcessPoolExecutor(max_workers = 2) as executor:
+        block = encrypt(Datablock().fromBuffer(buf), abcs, key, executor)
+        assert bytes(buf) == expected.asBuffer().tobytes()
+        assert len(smallThresholds) > 0
+        decrypt(block, abcs, key, executor)
+        assert bytes(buf) == data
+
+# Ошибка в ключе обнаруживается и при параллельной обработке
+def test_parallelKeyChecks(smallThresholds):
+    block = Datablock().fromBuffer(bytes(7 * 60))
+    with pytest.raises(Exception):
+        block.transposSimple([0, 1, 1], True, 2)
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+from random import Random
+
+import pytest
+
+import datablocks
+from datablocks import CipherPipeline, Datablock
+
+
+def makeOperations(rnd):
+    abc = rnd.sample(range(0, 256), 256)
+    abcs = [rnd.sample(range(0, 256), 256) for i in range(0, 3)]
+    return [
+        ("substMonoShiftedAbc", 17),
+        ("substPolyShiftedAbc", [1, 2, 250]),
+        (Datablock.substMonoMixedAbc, abc),
+        ("transposSimple", rnd.sample(range(0, 4), 4)),
+        ("transposRoute", rnd.sample(range(0, 6), 6)),
+        ("substPolyMixedAbc", abcs),
+        ("transposSimple", rnd.sample(range(0, 3), 3)),
+    ]
+
+# Эталон - те же операции, выполненные по очереди методами блока
+def applyInOrder(block, operations, direction):
+    ops = operations if direction else reversed(operations)
+    for op in ops:
+        getattr(block, getattr(op[0], "__name__", op[0]))(*op[1:], direction)
+    return block
+
+
+# Объединённая цепочка даёт тот же результат, что и последовательность операций, и обращается decrypt()
+def test_pipelineMatchesOperations():
+    rnd = Random(1)
+    operations = makeOperations(rnd)
+    data = bytes(rnd.randrange(256) for i in range(0, 12 * 40))
+    pipeline = CipherPipeline(operations, 8)
+    assert len(pipeline) < len(operations)
+    
+    expected = applyInOrder(Datablock().setElemSize(8).fromBytes(data), operations, True)
+    block = pipeline.encrypt(Datablock().setElemSize(8).fromBytes(data))
+    assert block == expected
+    assert pipeline.decrypt(block).asBuffer().tobytes() == data
+
+# Для блоков длиннее PLAN_CACHE_MAX_ELEMS перестановки выполняются по очереди, а результат тот же
+def test_pipelineLongBlocks(monkeypatch):
+    rnd = Random(2)
+    operations = makeOperations(rnd)
+    data = bytes(rnd.randrange(256) for i in range(0, 12 * 40))
+    expected = applyInOrder(Datablock().setElemSize(8).fromBytes(data), operations, True)
+    monkeypatch.setattr(datablocks, "PLAN_CACHE_MAX_ELEMS", 16)
+    pipeline = CipherPipeline(operations, 8)
+    block = pipeline.encrypt(Datablock().setElemSize(8).fromBytes(data))
+    assert block == expected
+    assert pipeline.decrypt(block).asBuffer().tobytes() == data
+
+# Потоковое шифрование совпадает с шифрованием каждой части отдельным блоком
+def test_cipherStream():
+    rnd = Random(3)
+    operations = makeOperations(rnd)
+    data = bytes(rnd.randrange(256) for i in range(0, 12 * 100))
+    pipeline = CipherPipeline(operations, 8)
+    chunks = list(datablocks.cipherStream([data[:500], data[500:]], pipeline, True, 120))
+    assert all(len(c) == 120 for c in chunks)
+    expected = [applyInOrder(Datablock().setElemSize(8).fromBytes(data[i:i + 120]), operations, True).asBuffer().tobytes()
+                for i in range(0, len(data), 120)]
+    assert chunks == expected
+    assert b"".join(datablocks.cipherStream(chunks, pipeline, False, 120)) == data
+
+def test_pipelineRejectsUnknownOperation():
+    with pytest.raises(Exception):
+        CipherPipeline([("concat", 1)], 8)
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+from random import Random
+
+import pytest
+
+import datablocks
+from datablocks import Datablock
+
+
+# Эталонные реализации подстановок - поэлементные циклы, как в исходной версии модуля
+def refMonoShifted(elems, size, key, direction):
+    m = 2 ** size
+    if direction:
+        return [(v + key) % m for v in elems]
+    return [(v + m - key) % m for v in elems]
+
+def refMonoMixed(elems, abc, direction):
+    if direction:
+        return [abc[v] for v in elems]
+    return [abc.index(v) for v in elems]
+
+def refPolyShifted(elems, size, key, direction):
+    m = 2 ** size
+    if direction:
+        return [(v + key[i % len(key)]) % m for i, v in enumerate(elems)]
+    return [(v + m - key[i % len(key)]) % m for i, v in enumerate(elems)]
+
+def refPolyMixed(elems, abcs, direction):
+    if direction:
+        return [abcs[i % len(abcs)][v] for i, v in enumerate(elems)]
+    return [abcs[i % len(abcs)].index(v) for i, v in enumerate(elems)]
+
+def makeBlock(elems, size):
+    return Datablock().setElemSize(size).fromElems(elems)
+
+def randomCase(size, count, seed):
+    rnd = Random(seed)
+    m = 2 ** size
+    elems = [rnd.randrange(m) for i in range(0, count)]
+    return rnd, m, elems
+
+# Векторный путь (NumPy) и поэлементный путь без NumPy должны давать один и тот же результат
+@pytest.fixture(params = ["numpy", "python"])
+def engine(request, monkeypatch):
+    if request.param == "python":
+        monkeypatch.setattr(datablocks, "np", None)
+    return request.param
+
+
+@pytest.mark.parametrize("size", [4, 8, 16])
+def test_substMonoShiftedAbc(engine, size):
+    rnd, m, elems = randomCase(size, 1000, size)
+    key = rnd.randrange(m)
+    block = makeBlock(elems, size).substMonoShiftedAbc(key, True)
+    assert list(block.asElems()) == refMonoShifted(elems, size, key, True)
+    block.substMonoShiftedAbc(key, False)
+    assert list(block.asElems()) == elems
+
+@pytest.mark.parametrize("size", [4, 8, 12])
+def test_substMonoMixedAbc(engine, size):
+    rnd, m, elems = randomCase(size, 1000, size)
+    abc = rnd.sample(range(0, m), m)
+    block = makeBlock(elems, size).substMonoMixedAbc(abc, True)
+    assert list(block.asElems()) == refMonoMixed(elems, abc, True)
+    block.substMonoMixedAbc(abc, False)
+    assert list(block.asElems()) == elems
+
+@pytest.mark.parametrize("size", [4, 8, 16])
+def test_substPolyShiftedAbc(engine, size):
+    rnd, m, elems = randomCase(size, 1001, size)
+    key = [rnd.randrange(m) for i in range(0, 7)]
+    block = makeBlock(elems, size).substPolyShiftedAbc(key, True)
+    assert list(block.asElems()) == refPolyShifted(elems, size, key, True)
+    block.substPolyShiftedAbc(key, False)
+    assert list(block.asElems()) == elems
+
+@pytest.mark.parametrize("size", [4, 8])
+def test_substPolyMixedAbc(engine, size):
+    rnd, m, elems = randomCase(size, 1001, size)
+    abcs = [rnd.sample(range(0, m), m) for i in range(0, 5)]
+    block = makeBlock(elems, size).substPolyMixedAbc(abcs, True)
+    assert list(block.asElems()) == refPolyMixed(elems, abcs, True)
+    block.substPolyMixedAbc(abcs, False)
+    assert list(block.asElems()) == elems
+
+# Элементы длиннее 64 битов хранятся в списке и обрабатываются без NumPy
+def test_substLongElems():
+    rnd, m, elems = randomCase(70, 50, 70)
+    key = [rnd.randrange(m) for i in range(0, 3)]
+    block = makeBlock(elems, 70).substPolyShiftedAbc(key, True)
+    assert list(block.asElems()) == refPolyShifted(elems, 70, key, True)
+    assert list(block.substPolyShiftedAbc(key, False).asElems()) == elems
+
+# Значение, которого нет в неполном алфавите, при обратной подстановке - ошибка (как abc.index() в исходной версии)
+def test_substMissingValue(engine):
+    block = makeBlock([0, 1, 3], 2)
+    with pytest.raises(Exception):
+        block.substMonoMixedAbc([1, 0, 2, 2], False)
+
+# Скомпилированные ключи дают тот же результат, что и алфавиты в виде списков
+def test_compiledKeys(engine):
+    rnd, m, elems = randomCase(8, 1001, 3)
+    abc = rnd.sample(range(0, m), m)
+    abcs = [rnd.sample(range(0, m), m) for i in range(0, 4)]
+    key = datablocks.compileSubstitutionKey(abc, 8)
+    polyKey = datablocks.compilePolyAlphabetKey(abcs, 8)
+    assert datablocks.compileSubstitutionKey(abc, 8) is key
+    
+    block = makeBlock(elems, 8).substMonoMixedAbc(key, True)
+    assert list(block.asElems()) == refMonoMixed(elems, abc, True)
+    assert list(block.substMonoMixedAbc(key, False).asElems()) == elems
+    
+    block = makeBlock(elems, 8).substPolyMixedAbc(polyKey, True)
+    assert list(block.asElems()) == refPolyMixed(elems, abcs, True)
+    assert list(block.substPolyMixedAbc(polyKey, False).asElems()) == elems
+
+def test_compiledKeyChecks():
+    with pytest.raises(Exception):
+        datablocks.SubstitutionKey([0, 1, 1, 3], 2)
+    key = datablocks.compileSubstitutionKey([3, 2, 1, 0], 2)
+    with pytest.raises(Exception):
+        makeBlock([1, 2, 3], 4).substMonoMixedAbc(key, True)
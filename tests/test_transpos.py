@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+from random import Random
+
+import pytest
+
+import datablocks
+from datablocks import Datablock, planTransposSimple, planTransposTbl, planTransposRoute
+
+
+# Эталонные реализации перестановок - поэлементные циклы, как в исходной версии модуля
+def refSimple(elems, key, direction):
+    res = list(elems)
+    for i in range(0, len(elems), len(key)):
+        for j in range(0, len(key)):
+            if direction:
+                res[i + j] = elems[i + key.index(j)]
+            else:
+                res[i + key.index(j)] = elems[i + j]
+    return res
+
+def refTbl(elems, key1, key2, direction):
+    l1 = len(key1)
+    sbSize = len(elems) // l1
+    if direction:
+        tbl = [elems[key1.index(i) * sbSize:key1.index(i) * sbSize + sbSize] for i in range(0, l1)]
+        return [db[key2.index(i)] for i in range(0, len(key2)) for db in tbl]
+    tbl = [[0] * len(key2) for i in range(0, l1)]
+    for j in range(0, len(elems)):
+        tbl[j % l1][key2.index(j // l1)] = elems[j]
+    res = list(elems)
+    for i in range(0, l1):
+        res[key1.index(i) * sbSize:key1.index(i) * sbSize + sbSize] = tbl[i]
+    return res
+
+def refRoute(elems, key, direction):
+    keylen = len(key)
+    n = len(elems)
+    if direction:
+        db = refSimple(elems, key, True)
+        return [db[j + i] for i in range(0, keylen) for j in range(0, n, keylen)]
+    res = list(elems)
+    k = 0
+    for i in range(0, keylen):
+        for j in range(0, n, keylen):
+            res[i + j] = elems[k]
+            k += 1
+    return refSimple(res, key, False)
+
+def makeBlock(elems, size):
+    return Datablock().setElemSize(size).fromElems(elems)
+
+def randomCase(size, count, seed):
+    rnd = Random(seed)
+    elems = [rnd.randrange(2 ** size) for i in range(0, count)]
+    return rnd, elems
+
+# Перестановка над матрицей NumPy и по плану без NumPy должны давать один и тот же результат
+@pytest.fixture(params = ["numpy", "python"])
+def engine(request, monkeypatch):
+    if request.param == "python":
+        monkeypatch.setattr(datablocks, "np", None)
+    return request.param
+
+
+@pytest.mark.parametrize("size", [4, 8, 16, 70])
+def test_transposSimple(engine, size):
+    rnd, elems = randomCase(size, 7 * 30, size)
+    key = rnd.sample(range(0, 7), 7)
+    block = makeBlock(elems, size).transposSimple(key, True)
+    assert list(block.asElems()) == refSimple(elems, key, True)
+    assert list(block.transposSimple(key, False).asElems()) == elems
+
+@pytest.mark.parametrize("size", [4, 8, 70])
+def test_transposTbl(engine, size):
+    rnd, elems = randomCase(size, 6 * 9, size)
+    key1 = rnd.sample(range(0, 6), 6)
+    key2 = rnd.sample(range(0, 9), 9)
+    block = makeBlock(elems, size).transposTbl(key1, key2, True)
+    assert list(block.asElems()) == refTbl(elems, key1, key2, True)
+    assert list(block.transposTbl(key1, key2, False).asElems()) == elems
+
+@pytest.mark.parametrize("size", [4, 8, 70])
+def test_transposRoute(engine, size):
+    rnd, elems = randomCase(size, 5 * 13, size)
+    key = rnd.sample(range(0, 5), 5)
+    block = makeBlock(elems, size).transposRoute(key, True)
+    assert list(block.asElems()) == refRoute(elems, key, True)
+    assert list(block.transposRoute(key, False).asElems()) == elems
+
+# Объединённый план равносилен последовательному применению перестановок
+def test_transposPlanThen(engine):
+    rnd, elems = randomCase(8, 60, 1)
+    key = rnd.sample(range(0, 4), 4)
+    key1 = rnd.sample(range(0, 6), 6)
+    key2 = rnd.sample(range(0, 10), 10)
+    plan = planTransposSimple(60, key, True).then(planTransposTbl(60, key1, key2, True)).then(planTransposRoute(60, key, True))
+    expected = refRoute(refTbl(refSimple(elems, key, True), key1, key2, True), key, True)
+    block = makeBlock(elems, 8).transposPlan(plan)
+    assert list(block.asElems()) == expected
+    assert list(block.transposPlan(plan, False).asElems()) == elems
+
+# Планы длиннее PLAN_CACHE_MAX_ELEMS не кэшируются, но совпадают с кэшируемыми
+def test_uncachedPlan(monkeypatch):
+    rnd, elems = randomCase(8, 40, 2)
+    key = rnd.sample(range(0, 8), 8)
+    cached = list(planTransposRoute(40, key, True).getPerm())
+    monkeypatch.setattr(datablocks, "PLAN_CACHE_MAX_ELEMS", 16)
+    assert planTransposRoute(40, key, True) is not planTransposRoute(40, key, True)
+    assert list(planTransposRoute(40, key, True).getPerm()) == cached
+
+def test_transposKeyChecks():
+    block = makeBlock(list(range(0, 12)), 8)
+    with pytest.raises(Exception):
+        block.transposSimple([0, 1, 1], True)
+    with pytest.raises(Exception):
+        block.transposSimple([0, 1, 2, 3, 4], True)
+    with pytest.raises(Exception):
+        block.transposTbl([1, 0, 2], [0, 1, 2], True)
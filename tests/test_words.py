@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from datablocks import cshlWords, cshrWords
+
+
+# Циклический сдвиг на месте (out совпадает с исходным массивом)
+def test_cshlWordsInPlace():
+    x = np.array([0x80000001, 0x12345678], dtype = np.uint32)
+    res = cshlWords(x, 8, out = x)
+    assert res is x
+    assert x.tolist() == [0x00000180, 0x34567812]
+
+def test_cshrWordsInPlace():
+    x = np.array([0x80000001, 0x12345678], dtype = np.uint32)
+    res = cshrWords(x, 8, out = x)
+    assert res is x
+    assert x.tolist() == [0x01800000, 0x78123456]
+
+def test_cshlWordsPerWordInPlace():
+    x = np.array([0x80000001, 0x12345678, 0xdeadbeef], dtype = np.uint32)
+    expected = cshlWords(x.copy(), [1, 0, 31]).tolist()
+    cshlWords(x, [1, 0, 31], out = x)
+    assert x.tolist() == expected